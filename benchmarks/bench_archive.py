@@ -0,0 +1,104 @@
+"""
+Queries of the attendees database on the Parquet archive (lambda_function/archive.py)
+against the same queries on a single Parquet file of the whole database read and filtered
+with pandas, the way the sheet or the dashboard snapshot are read.
+
+For each query: the time, the files opened and the MiB of the files that the archive
+reads (its filter on year and city skips the other directories, only the asked columns
+are decoded).
+
+Usage:
+    python benchmarks/bench_archive.py [--rows 300000] [--runs 20] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'lambda_function'))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'dash_app'))
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from archive import archive_filter, open_archive, read_archive, seed_archive, write_archive
+from data_cache import df_to_table, values_to_df
+from identity import drop_duplicate_attendees
+from bench_schema import sheet_values
+
+# name, columns, start, end, cities
+QUERIES = [
+    ('whole database', None, None, None, None),
+    ('dashboard columns', ['#', 'Date', 'City', 'Season', 'Industry / Event', 'Format', 'Attendance', 'Email',
+                           'Country of Origin', 'Employment Status'], None, None, None),
+    ('Toronto 2022, 3 columns', ['Date', 'Email', 'Country of Origin'], '2022-01-01', '2022-12-31', ['Toronto']),
+    ('last quarter, emails', ['Email'], 'last quarter', None, None),
+]
+
+
+def best(function, repeat: int) -> tuple:
+    # Best time of several calls and the result of the last one
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def read_file(path: str, columns: list, start, end, cities) -> pd.DataFrame:
+    # Whole file read, then filtered and deduplicated in memory
+    df = pq.read_table(path).to_pandas()
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (df['Date'] >= start).to_numpy()
+    if end is not None:
+        mask &= (df['Date'] <= end).to_numpy()
+    if cities is not None:
+        mask &= df['City'].isin(cities).to_numpy()
+    return drop_duplicate_attendees(df[mask])[columns or list(df.columns)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300_000)
+    parser.add_argument('--runs', type=int, default=20, help='runs of the loader after the seed')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    df = values_to_df(sheet_values(args.rows))
+    last_quarter = (df['Date'].max() - np.timedelta64(90, 'D')).strftime('%Y-%m-%d')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'database.parquet')
+        pq.write_table(df_to_table(df, {}), path)
+        uri = os.path.join(directory, 'archive')
+
+        # The history is seeded, the last rows are added by runs of the loader
+        history = len(df) - len(df) // 10
+        seed_archive(df.iloc[:history], uri)
+        for run, rows in enumerate(np.array_split(np.arange(history, len(df)), args.runs)):
+            write_archive(df.iloc[rows], f'run-{run:03d}', uri)
+        dataset = open_archive(uri)
+        files = list(dataset.get_fragments())
+
+        print(f'{len(df)} rows, single file {os.path.getsize(path) / 2 ** 20:.1f} MiB, '
+              f'archive {len(files)} files {sum(os.path.getsize(x.path) for x in files) / 2 ** 20:.1f} MiB')
+        print(f"{'query':<26} {'rows':>7} {'file ms':>8} {'archive ms':>10} {'files':>6} {'MiB':>6} {'speedup':>7}")
+        for name, columns, start, end, cities in QUERIES:
+            start = last_quarter if start == 'last quarter' else start
+            before, expected = best(lambda: read_file(path, columns, start, end, cities), args.repeat)
+            after, result = best(lambda: read_archive(uri, columns, start, end, cities), args.repeat)
+            assert len(result) == len(expected), name
+
+            opened = list(dataset.get_fragments(filter=archive_filter(start, end, cities)))
+            size = sum(os.path.getsize(x.path) for x in opened)
+            print(f'{name:<26} {len(result):>7} {before * 1000:>8.1f} {after * 1000:>10.1f} {len(opened):>6} '
+                  f'{size / 2 ** 20:>6.2f} {before / after:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
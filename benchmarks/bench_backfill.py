@@ -0,0 +1,94 @@
+"""
+Backfill of a date range (lambda_function/backfill.py) with pools of 1, 2, 4... processes, without
+network: Eventbrite is served by MockEventbrite in another process, each request waits --latency.
+
+Reports the time and the attendees per second of each pool, and checks that the merged attendees,
+their meeting numbers and seasons are the same whatever the number of shards, and that every event
+is loaded (the listing of the events of a chapter has several pages). The command line backfill is
+also run with credentials and a response cache, its processes create their clients with
+get_api_client like the Lambda, its result must be the same.
+
+Usage:
+    python benchmarks/bench_backfill.py [--events 192] [--pages 4] [--page-size 50] [--latency 0.2]
+                                        [--chapters 2] [--workers 1 2 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'lambda_function'))
+
+from backfill import backfill, read_table
+from bench_loader import mock_process
+
+FIRST_DATE = '2020-01-02'
+
+
+def run_command(base_url: str, chapters: list, end: str, workers: int):
+    """
+    Run backfill.py with credentials in a temporary directory and the mock as the api
+
+    Returns:
+        pd.DataFrame: attendees of the output file
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, 'gcp_api'))
+        with open(os.path.join(directory, 'gcp_api', 'evenbrite_credentials.json'), 'w') as file:
+            json.dump({'token': 'mock', 'chapters': chapters}, file)
+        env = dict(os.environ, EVENTBRITE_API=base_url,
+                   EVENTBRITE_CACHE_PATH=os.path.join(directory, 'cache.sqlite'))
+        subprocess.run([sys.executable, os.path.join(BENCHMARKS, '..', 'lambda_function', 'backfill.py'),
+                        FIRST_DATE, end, '--workers', str(workers), '--shards', os.path.join(directory, 'shards'),
+                        '--output', os.path.join(directory, 'backfill.parquet')],
+                       cwd=directory, env=env, check=True)
+        return read_table(os.path.join(directory, 'backfill.parquet'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=192)
+    parser.add_argument('--pages', type=int, default=4)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--chapters', type=int, default=2)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    chapters = [{'name': f'chapter{x}', 'organization_id': str(x), 'city': None} for x in range(args.chapters)]
+    # One event per week from FIRST_DATE, the range covers all of them
+    end = f'{int(FIRST_DATE[:4]) + args.events // 52 + 1}-12-31'
+
+    with mock_process(events=args.events, pages=args.pages, page_size=args.page_size, latency=args.latency,
+                      first_date=FIRST_DATE, organizations=args.chapters) as base_url:
+        print(f"{'workers':>7} {'shards':>6} {'seconds':>8} {'attendees/s':>12} {'speedup':>8}")
+        reference = None
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as directory:
+                start = time.perf_counter()
+                df, shards = backfill(FIRST_DATE, end, directory, workers, base_url=base_url, chapters=chapters)
+                seconds = time.perf_counter() - start
+
+            if reference is None:
+                reference = (df, seconds)
+            # Same rows, meeting numbers and seasons as the first pool
+            assert df.equals(reference[0]), f'the backfill with {workers} workers is not the same'
+            print(f'{workers:>7} {len(shards):>6} {seconds:>8.2f} {len(df) / seconds:>12.0f} '
+                  f'{reference[1] / seconds:>7.1f}x')
+
+        # The processes of the pool do not share the client (connections and cache) of the parent
+        command = run_command(base_url, chapters, end, max(args.workers))
+        assert command.equals(reference[0]), 'the backfill with get_api_client is not the same'
+
+    print(f"{len(df)} attendees of {df['#'].nunique()} meetings, seasons {sorted(df['Season'].unique())}")
+    # The chapters take turns, one date a week for all of them
+    weeks = -(-args.events // args.chapters)
+    assert df['Date'].nunique() == weeks, f"{df['Date'].nunique()} dates loaded, {weeks} expected"
+
+
+if __name__ == '__main__':
+    main()
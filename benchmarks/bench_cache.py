@@ -0,0 +1,70 @@
+"""
+Requests, bytes and wall-clock time of fetching the same events several times with the
+persistent response cache of EventbriteClient: a cold run, a retry of the run (fresh
+responses, no network) and a later run after the ttl (conditional requests answered 304),
+against the same runs without cache.
+
+Usage:
+    python benchmarks/bench_cache.py [--events 32] [--pages 4] [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_function'))
+
+from eventbrite import iter_attendee_pages, list_events
+from eventbrite_client import MAX_WORKERS, EventbriteClient
+from response_cache import ResponseCache
+from mock_eventbrite import MockEventbrite
+
+
+def fetch(mock: MockEventbrite, cache: ResponseCache = None) -> tuple:
+    """
+    List the events of the mock organization and fetch all their attendees
+
+    Returns:
+        tuple: seconds elapsed, attendees fetched and metrics of the client
+    """
+    start = time.perf_counter()
+    with EventbriteClient(None, base_url=mock.base_url, cache=cache) as client:
+        events = list_events(client, '0', '2000-01-01', '2100-01-01')
+        attendees = [x for page in iter_attendee_pages([x['id'] for x in events], client, MAX_WORKERS) for x in page]
+        metrics = client.metrics()
+    return time.perf_counter() - start, attendees, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=32)
+    parser.add_argument('--pages', type=int, default=4, help='attendee pages by event')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds of latency by request')
+    args = parser.parse_args()
+
+    print(f"{'run':<12} {'seconds':>8} {'requests':>8} {'304':>5} {'hit rate':>8} {'MiB down':>8} {'MiB saved':>9}")
+    with MockEventbrite(events=args.events, pages=args.pages, page_size=50, latency=args.latency) as mock, \
+            tempfile.TemporaryDirectory() as directory:
+        expected = None
+        cache = ResponseCache(os.path.join(directory, 'cache.sqlite'))
+        runs = [('no cache', None), ('cold', cache), ('retry', cache), ('after ttl', cache)]
+        for name, run_cache in runs:
+            if name == 'after ttl':
+                # Every response is stale, each one is revalidated with its ETag
+                cache.ttl = 0
+            before = mock.not_modified
+            seconds, attendees, metrics = fetch(mock, run_cache)
+
+            # The cache returns the same attendees as the api
+            expected = expected or attendees
+            assert attendees == expected, name
+
+            print(f"{name:<12} {seconds:>8.3f} {metrics['requests']:>8} {mock.not_modified - before:>5} "
+                  f"{metrics['cache_hit_rate']:>8.0%} {metrics['bytes'] / 2 ** 20:>8.2f} "
+                  f"{metrics['bytes_saved'] / 2 ** 20:>9.2f}")
+        cache.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Wall-clock time of loading several chapters (Eventbrite organizations), one after the
+other against sharded: the chapters listed at the same time and their events merged by
+date in a pool that grows with the chapters.
+
+The sharded rows must be the rows of the chapters merged by date, with the meeting
+numbers following the calendar. The mock api runs in this process, a latency close to
+the real api keeps its own cpu time from hiding the network time that the shards overlap.
+
+Usage:
+    python benchmarks/bench_chapters.py [--chapters 1 2 4] [--events 16] [--latency 0.2]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_function'))
+
+from eventbrite import iter_attendee_pages, list_events, list_chapter_events
+from eventbrite_client import MAX_WORKERS, EventbriteClient
+from transform import process_attendees, chunk_records
+from mock_eventbrite import MockEventbrite
+
+CITIES = ['Toronto', 'Montreal', 'Ottawa', 'Vancouver', 'Calgary', 'Halifax', 'Edmonton', 'Winnipeg']
+
+
+def load(pages, chunk_size: int = 2000) -> pd.DataFrame:
+    frames, previous = [], None
+    for records in chunk_records(pages, chunk_size):
+        df, previous = process_attendees(records, 100, previous)
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def one_after_the_other(mock: MockEventbrite, chapters: list) -> list:
+    """
+    Each chapter with its own listing and pool, as a run per chapter
+
+    Returns:
+        list: data frame of each chapter
+    """
+    frames = []
+    with EventbriteClient(None, base_url=mock.base_url) as client:
+        for chapter in chapters:
+            events = list_events(client, chapter['organization_id'], '2000-01-01', '2100-01-01')
+            cities = {x['id']: chapter['city'] for x in events}
+            frames.append(load(iter_attendee_pages([x['id'] for x in events], client, MAX_WORKERS, cities)))
+    return frames
+
+
+def sharded(mock: MockEventbrite, chapters: list) -> pd.DataFrame:
+    workers = MAX_WORKERS * len(chapters)
+    with EventbriteClient(None, base_url=mock.base_url, pool_size=workers) as client:
+        start_dates = {x['name']: '2000-01-01' for x in chapters}
+        events = list_chapter_events(client, chapters, start_dates, '2100-01-01')
+        cities = {x['id']: next(c['city'] for c in chapters if c['name'] == x['chapter']) for x in events}
+        return load(iter_attendee_pages([x['id'] for x in events], client, workers, cities))
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chapters', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--events', type=int, default=16, help='events by chapter')
+    parser.add_argument('--pages', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds of latency by request')
+    args = parser.parse_args()
+
+    print(f"{'chapters':>8} {'attendees':>9} {'one by one s':>12} {'sharded s':>9} {'speedup':>8}")
+    for count in args.chapters:
+        chapters = [{'name': CITIES[i], 'organization_id': str(i), 'city': CITIES[i]} for i in range(count)]
+        with MockEventbrite(events=args.events * count, pages=args.pages, page_size=50,
+                            latency=args.latency, organizations=count) as mock:
+            serial_time, frames = timed(one_after_the_other, mock, chapters)
+            sharded_time, df = timed(sharded, mock, chapters)
+
+        # Same rows as the chapters merged by date (stable, the chapters keep their order in a date)
+        columns = ['Date', 'City', 'Email', 'Country of Origin']
+        expected = (pd.concat(frames, ignore_index=True)[columns]
+                    .sort_values('Date', kind='stable').reset_index(drop=True))
+        assert expected.astype(str).equals(df[columns].astype(str)), count
+
+        # A new meeting number each time the date or the city changes, in calendar order
+        assert df['Date'].is_monotonic_increasing
+        meetings = df[['Date', 'City']].drop_duplicates()
+        assert df['#'].iloc[-1] - 100 == len(meetings) and df['#'].is_monotonic_increasing
+
+        print(f'{count:>8} {len(df):>9} {serial_time:>12.2f} {sharded_time:>9.2f} {serial_time / sharded_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Parsing of the event names (lambda_function/event_names.py): the parser is checked against
+the golden set of historic event titles (benchmarks/event_names_golden.json), then the City,
+Industry / Event and Format of a large synthetic attendee frame are timed against the
+previous row-wise functions (extract_city, extractName and returnFormat by row).
+
+The script exits with an error when a title of the golden set is not parsed as expected.
+After a change of the rules (event_names.json), the new titles are added to the golden set
+with the fields that they must give.
+
+Usage:
+    python benchmarks/bench_event_names.py [--rows 200000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'lambda_function'))
+
+from event_names import EVENT_FIELDS, EventNameParser
+from bench_transforms import extract_city, extractName, returnFormat, synthetic_frame
+
+GOLDEN_PATH = os.path.join(BENCHMARKS, 'event_names_golden.json')
+
+
+def check_golden(parser: EventNameParser) -> tuple:
+    """
+    Titles of the golden set that the parser does not parse as expected
+
+    Returns:
+        tuple: title, expected and parsed fields of each difference, and the number of titles
+    """
+    with open(GOLDEN_PATH, encoding='utf-8') as file:
+        golden = json.load(file)
+    differences = []
+    for title in golden:
+        expected = tuple(title[field] for field in EVENT_FIELDS)
+        parsed = parser.parse(title['name'])
+        if parsed != expected:
+            differences.append((title['name'], expected, parsed))
+    return differences, len(golden)
+
+
+def best(function, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    event_parser = EventNameParser.from_file()
+    differences, titles = check_golden(event_parser)
+    for name, expected, parsed in differences:
+        print(f'{name!r}: expected {expected}, parsed {parsed}')
+    print(f'golden set: {titles - len(differences)} of {titles} titles parsed as expected')
+    if differences:
+        sys.exit(1)
+
+    names = synthetic_frame(args.rows)['Event Name']
+    legacy = best(lambda: (names.apply(extract_city), names.apply(extractName), names.apply(returnFormat)),
+                  args.repeat)
+
+    # A new parser has an empty cache, the next runs of the same container find the names in it
+    cold = best(lambda: EventNameParser.from_file().parse_names(names), args.repeat)
+    warm = best(lambda: event_parser.parse_names(names), args.repeat)
+
+    # Same fields as the row-wise functions
+    parsed = event_parser.parse_names(names)
+    assert (parsed['City'].to_numpy() == names.apply(extract_city).to_numpy()).all()
+    assert (parsed['Industry / Event'].to_numpy() == names.apply(extractName).to_numpy()).all()
+    assert (parsed['Format'].to_numpy() == names.apply(returnFormat).to_numpy()).all()
+
+    print(f'{args.rows} attendees, {names.nunique()} distinct event names, {event_parser.parse.cache_info()}')
+    print(f"{'parse':<16} {'seconds':>8} {'speedup':>8}")
+    print(f"{'row-wise':<16} {legacy:>8.3f}")
+    for name, seconds in [('parser, cold', cold), ('parser, warm', warm)]:
+        print(f'{name:<16} {seconds:>8.3f} {legacy / seconds:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Wall-clock time of fetch_all_attendees, serial (1 worker) against concurrent,
+as the number of events and attendee pages grows.
+
+Usage:
+    python benchmarks/bench_fetch.py [--latency 0.05] [--workers 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_function'))
+
+from eventbrite import fetch_all_attendees
+from eventbrite_client import EventbriteClient
+from mock_eventbrite import MockEventbrite
+
+
+def run(events: int, pages: int, workers: int, latency: float) -> tuple:
+    """
+    Fetch all the attendees of a mock organization
+
+    Returns:
+        tuple: seconds elapsed and attendees fetched
+    """
+    with MockEventbrite(events=events, pages=pages, page_size=50, latency=latency) as mock:
+        id_events = list(mock.events)
+        start = time.perf_counter()
+        with EventbriteClient(None, base_url=mock.base_url, pool_size=workers) as client:
+            attendees = fetch_all_attendees(id_events, client, max_workers=workers)
+        elapsed = time.perf_counter() - start
+    return elapsed, attendees
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds of latency by request')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent requests')
+    args = parser.parse_args()
+
+    print(f"{'events':>6} {'pages':>5} {'serial s':>9} {'concurrent s':>12} {'speedup':>7}")
+    for events in (2, 8, 32):
+        for pages in (1, 4):
+            serial, expected = run(events, pages, 1, args.latency)
+            concurrent, attendees = run(events, pages, args.workers, args.latency)
+            # Same attendees in the same order
+            assert [x['id'] for x in attendees] == [x['id'] for x in expected]
+            print(f'{events:>6} {pages:>5} {serial:>9.2f} {concurrent:>12.2f} {serial / concurrent:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Bytes sent and server time of the figures of a page load: the eight figures built and
+serialized by the callback for each visitor (the way the dashboard worked before) against
+the figures of the first tab, rendered and compressed when the data changed and served
+from /figures.
+
+The dashboard is started on a synthetic snapshot, without the Google sheet. The figures
+of filters that select no attendee (e.g. dates between two meetings) must be placeholders
+and the filters that are not valid must be answered with 400. The figures of the archive must
+be the same as the figures of the sheet, although the fields not answered are empty (<NA>) in
+the archive and '' in the sheet. The script exits with an error otherwise.
+
+Usage:
+    python benchmarks/bench_figures.py [--rows 100000] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'lambda_function'))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'dash_app'))
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from bench_schema import sheet_values
+
+
+def check_filters(client, df) -> list:
+    """
+    Queries of the figures answered with an unexpected status
+
+    Returns:
+        list: query, figure and status of each unexpected answer
+    """
+    dates = sorted(df['Date'].dropna().unique())
+    # The day after a meeting, when the next one is later
+    gap = next(x + pd.Timedelta(days=1) for x, y in zip(dates, dates[1:]) if y - x > pd.Timedelta(days=1))
+    queries = {
+        f'start={gap:%Y-%m-%d}&end={gap:%Y-%m-%d}': 200,
+        f'start={dates[-1] + pd.Timedelta(days=1):%Y-%m-%d}': 200,
+        'city=Nowhere': 200,
+        'season=x': 400,
+        'start=notadate': 400,
+    }
+    failures = []
+    for query, status in queries.items():
+        for name in [f'fig{i}' for i in range(1, 9)]:
+            response = client.get(f'/figures/{name}.json?v=v1&{query}')
+            if response.status_code != status:
+                failures.append((query, name, response.status_code))
+    return failures
+
+
+def check_sources(df, directory: str) -> list:
+    """
+    Figures of the attendees that are not the same read from the sheet and from the archive
+
+    The rows written by the loader keep the fields that were not answered empty (<NA>) in the
+    archive, the sheet shows them as ''.
+
+    Returns:
+        list: names of the figures that are not the same
+    """
+    from aggregates import compute_aggregates
+    from app import build_figures
+    from archive import read_archive, write_archive
+
+    archived = df.copy()
+    for field in ['Employment Status', 'Country of Origin']:
+        archived[field] = archived[field].mask(archived[field] == '')
+    write_archive(archived, 'parity', os.path.join(directory, 'archive'))
+    archived = read_archive(os.path.join(directory, 'archive'))
+    assert archived['Employment Status'].isna().any(), 'the archive has no field without answer'
+
+    sheet = [x.to_json() for x in build_figures(compute_aggregates(df))]
+    archive = [x.to_json() for x in build_figures(compute_aggregates(archived))]
+    return [f'fig{i}' for i, (x, y) in enumerate(zip(sheet, archive), start=1) if x != y]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The app loads this snapshot when it is imported
+        os.environ['N2N_SNAPSHOT_PATH'] = os.path.join(directory, 'snapshot.parquet')
+        os.environ['N2N_AGGREGATES_PATH'] = os.path.join(directory, 'aggregates')
+        os.environ['N2N_REFRESH_THREAD'] = 'False'
+        import data_cache
+        df = data_cache.values_to_df(sheet_values(args.rows))
+        pq.write_table(data_cache.df_to_table(df, {'modified_time': 'v1', 'saved_at': time.time()}),
+                       os.environ['N2N_SNAPSHOT_PATH'])
+
+        import app
+        client = app.app.server.test_client()
+        aggregates = app.aggregate_store.get(app.cache.df, 'v1')
+
+        # Before: every visitor got the eight figures built and serialized in the callback
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            body = ''.join(fig.to_json() for fig in app.build_figures(aggregates)).encode()
+        before = (time.perf_counter() - start) / args.repeat
+
+        # After: the figures of the first tab, already rendered and compressed
+        first_tab = app.TABS['overview'][1]
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            responses = [client.get(f'/figures/{name}.json?v=v1', headers={'Accept-Encoding': 'gzip'})
+                         for name in first_tab]
+        after = (time.perf_counter() - start) / args.repeat
+        sent = sum(len(x.data) for x in responses)
+
+        failures = check_filters(client, df)
+        different = check_sources(df, directory)
+
+    print(f"{'figures of a page load':<28} {'KiB sent':>9} {'server ms':>10}")
+    print(f"{'8 built by the callback':<28} {len(body) / 1024:>9.1f} {before * 1000:>10.1f}")
+    print(f"{'first tab, pre-rendered gzip':<28} {sent / 1024:>9.1f} {after * 1000:>10.1f}")
+    print(f'{len(body) / sent:.1f}x fewer bytes, {before / after:.1f}x less server time')
+
+    for query, name, status in failures:
+        print(f'/figures/{name}.json?{query}: unexpected status {status}')
+    for name in different:
+        print(f'{name}: not the same with the archive and the sheet')
+    if failures or different:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
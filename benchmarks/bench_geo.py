@@ -0,0 +1,86 @@
+"""
+Payload of the map of the countries of origin (fig5): the choropleth on the country names
+of plotly (the way the dashboard drew it before), against the choropleth on the ISO-3 codes
+and the simplified geometry of dash_app/geo.py, whose file is downloaded once by the browser.
+
+For each figure: the json and gzip bytes sent with every version and filter of the data,
+the time to build it and the attendees placed on the map.
+
+Usage:
+    python benchmarks/bench_geo.py [--rows 100000] [--repeat 20]
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'lambda_function'))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'dash_app'))
+
+import plotly.express as px
+
+from aggregates import compute_aggregates
+from data_cache import values_to_df
+from geo import GEOMETRY_ASSET, GEOMETRY_PATH, country_counts
+from bench_schema import sheet_values
+
+
+# Previous implementation --------------------------------------------------
+
+def names_map(country):
+    country_counts = country.rename(columns={'Country of Origin': 'name'})
+    fig5 = px.choropleth(country_counts, locations='name', locationmode='country names', color='count',
+                         hover_name='name', color_continuous_scale='Viridis_r')
+    fig5.update_geos(showcoastlines=True, coastlinecolor='RebeccaPurple', showland=True, landcolor='LightGrey',
+                     showocean=True, oceancolor='LightBlue', projection_type='orthographic')
+    fig5.update_layout(geo=dict(showframe=False, showcoastlines=False),
+                       coloraxis_colorbar=dict(title='Attendants by country'))
+    return fig5
+# --------------------------------------------------------------------------
+
+
+def geometry_map(country):
+    # The map of app.build_figures
+    map_counts, outside = country_counts(country)
+    fig5 = px.choropleth(map_counts, geojson=f'/assets/{GEOMETRY_ASSET}', featureidkey='id', locations='iso3',
+                         color='count', hover_name='name', color_continuous_scale='Viridis_r')
+    fig5.update_traces(marker_line_color='RebeccaPurple', marker_line_width=0.5)
+    fig5.update_geos(visible=False, fitbounds='locations', bgcolor='LightBlue', projection_type='natural earth')
+    fig5.update_layout(geo=dict(showframe=False), coloraxis_colorbar=dict(title='Attendants by country'))
+    if outside:
+        fig5.add_annotation(text=f'{outside:,} attendees from other countries', showarrow=False,
+                            xref='paper', yref='paper', x=0, y=0)
+    return fig5
+
+
+def measure(build, country, repeat: int) -> tuple:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = build(country).to_json().encode()
+    return len(body), len(gzip.compress(body)), (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    country = compute_aggregates(values_to_df(sheet_values(args.rows)))['country']
+    answered = int(country['count'][country['Country of Origin'].astype(str) != ''].sum())
+    map_counts, outside = country_counts(country)
+
+    with open(GEOMETRY_PATH, 'rb') as file:
+        geometry = file.read()
+    print(f'{answered} attendees with a country, {answered - outside} on the map; geometry file '
+          f'{len(geometry) / 1024:.1f} KiB, {len(gzip.compress(geometry)) / 1024:.1f} KiB gzip, downloaded once')
+    print(f"{'fig5':<22} {'KiB json':>9} {'KiB gzip':>9} {'build ms':>9}")
+    for name, build in [('country names', names_map), ('ISO-3 and geometry', geometry_map)]:
+        size, compressed, seconds = measure(build, country, args.repeat)
+        print(f'{name:<22} {size / 1024:>9.1f} {compressed / 1024:>9.1f} {seconds * 1000:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Cold start cost of the modules of the Lambda and the dashboard, measured with
+`python -X importtime` in a fresh interpreter for each module.
+
+Prints the total import time of each module and the top-level packages that
+cost the most. The dashboard app loads its data at import, so it needs a
+snapshot (N2N_SNAPSHOT_PATH) to be measured; modules that fail are reported.
+
+Usage:
+    python benchmarks/bench_importtime.py [--top 8] [--repeat 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# module: folder where it is imported from
+MODULES = {
+    'lambda_function': 'lambda_function',
+    'eventbrite_client': 'lambda_function',
+    'transform': 'lambda_function',
+    'sheet_store': 'lambda_function',
+    'normalize': 'lambda_function',
+    'schema': 'lambda_function',
+    'data_cache': 'dash_app',
+    'aggregates': 'dash_app',
+    'app': 'dash_app',
+}
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Read the output of -X importtime
+
+    Args:
+        stderr (str): standard error of the interpreter
+
+    Returns:
+        list: (package, cumulative microseconds, nesting level) of each import
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        level = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(cumulative), level))
+    return imports
+
+
+def direct_imports(imports: list, module: str) -> tuple:
+    """
+    Select the cost of a module and of the packages it imports directly
+
+    Args:
+        imports (list): result of parse_importtime
+        module (str): module imported by the -c statement
+
+    Returns:
+        tuple: cumulative microseconds of the module and list of (package, cumulative microseconds)
+    """
+    # The interpreter reports the imports of a module before the module itself
+    children = []
+    for name, cumulative, level in imports:
+        if level == 0:
+            if name == module:
+                return cumulative, children
+            children = []
+        elif level == 1:
+            children.append((name, cumulative))
+    raise RuntimeError(f'{module} not found in the output of -X importtime')
+
+
+def measure(module: str, folder: str) -> list:
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=os.path.join(ROOT, folder), capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=8, help='packages shown by module')
+    parser.add_argument('--repeat', type=int, default=3, help='runs by module, the fastest is kept')
+    args = parser.parse_args()
+
+    for module, folder in MODULES.items():
+        try:
+            runs = [measure(module, folder) for _ in range(args.repeat)]
+        except RuntimeError as error:
+            print(f'{module:<20} failed: {error}\n')
+            continue
+
+        module_imports = min((direct_imports(x, module) for x in runs), key=lambda x: x[0])
+        total, children = module_imports
+        print(f'{module:<20} {total / 1000:>8.1f} ms')
+
+        for name, cumulative in sorted(children, key=lambda x: -x[1])[:args.top]:
+            print(f'    {name:<32} {cumulative / 1000:>8.1f} ms')
+        print()
+
+
+if __name__ == '__main__':
+    main()
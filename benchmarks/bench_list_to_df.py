@@ -0,0 +1,98 @@
+"""
+Scaling of list_to_df against the previous implementation, which scanned the
+answers once per question and rebuilt the data frame for every attendee.
+
+The output of both versions is compared on every size where the previous one runs
+(the previous version needs more than a minute for 10k attendees).
+
+Usage:
+    python benchmarks/bench_list_to_df.py [--sizes 1000 10000 100000] [--legacy-max 10000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_function'))
+
+from transform import GENERAL_QUESTIONS, QUESTION_LIST, list_to_df
+from mock_eventbrite import EVENT_NAMES, synthetic_attendee
+
+
+def legacy_list_to_df(total_attendees: list) -> pd.DataFrame:
+    """Previous implementation of list_to_df, kept as reference."""
+    columns = GENERAL_QUESTIONS + QUESTION_LIST
+
+    attendees_list = []
+    for attendee in total_attendees:
+        export_list = []
+        export_list.append(attendee["event_name"])
+        export_list.append(attendee["date_attending"])
+        export_list.append(attendee["status"])
+
+        export_list.append(attendee['profile']['email'])
+        export_list.append(attendee['profile']['first_name'])
+        export_list.append(attendee['profile']['last_name'])
+
+        for question in QUESTION_LIST:
+            exist = False
+            for answer in attendee['answers']:
+                if question == answer['question']:
+                    exist = True
+                    export_list.append(answer.get('answer', None))
+
+            if not exist:
+                export_list.append(None)
+
+        attendees_list.append(export_list)
+
+        df = pd.DataFrame(attendees_list, columns=columns)
+
+    return df
+
+
+def synthetic_payload(size: int) -> list:
+    """
+    Attendees of several events, 250 by event
+    """
+    attendees = []
+    for number in range(size):
+        event = number // 250
+        attendee = synthetic_attendee(str(event), number)
+        attendee['event_name'] = EVENT_NAMES[event % len(EVENT_NAMES)]
+        attendee['date_attending'] = '2023-09-07T18:00:00'
+        attendees.append(attendee)
+    return attendees
+
+
+def timed(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-max', type=int, default=10000,
+                        help='largest size where the previous implementation is timed')
+    args = parser.parse_args()
+
+    print(f"{'attendees':>9} {'legacy s':>9} {'single pass s':>13} {'speedup':>8}")
+    for size in args.sizes:
+        payload = synthetic_payload(size)
+        new_time, df = timed(list_to_df, payload)
+
+        if size <= args.legacy_max:
+            legacy_time, expected = timed(legacy_list_to_df, payload)
+            # The City of the chapter is not known by the previous implementation
+            pd.testing.assert_frame_equal(df.drop(columns='City'), expected)
+            print(f'{size:>9} {legacy_time:>9.3f} {new_time:>13.3f} {legacy_time / new_time:>7.0f}x')
+        else:
+            print(f'{size:>9} {"skipped":>9} {new_time:>13.3f} {"":>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+End to end run of api_data_loader without network: Eventbrite is served by MockEventbrite
+(synthetic or recorded responses) and the spreadsheet is an in-memory FakeSheetsClient.
+
+Reports the throughput (attendees per second) and the time of each stage of the loader,
+the best of several runs, and compares them with a saved baseline: a stage or the
+throughput worse than the tolerance is flagged and the script exits with an error.
+A run where the response of an append is lost checks that its rows are not written twice.
+The baselines (benchmarks/baselines/loader.json) depend on the machine, save them with
+--save-baseline on the machine that runs the comparison.
+
+Usage:
+    python benchmarks/bench_loader.py [--events 32] [--pages 4] [--page-size 50] [--latency 0.02]
+                                      [--sheet-latency 0.0] [--chapters 1] [--repeat 5]
+                                      [--recording responses.json] [--save-baseline]
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'lambda_function'))
+
+from eventbrite_client import MAX_WORKERS, EventbriteClient
+from lambda_function import SPREADSHEET, api_data_loader
+from fake_sheets import FakeSheetsClient
+from sheet_store import WATERMARK_SHEET
+from mock_eventbrite import MockEventbrite
+
+BASELINE_PATH = os.path.join(BENCHMARKS, 'baselines', 'loader.json')
+
+# Stages shorter than this are not compared, their noise is larger than their time
+MIN_STAGE_SECONDS = 0.005
+
+
+def serve_mock(options: dict, urls: multiprocessing.Queue, stop: multiprocessing.Event):
+    # The mock api runs in its own process, its threads do not compete with the loader for the GIL
+    with MockEventbrite(**options) as mock:
+        urls.put(mock.base_url)
+        stop.wait()
+
+
+@contextlib.contextmanager
+def mock_process(**options):
+    """
+    Start MockEventbrite in another process
+
+    Args:
+        **options: arguments of MockEventbrite
+
+    Yields:
+        str: root url of the mock api
+    """
+    urls, stop = multiprocessing.Queue(), multiprocessing.Event()
+    process = multiprocessing.Process(target=serve_mock, args=(options, urls, stop), daemon=True)
+    process.start()
+    try:
+        yield urls.get(timeout=30)
+    finally:
+        stop.set()
+        process.join()
+
+
+def run_loader(args, lost_appends: set = frozenset()) -> dict:
+    """
+    Load the attendees of a fresh mock api in a fresh fake spreadsheet
+
+    Args:
+        args: options of the command line
+        lost_appends (set, optional): appends of the sheet whose response is lost after their rows are written
+
+    Returns:
+        dict: summary of the run returned by api_data_loader
+    """
+    organizations = [str(i) for i in range(args.chapters)]
+    if args.recording:
+        # The chapters are the organizations whose events were recorded
+        with open(args.recording) as file:
+            organizations = sorted({x.split('/')[1] for x in json.load(file) if x.startswith('organizations/')})
+    chapters = [{'name': f'chapter{x}', 'organization_id': x, 'city': None} for x in organizations]
+    sheets = FakeSheetsClient(latency=args.sheet_latency)
+    spreadsheet = sheets.open(SPREADSHEET)
+    spreadsheet.set_watermark(100, '2000-01-01', 0)
+    spreadsheet.lost_appends = set(lost_appends)
+
+    with mock_process(events=args.events, pages=args.pages, page_size=args.page_size, latency=args.latency,
+                      organizations=args.chapters, recording=args.recording) as base_url:
+        with EventbriteClient(None, base_url=base_url, pool_size=MAX_WORKERS * len(chapters)) as client:
+            # The json logs of the loader are not shown
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = api_data_loader(sheet_client=sheets, api_client=client, chapters=chapters)
+
+    written = len(spreadsheet.get_worksheet(0).values) - 1
+    assert written == summary['rows'], f'{written} rows in the sheet, {summary["rows"]} loaded'
+    row_count = int(spreadsheet.worksheet(WATERMARK_SHEET).values[1][2])
+    assert row_count == written, f'{written} rows in the sheet, {row_count} in the watermark'
+    return summary
+
+
+def best_of(runs: list) -> dict:
+    """
+    Keep the fastest time of the run and of each stage
+
+    Returns:
+        dict: rows, seconds, attendees_per_second and seconds of each stage
+    """
+    seconds = min(x['seconds'] for x in runs)
+    return {'rows': runs[0]['rows'],
+            'seconds': seconds,
+            'attendees_per_second': runs[0]['rows'] / seconds,
+            'stages': {name: min(x['stages'][name]['seconds'] for x in runs) for name in runs[0]['stages']}}
+
+
+def regressions(result: dict, baseline: dict, tolerance: float, stage_tolerance: float) -> list:
+    """
+    Compare a result with the baseline of the same configuration
+
+    Returns:
+        list: description of each value worse than the tolerance
+    """
+    found = []
+    if result['attendees_per_second'] < baseline['attendees_per_second'] * (1 - tolerance):
+        found.append(f"throughput {result['attendees_per_second']:.0f} < {baseline['attendees_per_second']:.0f} "
+                     f"attendees/s")
+    for name, seconds in result['stages'].items():
+        before = baseline['stages'].get(name)
+        if (before is not None and max(seconds, before) >= MIN_STAGE_SECONDS
+                and seconds > before * (1 + stage_tolerance)):
+            found.append(f'{name} {seconds:.3f} s > {before:.3f} s')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=32)
+    parser.add_argument('--pages', type=int, default=4, help='attendee pages by event')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds of latency by eventbrite request')
+    parser.add_argument('--sheet-latency', type=float, default=0.0, help='seconds of latency by sheets call')
+    parser.add_argument('--chapters', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--recording', help='responses saved by mock_eventbrite.RecordingClient')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed loss of throughput')
+    # The stages overlap with the threads of the fetch, their times are noisier than the whole run
+    parser.add_argument('--stage-tolerance', type=float, default=0.5, help='allowed slowdown of a stage')
+    parser.add_argument('--save-baseline', action='store_true', help='save this result as the baseline')
+    args = parser.parse_args()
+
+    # The response of an append is lost after its rows are written, the retry must not write them twice
+    run_loader(args, lost_appends={3})
+
+    result = best_of([run_loader(args) for _ in range(args.repeat)])
+
+    print(f"{result['rows']} attendees in {result['seconds']:.3f} s, "
+          f"{result['attendees_per_second']:.0f} attendees/s")
+    for name, seconds in result['stages'].items():
+        print(f'    {name:<18} {seconds:>8.3f} s')
+
+    # Baselines are kept by configuration of the run
+    configuration = (f'events={args.events} pages={args.pages} page_size={args.page_size} latency={args.latency} '
+                     f'sheet_latency={args.sheet_latency} chapters={args.chapters} recording={args.recording}')
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+
+    if args.save_baseline:
+        baselines[configuration] = result
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as file:
+            json.dump(baselines, file, indent=2)
+        print(f'baseline saved in {args.baseline}')
+    elif configuration not in baselines:
+        print('no baseline for this configuration, save one with --save-baseline')
+    else:
+        found = regressions(result, baselines[configuration], args.tolerance, args.stage_tolerance)
+        for message in found:
+            print(f'REGRESSION {message}')
+        if found:
+            sys.exit(1)
+        print(f'no regression against the baseline (tolerance {args.tolerance:.0%}, '
+              f'{args.stage_tolerance:.0%} by stage)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Peak memory (tracemalloc) of the loader pipeline as the number of events grows.
+
+The streaming pipeline (pages -> chunks -> process_attendees -> sink) is compared with
+processing all the attendees at once. The streaming peak must stay about constant,
+and both must produce the same rows.
+
+Usage:
+    python benchmarks/bench_memory.py [--events 16 64 128] [--chunk-size 1000]
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_function'))
+
+from eventbrite import iter_attendee_pages, fetch_all_attendees
+from eventbrite_client import EventbriteClient
+from transform import process_attendees, chunk_records
+from mock_eventbrite import MockEventbrite
+
+
+def streaming(mock: MockEventbrite, chunk_size: int) -> list:
+    """
+    Process the attendees chunk by chunk, keeping only a small sample of the output
+
+    Returns:
+        list: number of rows and '#' of the last row of each chunk
+    """
+    summary = []
+    previous = None
+    with EventbriteClient(None, base_url=mock.base_url) as client:
+        for records in chunk_records(iter_attendee_pages(list(mock.events), client), chunk_size):
+            df, previous = process_attendees(records, 100, previous)
+            summary.append((len(df), int(df['#'].iloc[-1])))
+    return summary
+
+
+def all_at_once(mock: MockEventbrite) -> pd.DataFrame:
+    with EventbriteClient(None, base_url=mock.base_url) as client:
+        df, _ = process_attendees(fetch_all_attendees(list(mock.events), client), 100)
+    return df
+
+
+def peak(function, *args) -> tuple:
+    tracemalloc.start()
+    result = function(*args)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak_bytes / 2 ** 20, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, nargs='+', default=[16, 64, 128])
+    parser.add_argument('--pages', type=int, default=4)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'events':>6} {'attendees':>9} {'all at once MiB':>15} {'streaming MiB':>13}")
+    peaks = []
+    for events in args.events:
+        with MockEventbrite(events=events, pages=args.pages, page_size=50) as mock:
+            batch_peak, df = peak(all_at_once, mock)
+            stream_peak, summary = peak(streaming, mock, args.chunk_size)
+
+        # Same rows and meeting numbers in both modes
+        assert sum(rows for rows, _ in summary) == len(df)
+        assert summary[-1][1] == df['#'].iloc[-1]
+
+        peaks.append(stream_peak)
+        print(f'{events:>6} {len(df):>9} {batch_peak:>15.1f} {stream_peak:>13.1f}')
+
+    # The streaming peak does not grow with the events (some slack for the allocator and the mock server),
+    # the first size must already be several chunks
+    assert max(peaks) < 1.5 * peaks[0], f'streaming peak memory grows with the events: {peaks}'
+    print('streaming peak memory is bounded')
+
+
+if __name__ == '__main__':
+    main()
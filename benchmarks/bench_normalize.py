@@ -0,0 +1,194 @@
+"""
+Time of the normalization of the survey answers against the previous implementation
+(add_cols with .str.strip().str.title() by row, then Series.replace), on a large
+synthetic frame of answers written with accent, case and spelling variants.
+
+The normalizer is first checked against the golden set of answers (benchmarks/normalize_golden.json),
+e.g. 'Unemployed' must not become 'Employed'. The answers resolved by the previous replacements
+must give the same result, and an answer only changes through an exact entry of the mapping
+tables or, in the fuzzy fields, a close spelling; the variants that only the normalizer resolves
+(e.g. the spanish employment status, that never matched the replacements after .str.title())
+are counted. The script exits with an error on any difference.
+
+Usage:
+    python benchmarks/bench_normalize.py [--rows 300000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'lambda_function'))
+
+from normalize import Normalizer, fold
+from transform import ANSWER_FIELDS, add_answers
+
+COUNTRY_ANSWERS = ['Colombia', 'colombia ', 'COLOMBIA', 'Colmbia', 'México', 'Mexico', 'mexico', 'Méjico',
+                   'Perú', 'peru', 'Venezuela', 'venezuela', 'Venezuala', 'Brasil', 'brasil', 'Canadá',
+                   'Chile', 'Argentina', 'argentína', 'República Dominicana', 'Republica Dominicana',
+                   'Ciudad de México', 'ciudad de mexico', 'El Salvador', 'Ecuador', 'India', 'Yes', '-', '']
+
+EMPLOYMENT_ANSWERS = ['Employed', 'employed', 'Empleado', 'empleado', 'Unemployed and looking for opportunities',
+                      'Employed and looking for opportunities', 'Desempleado y buscando oportunidades',
+                      'desempleado y buscando oportunidades', 'Empleado y en búsqueda de oportunidades',
+                      'Empleado y en busqueda de oportunidades', 'Student', 'Unemployed', 'unemployed ',
+                      'Unemployed.', '']
+
+GOLDEN_PATH = os.path.join(BENCHMARKS, 'normalize_golden.json')
+
+
+# Previous implementation --------------------------------------------------
+
+replacements = {
+    '': np.nan, 'Canadá': 'Canada', 'Perú': 'Peru', 'España': 'Spain', 'México': 'Mexico',
+    'República Dominicana': 'Dominican Republic', '-': np.nan, 'Not': np.nan, 'nan': np.nan,
+    'Alberta, British Columbia And Calgary.': 'Canada', 'Brasil': 'Brazil', 'Amazonia': 'Colombia',
+    'Dr': np.nan, 'Yes': np.nan, 'Spain/Colombia': 'Colombia', 'X': np.nan, 'Na,India': np.nan,
+    'None (Spain)': np.nan, 'India': np.nan, 'South Africa': np.nan, 'Puebla, México': 'Mexico',
+    'Ciudad De México': 'Mexico', 'Coló Me La': np.nan, 'Born In Canada.': np.nan, 'Mex': np.nan,
+}
+
+replacementsEmploymentStatus = {
+    'Empleado': 'Employed',
+    'Empleado en búsqueda de nuevas oportunidades': 'Employed and looking for opportunities',
+    'Desempleado y buscando oportunidades': 'Unemployed and looking for opportunities',
+    'Empleado y en búsqueda de oportunidades': 'Employed and looking for opportunities',
+    '': np.nan,
+}
+
+
+def add_cols(df: pd.DataFrame, field1: str, field2: str, result_field: str):
+    df[field1] = df[field1].fillna('')
+    df[field2] = df[field2].fillna('')
+    df[result_field] = (df[field1] + df[field2]).str.strip()
+    df[result_field] = df[result_field].str.title()
+
+
+def legacy_answers(df: pd.DataFrame) -> pd.DataFrame:
+    for field, (english, spanish) in ANSWER_FIELDS.items():
+        add_cols(df, english, spanish, field)
+    df['Country of Origin'] = df['Country of Origin'].replace(replacements)
+    df['Employment Status'] = df['Employment Status'].replace(replacementsEmploymentStatus)
+    df['Employment Status'] = df['Employment Status'].str.capitalize()
+    return df
+
+
+# --------------------------------------------------------------------------
+
+def synthetic_frame(rows: int) -> pd.DataFrame:
+    """
+    Answers split between the english and the spanish question, a third in spanish
+    """
+    rng = np.random.default_rng(0)
+    spanish = rng.random(rows) < 1 / 3
+    columns = {
+        'Country of Origin': rng.choice(COUNTRY_ANSWERS, rows),
+        'Area of Expertise': rng.choice(['data analysis', 'Software Development', 'marketing ', 'finance'], rows),
+        'Employment Status': rng.choice(EMPLOYMENT_ANSWERS, rows),
+        'Employer': rng.choice(['rbc', 'TD Bank', 'shopify', ''], rows),
+        'Dream Job': rng.choice(['data scientist', 'Product Manager', ''], rows),
+        'Linkedin': np.array([f'linkedin.com/in/person{x}' for x in rng.integers(0, 20000, rows)], dtype=object),
+    }
+    df = pd.DataFrame(index=range(rows))
+    for field, (english, spanish_question) in ANSWER_FIELDS.items():
+        answers = pd.Series(columns[field], dtype=object)
+        df[english] = answers.where(~spanish, None)
+        df[spanish_question] = answers.where(spanish, None)
+    return df
+
+
+def check_golden(normalizer: Normalizer) -> tuple:
+    """
+    Answers of the golden set that the normalizer does not normalize as expected
+
+    Returns:
+        tuple: field, answer, expected and normalized value of each difference, and the number of answers
+    """
+    with open(GOLDEN_PATH, encoding='utf-8') as file:
+        golden = json.load(file)
+    differences = []
+    for answer in golden:
+        normalized = normalizer.normalize_value(answer['answer'], answer['field'])
+        if normalized != answer['normalized']:
+            differences.append((answer['field'], answer['answer'], answer['normalized'], normalized))
+    return differences, len(golden)
+
+
+def unexpected_changes(normalizer: Normalizer, field: str, before: pd.Series, after: pd.Series) -> list:
+    """
+    Answers of the previous implementation changed without an exact entry of the mapping tables
+
+    The previous answers that were canonical or dropped must not change. The others only change
+    when their folded key is in the tables, or by a close spelling in the fuzzy fields; a spelling
+    that contains the new value or is contained in it (e.g. 'Unemployed' and 'Employed') is a
+    different answer, not a variant.
+
+    Returns:
+        list: previous and new value of each unexpected change
+    """
+    table = normalizer.tables[field]
+    known = set(table['canonical']) | {x for x in table['replacements'].values() if x is not None}
+    lookup = {fold(x) for x in table['canonical']} | {fold(x) for x in table['replacements']}
+    changed = pd.DataFrame({'before': before, 'after': after})[before.astype(str) != after.astype(str)]
+    changes = []
+    for old, new in changed.drop_duplicates().itertuples(index=False):
+        canonical = pd.isna(old) or old in known
+        close = (table.get('fuzzy', False) and new is not None
+                 and fold(new) not in fold(old) and fold(old) not in fold(new))
+        mapped = not canonical and (fold(old) in lookup or close)
+        if not mapped:
+            changes.append((old, new))
+    return changes
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300000)
+    args = parser.parse_args()
+
+    load_time, normalizer = timed(Normalizer.from_file)
+    differences, answers = check_golden(normalizer)
+    for field, answer, expected, normalized in differences:
+        print(f'{field}: {answer!r} expected {expected!r}, normalized {normalized!r}')
+    print(f'golden set: {answers - len(differences)} of {answers} answers normalized as expected')
+    if differences:
+        sys.exit(1)
+
+    df = synthetic_frame(args.rows)
+    legacy_time, expected = timed(legacy_answers, df.copy())
+    new_time, result = timed(add_answers, df.copy())
+
+    print(f'{args.rows} attendees, mapping tables loaded in {load_time * 1000:.1f} ms')
+    print(f'previous {legacy_time:.3f} s, normalizer {new_time:.3f} s, speedup {legacy_time / new_time:.1f}x')
+
+    failed = False
+    for field in ANSWER_FIELDS:
+        before = expected[field].astype(str).to_numpy()
+        after = result[field].astype(str).to_numpy()
+        if field in normalizer.tables:
+            changes = unexpected_changes(normalizer, field, expected[field], result[field])
+            for old, new in changes:
+                print(f'{field}: {old!r} changed to {new!r} without an entry of the mapping tables')
+            failed |= bool(changes)
+            print(f'{field:>18} {expected[field].nunique():>4} -> {result[field].nunique():>4} distinct values, '
+                  f'{(before != after).sum():>7} variants resolved')
+        elif (before != after).any():
+            print(f'{field}: the answers changed')
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
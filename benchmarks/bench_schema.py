@@ -0,0 +1,141 @@
+"""
+Memory and groupby time of the N2N database read as text (object columns, the way the
+sheet values were loaded) against the same rows typed with schema.COLUMN_DTYPES.
+
+The summary tables of the dashboard are computed from both frames and compared. The dates of a
+sheet with the historic long dates and the dates written by the loader ('September 07, 2023'
+and '09/07/2023'), in either order, must all be read; the script exits with an error otherwise.
+
+Usage:
+    python benchmarks/bench_schema.py [--rows 300000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda_function'))
+sys.path.insert(0, os.path.join(ROOT, 'dash_app'))
+
+from schema import COLUMN_DTYPES, apply_schema
+from aggregates import compute_aggregates, filter_attendees
+
+INDUSTRIES = ['Tech', 'Finance', 'Marketing', 'Engineering', 'Healthcare', 'Data',
+              'Workshop: LinkedIn Workshop to Advance Your Career', 'Networking Night']
+COUNTRIES = ['Colombia', 'Mexico', 'Peru', 'Venezuela', 'Brazil', 'Chile', 'Argentina', 'Ecuador', '']
+EMPLOYMENT = ['Employed', 'Unemployed and looking for opportunities', 'Employed and looking for opportunities',
+              'Student', '']
+
+
+def sheet_values(rows: int) -> list:
+    """
+    Values of a synthetic sheet as returned by get_all_values: header and rows of text
+    """
+    rng = np.random.default_rng(0)
+    meetings = max(rows // 60, 1)
+    meeting = np.sort(rng.integers(0, meetings, rows))
+    dates = pd.date_range('2020-10-01', '2024-06-30', periods=meetings).strftime('%B %d, %Y')
+    cities = np.where(np.arange(meetings) % 5 == 0, 'Montreal', 'Toronto')
+    columns = {
+        '#': (meeting + 1).astype(str),
+        'Date': dates[meeting],
+        'City': cities[meeting],
+        'Season': (meeting * 9 // meetings + 1).astype(str),
+        'Industry / Event': rng.choice(INDUSTRIES, meetings)[meeting],
+        'Format': np.where(np.arange(meetings) % 3 == 0, 'In Person', 'Online')[meeting],
+        'Attendance': rng.choice(['Attending', 'Checked In'], rows),
+        'Email': np.char.add(np.char.add('person', rng.integers(0, rows, rows).astype(str)), '@example.com'),
+        'First Name': np.char.add('Name', rng.integers(0, 5000, rows).astype(str)),
+        'Last Name': np.char.add('Last', rng.integers(0, 5000, rows).astype(str)),
+        'Country of Origin': rng.choice(COUNTRIES, rows),
+        'Area of Expertise': rng.choice(['Data Analysis', 'Software Development', 'Marketing', ''], rows),
+        'Employment Status': rng.choice(EMPLOYMENT, rows),
+        'Employer': rng.choice(['Rbc', 'Td Bank', 'Shopify', ''], rows),
+        'Dream Job': rng.choice(['Data Scientist', 'Product Manager', ''], rows),
+        'Linkedin': np.char.add('linkedin.com/in/person', rng.integers(0, 20000, rows).astype(str)),
+    }
+    return [list(COLUMN_DTYPES)] + np.column_stack([columns[x] for x in COLUMN_DTYPES]).tolist()
+
+
+def unread_mixed_dates(rows: int = 1000) -> dict:
+    """
+    Dates of a sheet with the historic and the loader formats that apply_schema leaves empty
+
+    Returns:
+        dict: order of the formats: number of dates that were not read
+    """
+    dates = pd.Series(pd.date_range('2020-10-01', periods=rows, freq='W'))
+    long_dates, loader_dates = dates.dt.strftime('%B %d, %Y'), dates.dt.strftime('%m/%d/%Y')
+    half = rows // 2
+    sheets = {
+        'historic first': pd.concat([long_dates[:half], loader_dates[half:]]),
+        'loader first': pd.concat([loader_dates[:half], long_dates[half:]]),
+    }
+    unread = {}
+    for order, values in sheets.items():
+        parsed = apply_schema(pd.DataFrame({'Date': values.astype(object)}))['Date']
+        unread[order] = int((parsed != dates).sum())
+    return unread
+
+
+def best_time(function, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    unread = unread_mixed_dates()
+    for order, count in unread.items():
+        print(f'mixed date formats, {order}: {count} dates not read')
+    if any(unread.values()):
+        sys.exit(1)
+
+    data = sheet_values(args.rows)
+    text = pd.DataFrame(data[1:], columns=data[0])
+    typed = apply_schema(text)
+
+    print(f'{args.rows} attendees')
+    print(f"{'column':>18} {'object MiB':>10} {'typed MiB':>9}  type")
+    text_memory = text.memory_usage(deep=True, index=False) / 2 ** 20
+    typed_memory = typed.memory_usage(deep=True, index=False) / 2 ** 20
+    for column in COLUMN_DTYPES:
+        print(f'{column:>18} {text_memory[column]:>10.1f} {typed_memory[column]:>9.1f}  {typed[column].dtype}')
+    print(f"{'total':>18} {text_memory.sum():>10.1f} {typed_memory.sum():>9.1f}")
+
+    # The summary tables of the dashboard give the same counts with both frames
+    expected, result = compute_aggregates(text), compute_aggregates(typed)
+    for name, table in expected.items():
+        fields = [x for x in table.columns if x != 'count']
+        left = table.astype(str).sort_values(fields).reset_index(drop=True)
+        right = result[name].astype(str).sort_values(fields).reset_index(drop=True)
+        assert left.equals(right), name
+
+    print(f"\n{'operation':>18} {'object s':>10} {'typed s':>9} {'speedup':>8}")
+    operations = [
+        ('summary tables', compute_aggregates),
+        ('filter + tables', lambda df: compute_aggregates(filter_attendees(df, cities=('Toronto',),
+                                                                          formats=('Online',)))),
+        ('groupby country', lambda df: df.groupby('Country of Origin', observed=True).size()),
+        ('groupby industry', lambda df: df.groupby(['Industry / Event', 'Format'], observed=True).size()),
+    ]
+    for name, operation in operations:
+        text_time = best_time(lambda: operation(text), args.repeat)
+        typed_time = best_time(lambda: operation(typed), args.repeat)
+        print(f'{name:>18} {text_time:>10.3f} {typed_time:>9.3f} {text_time / typed_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Load test of the dashboard served by gunicorn (dash_app/gunicorn.conf.py) with a growing
+number of workers: requests per second, median and p95 latency, and the memory of the
+workers (PSS, the shared pages of the snapshot are divided among the processes).
+
+The requests are a mix of page loads, layouts and figures, with and without filters. The
+dashboard runs on a synthetic snapshot, without the Google sheet.
+
+Usage:
+    python benchmarks/bench_serving.py [--workers 1 2 4] [--concurrency 16] [--seconds 10] [--rows 100000]
+"""
+import argparse
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DASH_APP = os.path.join(BENCHMARKS, '..', 'dash_app')
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'lambda_function'))
+sys.path.insert(0, DASH_APP)
+
+import pyarrow.parquet as pq
+
+from data_cache import df_to_table, values_to_df
+from bench_schema import sheet_values
+
+PATHS = ['/', '/_dash-layout', '/figures/fig1.json?v=v1', '/figures/fig5.json?v=v1', '/figures/fig7.json?v=v1',
+         '/figures/fig2.json?v=v1&city=Toronto', '/figures/fig6.json?v=v1&season=3&format=Online']
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def pss_mb(pid: int) -> float:
+    # Proportional memory of a process and its children, 0 where /proc is not available
+    total = 0.0
+    try:
+        children = open(f'/proc/{pid}/task/{pid}/children').read().split()
+        for process in [str(pid)] + children:
+            for line in open(f'/proc/{process}/smaps_rollup'):
+                if line.startswith('Pss:'):
+                    total += int(line.split()[1]) / 1024
+    except OSError:
+        return 0.0
+    return total
+
+
+def start_server(workers: int, port: int, environment: dict) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                                '--bind', f'127.0.0.1:{port}', '--workers', str(workers)],
+                               cwd=DASH_APP, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}/'
+    for _ in range(600):
+        try:
+            requests.get(url, timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('gunicorn did not start')
+
+
+def load(port: int, concurrency: int, seconds: float) -> list:
+    """
+    Send requests from concurrency threads during seconds
+
+    Returns:
+        list: latency in seconds of each request
+    """
+    latencies, lock = [], threading.Lock()
+    paths = itertools.cycle(PATHS)
+    end = time.perf_counter() + seconds
+
+    def run():
+        with requests.Session() as session:
+            session.headers['Accept-Encoding'] = 'gzip'
+            while time.perf_counter() < end:
+                with lock:
+                    path = next(paths)
+                start = time.perf_counter()
+                response = session.get(f'http://127.0.0.1:{port}{path}')
+                latency = time.perf_counter() - start
+                assert response.ok, (path, response.status_code)
+                with lock:
+                    latencies.append(latency)
+
+    threads = [threading.Thread(target=run) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        environment = dict(os.environ,
+                           N2N_SNAPSHOT_PATH=os.path.join(directory, 'snapshot.parquet'),
+                           N2N_AGGREGATES_PATH=os.path.join(directory, 'aggregates'))
+        df = values_to_df(sheet_values(args.rows))
+        pq.write_table(df_to_table(df, {'modified_time': 'v1', 'saved_at': time.time()}),
+                       environment['N2N_SNAPSHOT_PATH'])
+
+        print(f'{os.cpu_count()} cpus, {args.concurrency} concurrent clients, {args.seconds:.0f} s by run')
+        print(f"{'workers':>7} {'requests':>8} {'req/s':>7} {'p50 ms':>7} {'p95 ms':>7} {'PSS MiB':>8}")
+        for workers in args.workers:
+            port = free_port()
+            process = start_server(workers, port, environment)
+            try:
+                # The first requests of each worker are not measured
+                load(port, args.concurrency, 1)
+                latencies = np.array(load(port, args.concurrency, args.seconds))
+                memory = pss_mb(process.pid)
+            finally:
+                process.terminate()
+                process.wait()
+            print(f'{workers:>7} {len(latencies):>8} {len(latencies) / args.seconds:>7.0f} '
+                  f'{np.percentile(latencies, 50) * 1000:>7.1f} {np.percentile(latencies, 95) * 1000:>7.1f} '
+                  f'{memory:>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Time of each transformation stage of the loader against the previous row-wise
+implementation (apply / iterrows), on a large synthetic attendee frame.
+
+The result of every stage is compared with the previous implementation.
+
+Usage:
+    python benchmarks/bench_transforms.py [--rows 200000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_function'))
+
+from transform import add_date, add_event_fields, add_season, add_meeting_number
+
+HISTORIC_EVENT_NAMES = [
+    'NotWorking to Networking | Latinos in Tech',
+    'Latinos in Finance | NotWorking2Networking',
+    'Latinos in Marketing | NotWorking to Networking In Person',
+    'N2N Montreal | Latinos in Engineering',
+    'Latinos in Engineering | N2N Montreal In Person',
+    'Latinos in Healthcare | Not working to Networking Montreal',
+    'Workshop: LinkedIn Workshop to Advance Your Career',
+    'Workshop: Top 22 Tips to Get a Job in 2022 | N2N',
+    'Latinos in Data | Toronto | NotWorking2Networking',
+    'Networking Night | Special Edition',
+]
+
+
+# Previous implementation --------------------------------------------------
+
+def extract_city(event_name: str) -> str:
+    return "Montreal" if "Montreal" in event_name else "Toronto"
+
+
+def return_season_toronto(meeting_date) -> int:
+    if meeting_date <= datetime(2021, 3, 4): return 1
+    elif meeting_date <= datetime(2021, 6, 10): return 2
+    elif meeting_date <= datetime(2021, 12, 9): return 3
+    elif meeting_date <= datetime(2022, 4, 14): return 4
+    elif meeting_date <= datetime(2022, 7, 28): return 5
+    elif meeting_date <= datetime(2022, 11, 7): return 6
+    elif meeting_date <= datetime(2023, 4, 6): return 7
+    elif meeting_date <= datetime(2023, 6, 29): return 8
+    else: return 9
+
+
+def season_based_on_city(row) -> int:
+    if row['City'] == 'Toronto':
+        return return_season_toronto(row['Date'])
+    elif row['City'] == 'Montreal':
+        return 1
+    return None
+
+
+def extractName(eventName: str) -> str:
+    if "|" in eventName:
+        split_result = eventName.split('|')
+        eventNameBefore = split_result[0]
+        eventNameAfter = split_result[1]
+
+        if "NotWorking to Networking" in eventNameBefore or "NotWorking2Networking" in eventNameBefore:
+            eventName = eventNameAfter
+        elif ("NotWorking to Networking" in eventNameAfter or "NotWorking2Networking" in eventNameAfter
+              or "N2N Montreal" in eventNameAfter or "N2N" in eventNameAfter
+              or 'Not working to Networking Montreal' in eventNameAfter):
+            eventName = eventNameBefore
+
+        if 'Latinos in ' in eventName:
+            return eventName.split('Latinos in ')[1].strip()
+        return eventName.strip()
+    return eventName.strip()
+
+
+def returnFormat(eventName: str) -> str:
+    return "In Person" if "In Person" in eventName else "Online"
+
+
+def meeting_counter(df: pd.DataFrame, max_number: int) -> list:
+    counter_values = []
+    prev_date = None
+    prev_city = None
+    counter = 0
+    for index, row in df.iterrows():
+        if row['Date'] != prev_date or row['City'] != prev_city:
+            counter += 1
+        counter_values.append(counter)
+        prev_date = row['Date']
+        prev_city = row['City']
+    return [x + max_number for x in counter_values]
+
+
+# --------------------------------------------------------------------------
+
+def synthetic_frame(rows: int) -> pd.DataFrame:
+    """
+    Attendees sorted by meeting, about 60 attendees by meeting
+    """
+    rng = np.random.default_rng(0)
+    meetings = max(rows // 60, 1)
+    meeting_of_row = np.sort(rng.integers(0, meetings, rows))
+    dates = pd.date_range('2020-10-01', '2024-06-30', periods=meetings).normalize() + pd.Timedelta(hours=18)
+    names = rng.choice(HISTORIC_EVENT_NAMES, meetings)
+    return pd.DataFrame({'Event Name': names[meeting_of_row],
+                         'Date Attending': dates[meeting_of_row].strftime('%Y-%m-%dT%H:%M:%S')})
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.rows)
+    # Date and City are inputs of the season and the meeting number stages,
+    # the stages only add their own column so they can run over the same frames
+    base = add_date(add_event_fields(df.copy()))
+
+    stages = [
+        ('City', lambda: df['Event Name'].apply(extract_city),
+         lambda: add_event_fields(df)['City']),
+        ('Season', lambda: base.apply(season_based_on_city, axis=1),
+         lambda: add_season(base)['Season']),
+        ('Industry / Event', lambda: df['Event Name'].apply(extractName),
+         lambda: add_event_fields(df)['Industry / Event']),
+        ('Format', lambda: df['Event Name'].apply(returnFormat),
+         lambda: add_event_fields(df)['Format']),
+        ('#', lambda: pd.Series(meeting_counter(base, 100)),
+         lambda: add_meeting_number(base, 100)['#']),
+    ]
+
+    print(f'{args.rows} attendees')
+    print(f"{'stage':>17} {'row-wise s':>10} {'vectorized s':>12} {'speedup':>8}")
+    for name, legacy, vectorized in stages:
+        legacy_time, expected = timed(legacy)
+        new_time, result = timed(vectorized)
+        assert (result.astype(str).to_numpy() == expected.astype(str).to_numpy()).all(), name
+        print(f'{name:>17} {legacy_time:>10.3f} {new_time:>12.3f} {legacy_time / new_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+In-memory stand-in of the gspread client used by the benchmarks.
+
+It keeps the values of each worksheet in lists and implements the calls made by the
+loader and the dashboard, with an optional latency per call to imitate the Sheets api.
+"""
+import time
+from datetime import datetime, timezone
+
+import gspread
+import requests
+
+from sheet_store import WATERMARK_HEADER, WATERMARK_SHEET
+from transform import OUTPUT_COLUMNS
+
+
+class FakeWorksheet:
+    """
+    Worksheet whose cells are a list of rows of text
+
+    Args:
+        spreadsheet (FakeSpreadsheet): spreadsheet of the worksheet
+        title (str): name of the tab
+        values (list, optional): initial rows
+    """
+
+    def __init__(self, spreadsheet, title: str, values: list = None):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.values = [[str(x) for x in row] for row in values or []]
+        self.row_count = max(len(self.values), 1)
+
+    def _call(self, kind: str):
+        self.spreadsheet.call(kind)
+
+    def get_all_values(self) -> list:
+        self._call('read')
+        width = max((len(x) for x in self.values), default=0)
+        return [row + [''] * (width - len(row)) for row in self.values]
+
+    def col_values(self, col: int) -> list:
+        self._call('read')
+        return [row[col - 1] for row in self.values if len(row) >= col and row[col - 1] != '']
+
+    def row_values(self, row: int) -> list:
+        self._call('read')
+        return list(self.values[row - 1]) if row <= len(self.values) else []
+
+    def add_rows(self, rows: int):
+        self._call('write')
+        self.row_count += rows
+
+    def get(self, range_name: str) -> list:
+        # Rows of a range 'A5:B10', without the empty cells at the end of each row
+        self._call('read')
+        (first_row, first_col), (last_row, last_col) = self._range(range_name)
+        rows = [row[first_col - 1:last_col] for row in self.values[first_row - 1:last_row]]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        return [row[:max((i + 1 for i, x in enumerate(row) if x != ''), default=0)] for row in rows]
+
+    @staticmethod
+    def _range(range_name: str) -> tuple:
+        first, _, last = range_name.partition(':')
+        return gspread.utils.a1_to_rowcol(first), gspread.utils.a1_to_rowcol(last or first)
+
+    def _write(self, range_name: str, values: list):
+        (first_row, first_col), _ = self._range(range_name)
+        for i, row in enumerate(values, start=first_row - 1):
+            while len(self.values) <= i:
+                self.values.append([])
+            current = self.values[i] + [''] * (first_col - 1 - len(self.values[i]))
+            self.values[i] = current[:first_col - 1] + [str(x) for x in row] + current[first_col - 1 + len(row):]
+        self.row_count = max(self.row_count, len(self.values))
+
+    def update(self, range_name: str, values: list, **kwargs):
+        self._call('write')
+        self._write(range_name, values)
+
+    def batch_update(self, data: list, **kwargs):
+        # All the ranges are written in a single request
+        self._call('write')
+        for item in data:
+            self._write(item['range'], item['values'])
+
+    def append_rows(self, values: list, **kwargs):
+        self._call('write')
+        self.values.extend([str(x) for x in row] for row in values)
+        self.row_count = max(self.row_count, len(self.values))
+        self.spreadsheet.appends += 1
+        if self.spreadsheet.appends in self.spreadsheet.lost_appends:
+            raise requests.ConnectionError('the response of the append was lost')
+        return {'updates': {'updatedRows': len(values)}}
+
+
+class FakeSpreadsheet:
+    """
+    Spreadsheet made of FakeWorksheets, the first one is the database
+
+    Args:
+        title (str): name of the spreadsheet
+        latency (float, optional): seconds waited by each call to the api
+    """
+
+    def __init__(self, title: str, latency: float = 0.0):
+        self.title = title
+        self.latency = latency
+        self.calls = {'read': 0, 'write': 0}
+        # Numbers (from 1) of the appends whose rows are written but whose response is lost
+        self.appends = 0
+        self.lost_appends = set()
+        self.worksheets = [FakeWorksheet(self, 'Database', [OUTPUT_COLUMNS])]
+        self._touch()
+
+    def _touch(self):
+        self.last_update = datetime.now(timezone.utc).isoformat()
+
+    def call(self, kind: str):
+        self.calls[kind] += 1
+        if kind == 'write':
+            self._touch()
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_lastUpdateTime(self) -> str:
+        self.call('read')
+        return self.last_update
+
+    def get_worksheet(self, index: int) -> FakeWorksheet:
+        return self.worksheets[index]
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        for worksheet in self.worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise gspread.WorksheetNotFound(title)
+
+    def add_worksheet(self, title: str, rows: int, cols: int) -> FakeWorksheet:
+        self.call('write')
+        worksheet = FakeWorksheet(self, title)
+        worksheet.row_count = rows
+        self.worksheets.append(worksheet)
+        return worksheet
+
+    def set_watermark(self, last_number: int, last_date: str, row_count: int):
+        """Write the watermark tab, e.g. the point where a replayed run starts"""
+        try:
+            worksheet = self.worksheet(WATERMARK_SHEET)
+        except gspread.WorksheetNotFound:
+            worksheet = FakeWorksheet(self, WATERMARK_SHEET)
+            self.worksheets.append(worksheet)
+        worksheet.values = [list(WATERMARK_HEADER), [str(last_number), last_date, str(row_count)]]
+
+
+class FakeSheetsClient:
+    """
+    Client that opens FakeSpreadsheets by name, creating them the first time
+
+    Args:
+        latency (float, optional): seconds waited by each call to the api
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.spreadsheets = {}
+
+    def open(self, title: str) -> FakeSpreadsheet:
+        if title not in self.spreadsheets:
+            self.spreadsheets[title] = FakeSpreadsheet(title, self.latency)
+        return self.spreadsheets[title]
@@ -0,0 +1,265 @@
+"""
+Local stand-in of the Eventbrite api used by the benchmarks.
+
+It serves synthetic organizations, events and paginated attendees, or the responses
+recorded from the real api with RecordingClient, with an optional latency per request,
+so the loader can be measured without network.
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from eventbrite_client import EventbriteClient
+
+EVENT_NAMES = ['NotWorking to Networking | Latinos in Tech',
+               'Latinos in Finance | NotWorking2Networking In Person',
+               'N2N Montreal | Latinos in Engineering',
+               'Workshop: LinkedIn Workshop to Advance Your Career']
+
+COUNTRIES = ['Colombia', 'México', 'Perú', 'Venezuela', 'Brasil', 'Chile', '', 'Canadá']
+
+EMPLOYMENT = ['Unemployed and looking for opportunities', 'Employed', 'Empleado',
+              'Desempleado y buscando oportunidades', '']
+
+
+def response_key(path: str, params: dict = None) -> str:
+    """
+    Key of a response in a recording: path without slashes at the ends and sorted query parameters
+
+    Args:
+        path (str): path of the resource relative to the api root, e.g. 'events/123/attendees'
+        params (dict, optional): query parameters of the request
+
+    Returns:
+        str: e.g. 'events/123/attendees?page=2'
+    """
+    key = path.strip('/')
+    if params:
+        key += '?' + urlencode(sorted((k, str(v)) for k, v in params.items()))
+    return key
+
+
+def synthetic_attendee(event_id: str, number: int) -> dict:
+    """
+    Build an attendee with the same structure returned by Eventbrite
+
+    Args:
+        event_id (str): id of the event
+        number (int): position of the attendee in the event
+
+    Returns:
+        dict: attendee information
+    """
+    spanish = number % 3 == 0
+    answers = [
+        {'question': '¿De qué país eres en América Latina? (si aplica)' if spanish else
+         'What country are you from in Latin America? (if applicable)',
+         'answer': COUNTRIES[number % len(COUNTRIES)]},
+        {'question': '¿Cuál es tu situación laboral?' if spanish else "What's your employment status?",
+         'answer': EMPLOYMENT[number % len(EMPLOYMENT)]},
+        {'question': 'What area/subject do you specialize in? (in this industry)',
+         'answer': 'data analysis'},
+        # Questions without an answer do not have the 'answer' key
+        {'question': 'What is your dream job in Canada?'},
+    ]
+    return {
+        'id': f'{event_id}-{number}',
+        'status': 'Attending' if number % 4 else 'Checked In',
+        'profile': {'email': f'person{number}@example.com',
+                    'first_name': f'Name{number}',
+                    'last_name': f'Last{event_id}'},
+        'answers': answers,
+    }
+
+
+class MockEventbrite:
+    """
+    Threaded http server that imitates the endpoints used by the loader
+
+    Args:
+        events (int): number of events of the organization
+        pages (int): attendee pages by event
+        page_size (int): attendees by page
+        latency (float): seconds to wait before answering each request
+        first_date (str): date of the first event, one event per week after it
+        fail_every (int): answer 429 (rate limit) to one of each fail_every requests, 0 never
+        organizations (int): organizations ('0', '1', ...) that take turns to organize the events
+        recording (str): json file saved by RecordingClient, its responses are served before the synthetic ones
+        etags (bool): send an ETag with each response and answer 304 when If-None-Match is the same
+        listing_size (int): events by page of the listing of an organization, with a continuation to the next page
+    """
+
+    def __init__(self, events: int = 4, pages: int = 2, page_size: int = 50, latency: float = 0.0,
+                 first_date: str = '2023-09-07', fail_every: int = 0, organizations: int = 1,
+                 recording: str = None, etags: bool = True, listing_size: int = 50):
+        self.responses = {}
+        if recording:
+            with open(recording) as file:
+                self.responses = json.load(file)
+        self._recorded_paths = {}
+        for key, body in self.responses.items():
+            self._recorded_paths.setdefault(key.split('?')[0], body)
+        self.pages = pages
+        self.page_size = page_size
+        self.listing_size = listing_size
+        self.latency = latency
+        self.fail_every = fail_every
+        self.etags = etags
+        self.requests = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+
+        start = datetime.strptime(first_date, '%Y-%m-%d')
+        self.organizations = [str(x) for x in range(organizations)]
+        self.events = {}
+        for i in range(events):
+            event_id = str(1000 + i)
+            self.events[event_id] = {
+                'id': event_id,
+                'name': {'text': EVENT_NAMES[i % len(EVENT_NAMES)]},
+                'start': {'local': (start + timedelta(weeks=i // organizations)).strftime('%Y-%m-%dT18:00:00')},
+                'organization_id': self.organizations[i % organizations],
+            }
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address
+        return f'http://{host}:{port}/v3'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def route(self, path: str, query: dict) -> dict:
+        """
+        Answer a request of the api
+
+        Args:
+            path (str): path of the url
+            query (dict): parsed query string
+
+        Returns:
+            dict: json body of the response, None when the path does not exist
+        """
+        parts = [x for x in path.split('/') if x][1:]  # drop 'v3'
+
+        # Recorded responses, a request with other parameters (e.g. the dates of the listing of
+        # events) gets the first response recorded for its path
+        key = response_key('/'.join(parts), {k: v[0] for k, v in query.items()})
+        if key in self.responses:
+            return self.responses[key]
+        if key.split('?')[0] in self._recorded_paths:
+            return self._recorded_paths[key.split('?')[0]]
+
+        if len(parts) == 3 and parts[0] == 'organizations' and parts[2] == 'events':
+            range_start = query.get('start_date.range_start', ['0000'])[0]
+            range_end = query.get('start_date.range_end', ['9999'])[0]
+            # Any organization id is accepted when there is only one
+            events = [x for x in self.events.values()
+                      if range_start <= x['start']['local'][:10] <= range_end
+                      and (len(self.organizations) == 1 or x['organization_id'] == parts[1])]
+            if not events:
+                return {'pagination': {'object_count': 0, 'has_more_items': False}}
+            # The continuation is the position of the first event of the page
+            first = int(query.get('continuation', ['0'])[0])
+            page = events[first:first + self.listing_size]
+            more = first + self.listing_size < len(events)
+            pagination = {'object_count': len(events), 'page_size': self.listing_size, 'has_more_items': more}
+            if more:
+                pagination['continuation'] = str(first + self.listing_size)
+            return {'events': page, 'pagination': pagination}
+
+        if len(parts) == 2 and parts[0] == 'events' and parts[1] in self.events:
+            return self.events[parts[1]]
+
+        if len(parts) == 3 and parts[0] == 'events' and parts[2] == 'attendees' and parts[1] in self.events:
+            page = int(query.get('page', ['1'])[0])
+            first = (page - 1) * self.page_size
+            attendees = [synthetic_attendee(parts[1], n) for n in range(first, first + self.page_size)]
+            return {'attendees': attendees,
+                    'pagination': {'page_number': page, 'page_count': self.pages,
+                                   'object_count': self.pages * self.page_size}}
+
+        return None
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with mock._lock:
+                    mock.requests += 1
+                    rate_limited = mock.fail_every and mock.requests % mock.fail_every == 0
+                if mock.latency:
+                    time.sleep(mock.latency)
+
+                url = urlparse(self.path)
+                body = None if rate_limited else mock.route(url.path, parse_qs(url.query))
+                if rate_limited:
+                    status, body = 429, {'error': 'HIT_RATE_LIMIT'}
+                elif body is None:
+                    status, body = 404, {'error': 'NOT_FOUND'}
+                else:
+                    status = 200
+                payload = json.dumps(body).encode()
+
+                # The ETag is the hash of the body, an unchanged body is not sent again
+                etag = f'"{hashlib.md5(payload).hexdigest()}"' if mock.etags and status == 200 else None
+                if etag is not None and self.headers.get('If-None-Match') == etag:
+                    status, payload = 304, b''
+                    with mock._lock:
+                        mock.not_modified += 1
+
+                self.send_response(status)
+                if rate_limited:
+                    self.send_header('Retry-After', '0')
+                if etag is not None:
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class RecordingClient(EventbriteClient):
+    """
+    Eventbrite client that keeps the responses it receives, to replay them later with MockEventbrite
+
+    Args:
+        *args, **kwargs: arguments of EventbriteClient
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.responses = {}
+
+    def get(self, path: str, params: dict = None) -> dict:
+        body = super().get(path, params)
+        relative = path[len(self.base_url):] if path.startswith('http') else path
+        with self._lock:
+            self.responses[response_key(relative, params)] = body
+        return body
+
+    def save(self, path: str):
+        with open(path, 'w') as file:
+            json.dump(self.responses, file)
@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+
+import pandas as pd
+from decouple import config
+
+# The identities of the attendees are shared with the loader
+from shared import drop_duplicate_attendees, person_ids
+
+AGGREGATES_PATH = config('N2N_AGGREGATES_PATH',
+                         default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'aggregates'))
+
+# Summary tables of the figures, name: fields counted together
+AGGREGATES = {
+    'employment': ['Employment Status'],
+    'format': ['Format'],
+    'city': ['City'],
+    'country': ['Country of Origin'],
+    'attendance': ['Date', 'Attendance'],
+    'industry_format': ['Industry / Event', 'Format'],
+    # Meetings of each person, identified by a hash of the email
+    'attendee': ['Attendee'],
+}
+
+
+def fill_unanswered(table: pd.DataFrame, fields: list) -> pd.DataFrame:
+    # The fields not answered are '' in the sheet and empty (<NA>) in the rows of the loader
+    # saved in the archive, both are counted as ''
+    columns = {}
+    for field in fields:
+        column = table[field]
+        if field in ('Date', 'Attendee') or not column.hasnans:
+            continue
+        if isinstance(column.dtype, pd.CategoricalDtype) and '' not in column.cat.categories:
+            column = column.cat.add_categories('')
+        columns[field] = column.fillna('')
+    return table.assign(**columns) if columns else table
+
+
+def compute_aggregates(df: pd.DataFrame) -> dict:
+    """
+    Count the attendees by the fields of each summary table, a person is counted once by meeting date
+
+    Args:
+        df (pd.DataFrame): attendees database
+
+    Returns:
+        dict: name of the table: data frame with its fields and the 'count' field
+    """
+    df = drop_duplicate_attendees(df)
+    df = df.assign(Attendee=person_ids(df['Email']))
+    aggregates = {}
+    for name, fields in AGGREGATES.items():
+        data = fill_unanswered(df[fields], fields)
+        if 'Date' in fields:
+            data = data.assign(Date=pd.to_datetime(data['Date']))
+        # Only the combinations of categories that are in the data are counted
+        table = data.groupby(fields, dropna=False, observed=True).size().reset_index(name='count')
+        # The tables are small, the categories are not worth keeping in them
+        aggregates[name] = table.astype({x: object for x in fields
+                                         if isinstance(table[x].dtype, pd.CategoricalDtype)})
+    return aggregates
+
+
+def merge_aggregates(old: dict, new: dict) -> dict:
+    """
+    Add the counts of two sets of summary tables
+
+    Args:
+        old (dict): summary tables of the rows already aggregated
+        new (dict): summary tables of the new rows
+
+    Returns:
+        dict: summary tables of all the rows
+    """
+    # The tables saved before the empty fields were counted as '' can still have them
+    return {name: (fill_unanswered(pd.concat([old[name], new[name]]), fields)
+                   .groupby(fields, dropna=False)['count'].sum()
+                   .reset_index())
+            for name, fields in AGGREGATES.items()}
+
+
+def attendee_metrics(aggregates: dict) -> dict:
+    """
+    Unique and repeat attendees from the summary tables, without reading the attendees
+
+    Args:
+        aggregates (dict): summary tables returned by compute_aggregates or AggregateStore.get
+
+    Returns:
+        dict: unique attendees, attendees of two or more meetings and their share
+    """
+    meetings = aggregates['attendee'].dropna(subset=['Attendee'])['count']
+    unique, repeat = len(meetings), int((meetings >= 2).sum())
+    return {'unique': unique, 'repeat': repeat, 'repeat_rate': repeat / unique if unique else 0.0}
+
+
+def row_fingerprint(df: pd.DataFrame, position: int) -> str:
+    # Identifies the last aggregated row, to detect that the database changed before it
+    if position < 0:
+        return ''
+    return str(pd.util.hash_pandas_object(df.iloc[[position]].astype(str), index=False).iloc[0])
+
+
+class AggregateStore:
+    """
+    Summary tables of the dashboard figures, computed once per version of the data and saved in disk.
+
+    When the new version only appends rows to the previous one (the way the loader writes the
+    sheet) only the new rows are aggregated and added to the saved tables.
+
+    Args:
+        path (str, optional): folder where the tables are saved
+    """
+
+    def __init__(self, path: str = AGGREGATES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = ({}, {'version': None, 'row_count': 0, 'fingerprint': ''})
+        self._read()
+
+    @property
+    def tables(self) -> dict:
+        return self._state[0]
+
+    @property
+    def version(self):
+        return self._state[1]['version']
+
+    def _read(self):
+        info_path = os.path.join(self.path, 'info.json')
+        if not os.path.exists(info_path):
+            return
+        paths = {name: os.path.join(self.path, f'{name}.parquet') for name in AGGREGATES}
+        # Tables saved before a new summary table was added are computed again
+        if not all(os.path.exists(x) for x in paths.values()):
+            return
+        with open(info_path) as file:
+            info = json.load(file)
+        tables = {name: pd.read_parquet(path) for name, path in paths.items()}
+        self._state = (tables, info)
+
+    def _write(self, tables: dict, info: dict):
+        os.makedirs(self.path, exist_ok=True)
+        for name, table in tables.items():
+            table.to_parquet(os.path.join(self.path, f'{name}.parquet'), index=False)
+        # info.json is written last, it marks the tables as complete
+        with open(os.path.join(self.path, 'info.json.tmp'), 'w') as file:
+            json.dump(info, file)
+        os.replace(os.path.join(self.path, 'info.json.tmp'), os.path.join(self.path, 'info.json'))
+
+    def get(self, df: pd.DataFrame, version: str) -> dict:
+        """
+        Return the summary tables of a version of the data, computing them only if the version changed
+
+        Args:
+            df (pd.DataFrame): attendees database
+            version (str): identifier of the version of df (e.g. modified time of the sheet)
+
+        Returns:
+            dict: name of the table: data frame with its fields and the 'count' field
+        """
+        if version is not None and version == self.version:
+            return self.tables
+
+        with self._lock:
+            tables, info = self._state
+            if version is not None and version == info['version']:
+                return tables
+
+            row_count = info['row_count']
+            appended = (tables and row_count <= len(df)
+                        and row_fingerprint(df, row_count - 1) == info['fingerprint'])
+
+            if appended:
+                tables = merge_aggregates(tables, compute_aggregates(df.iloc[row_count:]))
+            else:
+                tables = compute_aggregates(df)
+
+            info = {'version': version, 'row_count': len(df), 'fingerprint': row_fingerprint(df, len(df) - 1)}
+            self._write(tables, info)
+            self._state = (tables, info)
+            return tables
+
+
+def filter_attendees(df: pd.DataFrame, cities: tuple = (), seasons: tuple = (), formats: tuple = (),
+                     start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """
+    Select the attendees of some cities, seasons, formats and dates, an empty filter selects everything
+
+    Args:
+        df (pd.DataFrame): attendees database
+        cities (tuple, optional): cities to keep
+        seasons (tuple, optional): seasons to keep
+        formats (tuple, optional): formats to keep
+        start_date (str, optional): first date to keep (YYYY-MM-DD)
+        end_date (str, optional): last date to keep (YYYY-MM-DD)
+
+    Returns:
+        pd.DataFrame: selected attendees
+    """
+    mask = pd.Series(True, index=df.index)
+    if cities:
+        mask &= df['City'].isin(cities)
+    if seasons:
+        mask &= df['Season'].isin(seasons)
+    if formats:
+        mask &= df['Format'].isin(formats)
+    if start_date or end_date:
+        dates = pd.to_datetime(df['Date'])
+        if start_date:
+            mask &= dates >= pd.Timestamp(start_date)
+        if end_date:
+            mask &= dates <= pd.Timestamp(end_date)
+    return df[mask]
@@ -1,132 +1,253 @@
 # Import packages
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from df2gspread import df2gspread as d2g
-from gspread_dataframe import get_as_dataframe, set_with_dataframe
 from decouple import config
 import json
+from importlib.util import find_spec
 
 import dash
-from dash import Dash, html, dash_table, dcc, callback, Output, Input
+from dash import html, dcc, Output, Input
 import plotly.express as px
+import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
+from flask import Response, request
 
-import numpy as np
 import pandas as pd
-from datetime import datetime
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-
-import geopandas as gpd
 
+from data_cache import ARCHIVE_URI, ArchiveCache, SheetCache
+from aggregates import AggregateStore, attendee_metrics, compute_aggregates, filter_attendees
+from figure_cache import FigureCache, render_figure
+from geo import GEOMETRY_ASSET, country_counts
 
 
 # Read API
-    # define the scope and API credentials
-SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-CREDENTIALS = json.loads(config('CRED_GCP'))
+def open_sheet():
+    """
+    Authorize the google client and open the N2N database
+
+    Returns:
+        gspread.Spreadsheet: spreadsheet with the attendees database
+    """
+    # Only needed when the snapshot is refreshed, not imported during the start of the app
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
 
+    # define the scope and API credentials
+    SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+    CREDENTIALS = json.loads(config('CRED_GCP'))
 
     # add credentials to the account
-credentials = ServiceAccountCredentials.from_json_keyfile_dict(CREDENTIALS, SCOPE)
+    credentials = ServiceAccountCredentials.from_json_keyfile_dict(CREDENTIALS, SCOPE)
 
     # authorize the clientsheet
-client = gspread.authorize(credentials)
+    client = gspread.authorize(credentials)
 
     # get the instance of the Spreadsheet
-sheet = client.open('Copy of N2N - Database')
-
-    # get the first sheet of the Spreadsheet
-sheet_instance = sheet.get_worksheet(0)
+    return client.open('Copy of N2N - Database')
 
-    # Incorporate data
-data = sheet_instance.get_all_values()
-df = pd.DataFrame(data[1:], columns=data[0])
 
+# Versions of the data, published as immutable snapshots that the requests read without waiting.
+# The archive of the loader is read when it is set, the sheet otherwise
+cache = ArchiveCache(ARCHIVE_URI) if ARCHIVE_URI else SheetCache(open_sheet)
 
-# Figures
-
-# Fig component 1
+# Summary tables of the figures, computed once per version of the data
+aggregate_store = AggregateStore()
 
-filtered_df = df[(df['Employment Status']!='') &
-                 (df['Employment Status']!='Maternity Leave / Full-time Mom') &
-                 (df['Employment Status']!='Entrepreneur')
-                 ]
-employment_status = filtered_df['Employment Status'].value_counts()
-employment_status
+# Figures already built by version of the data and filters
+figure_cache = FigureCache()
 
-fig1 = px.bar(x=employment_status.index, y=employment_status.values, labels={'x': 'Employment Status', 'y': 'Count'})
 
-# Fig component 2
-fig2 = px.pie(df, names='Format', title='Attendees by Event mode')
-
-# Fig component 3
-fig3 = px.pie(df, names='City', title='Attendees by City')
-
-# Fig component 4
-filtered_df = df[df['Country of Origin']!='']
-top_6_countries = filtered_df['Country of Origin'].value_counts().nlargest(6)
-top_6_countries_sorted = top_6_countries.sort_values(ascending=True)
-
-fig4 = px.bar(x=top_6_countries_sorted.values, y=top_6_countries_sorted.index, labels={'x': '', 'y': 'Employment Status'})
-
-# Fig component 5 (map)
-
-# Count the number of occurrences of each country in the DataFrame
-country_counts = df['Country of Origin'].value_counts().reset_index()
-country_counts.columns = ['name', 'count']
-
-fig5 = px.choropleth(
-    country_counts,
-    locations='name',
-    locationmode='country names',
-    color='count',
-    hover_name='name',
-    color_continuous_scale='Viridis_r',
-    #title='Estimate Smoking Prevalence by Country over the years',
-)
-fig5.update_geos(
-    showcoastlines=True,
-    coastlinecolor='RebeccaPurple',
-    showland=True,
-    landcolor='LightGrey',
-    showocean=True,
-    oceancolor='LightBlue',
-    projection_type='orthographic',
-)
-fig5.update_layout(
-    geo=dict(showframe=False, showcoastlines=False),
-    coloraxis_colorbar=dict(title='Attendants by country'),
-)
-
-# Fig component 6
-df['Date'] = pd.to_datetime(df['Date'])
-
-attendance_grouped = df.groupby(['Date', 'Attendance']).size().reset_index(name='count')
-attendance_grouped.loc[attendance_grouped['Attendance'] == 'Attending', 'Attendance'] = 'Not Attending'
-attendance_grouped['cumulative_count'] = attendance_grouped.groupby('Attendance')['count'].cumsum()
-attendance_grouped['total_count'] = attendance_grouped['count'].cumsum()
-
-fig6 = px.line(attendance_grouped, x='Date', y= 'total_count', markers=True, title='Attendance Count Over Time')
-
-# Fig component 7
-filtered_df = df[(df['Industry / Event']!='Workshop: LinkedIn Workshop to Advance Your Career') &
-                 (df['Industry / Event']!='Workshop: Insider Secrets to Landing Ideal Jobs (for Newcomers)') &
-                 (df['Industry / Event']!='Workshop: Secrets to Crafting The Perfect Job Application by Izzy Piyale-Sheard') &
-                 (df['Industry / Event']!='Workshop: Top 22 Tips to Get a Job in 2022') &
-                 (df['Industry / Event']!='Workshop: How to Write Business English (for Newcomers)') ]
-#top_9_industry = filtered_df[['Industry / Event','Format']].value_counts().nlargest(20).to_frame().reset_index()
-industry = filtered_df[['Industry / Event','Format']].value_counts().to_frame().reset_index()
-
-fig7 = px.bar(industry,x='Industry / Event', y='count',color='Format', barmode='group',labels={'x': 'Industry / Event', 'y': 'Format'})
-
-# Fig component 8
-fig8 = px.histogram(filtered_df,x='Industry / Event',color='Format',  barmode='group')
-
-# Initialize the app
+# Figures
+FIGURE_COUNT = 8
+
+
+def empty_figure(text: str = 'No attendees match the filters') -> go.Figure:
+    """Placeholder of a figure without data, with the text in the middle"""
+    figure = go.Figure()
+    figure.add_annotation(text=text, showarrow=False, xref='paper', yref='paper', x=0.5, y=0.5,
+                          font=dict(size=16))
+    figure.update_xaxes(visible=False)
+    figure.update_yaxes(visible=False)
+    return figure
+
+
+def build_figures(aggregates: dict) -> list:
+    """
+    Build the figures of the dashboard from the summary tables of the database
+
+    Args:
+        aggregates (dict): summary tables returned by AggregateStore.get
+
+    Returns:
+        list: the eight figures of the dashboard, placeholders when no attendee is selected
+    """
+    # e.g. a date range between two meetings
+    if all(table.empty for table in aggregates.values()):
+        return [empty_figure() for _ in range(FIGURE_COUNT)]
+
+    # Fig component 1
+    employment = aggregates['employment']
+    filtered_df = employment[(employment['Employment Status']!='') &
+                             (employment['Employment Status']!='Maternity Leave / Full-time Mom') &
+                             (employment['Employment Status']!='Entrepreneur')
+                             ]
+    employment_status = filtered_df.set_index('Employment Status')['count'].sort_values(ascending=False)
+
+    if employment_status.empty:
+        fig1 = empty_figure('No employment status answered')
+    else:
+        fig1 = px.bar(x=employment_status.index, y=employment_status.values, labels={'x': 'Employment Status', 'y': 'Count'})
+
+    # Fig component 2
+    fig2 = px.pie(aggregates['format'], names='Format', values='count', title='Attendees by Event mode')
+
+    # Fig component 3
+    fig3 = px.pie(aggregates['city'], names='City', values='count', title='Attendees by City')
+
+    # Fig component 4
+    country = aggregates['country']
+    filtered_df = country[country['Country of Origin']!='']
+    top_6_countries = filtered_df.set_index('Country of Origin')['count'].nlargest(6)
+    top_6_countries_sorted = top_6_countries.sort_values(ascending=True)
+
+    if top_6_countries_sorted.empty:
+        fig4 = empty_figure('No country of origin answered')
+    else:
+        fig4 = px.bar(x=top_6_countries_sorted.values, y=top_6_countries_sorted.index, labels={'x': '', 'y': 'Employment Status'})
+
+    # Fig component 5 (map)
+
+    # Attendees of each country on the simplified geometry of geo.py, the figure has the ISO-3 codes
+    # and the url of the geometry, which the browser downloads once for all the versions and filters
+    map_counts, outside = country_counts(country)
+
+    fig5 = px.choropleth(
+        map_counts,
+        geojson=app.get_asset_url(GEOMETRY_ASSET),
+        featureidkey='id',
+        locations='iso3',
+        color='count',
+        hover_name='name',
+        color_continuous_scale='Viridis_r',
+        #title='Estimate Smoking Prevalence by Country over the years',
+    )
+    fig5.update_traces(marker_line_color='RebeccaPurple', marker_line_width=0.5)
+    # The world base map of plotly is not drawn, only the countries of the geometry
+    fig5.update_geos(
+        visible=False,
+        fitbounds='locations',
+        bgcolor='LightBlue',
+        projection_type='natural earth',
+    )
+    fig5.update_layout(
+        geo=dict(showframe=False),
+        coloraxis_colorbar=dict(title='Attendants by country'),
+    )
+    # Countries that are not on the map (e.g. Spain) or that are not known are counted, not dropped
+    if outside:
+        fig5.add_annotation(text=f'{outside:,} attendees from other countries', showarrow=False,
+                            xref='paper', yref='paper', x=0, y=0)
+
+    # Fig component 6
+    attendance_grouped = aggregates['attendance'].sort_values(['Date', 'Attendance']).reset_index(drop=True)
+    attendance_grouped.loc[attendance_grouped['Attendance'] == 'Attending', 'Attendance'] = 'Not Attending'
+    attendance_grouped['cumulative_count'] = attendance_grouped.groupby('Attendance')['count'].cumsum()
+    attendance_grouped['total_count'] = attendance_grouped['count'].cumsum()
+
+    fig6 = px.line(attendance_grouped, x='Date', y= 'total_count', markers=True, title='Attendance Count Over Time')
+
+    # Fig component 7
+    industry = aggregates['industry_format']
+    industry = industry[(industry['Industry / Event']!='Workshop: LinkedIn Workshop to Advance Your Career') &
+                        (industry['Industry / Event']!='Workshop: Insider Secrets to Landing Ideal Jobs (for Newcomers)') &
+                        (industry['Industry / Event']!='Workshop: Secrets to Crafting The Perfect Job Application by Izzy Piyale-Sheard') &
+                        (industry['Industry / Event']!='Workshop: Top 22 Tips to Get a Job in 2022') &
+                        (industry['Industry / Event']!='Workshop: How to Write Business English (for Newcomers)') ]
+    industry = industry.sort_values('count', ascending=False)
+
+    fig7 = px.bar(industry,x='Industry / Event', y='count',color='Format', barmode='group',labels={'x': 'Industry / Event', 'y': 'Format'})
+
+    # Fig component 8
+    fig8 = px.histogram(industry,x='Industry / Event', y='count', color='Format',  barmode='group')
+
+    return [fig1, fig2, fig3, fig4, fig5, fig6, fig7, fig8]
+
+
+# Tabs of the dashboard and their figures, the figures of a tab are requested when it is opened
+TABS = {
+    'overview': ('Overview', ['fig1', 'fig2', 'fig3', 'fig4']),
+    'map': ('Countries', ['fig5']),
+    'attendance': ('Attendance', ['fig6']),
+    'industries': ('Industries', ['fig7', 'fig8']),
+}
+
+# Figures requested with the version of the data in the url do not change, browsers keep them
+FIGURE_MAX_AGE = config('N2N_FIGURE_MAX_AGE', default=365 * 24 * 3600, cast=int)
+
+NO_FILTERS = ((), (), (), None, None)
+
+
+def parse_filters(args) -> tuple:
+    """
+    Read the filters of the query of a figure
+
+    Args:
+        args (werkzeug.datastructures.MultiDict): 'city', 'season' and 'format' (repeated), 'start' and 'end' dates
+
+    Returns:
+        tuple: cities, seasons, formats, start date and end date (YYYY-MM-DD), sorted as the keys of the cache
+
+    Raises:
+        ValueError: a season that is not a number or a date that is not valid
+    """
+    seasons = tuple(sorted(int(x) for x in args.getlist('season')))
+    # The dates are written the same way in the keys of the cache, whatever their format in the query
+    dates = tuple(pd.Timestamp(args[x]).strftime('%Y-%m-%d') if args.get(x) else None for x in ('start', 'end'))
+    return (tuple(sorted(args.getlist('city'))), seasons, tuple(sorted(args.getlist('format')))) + dates
+
+
+def rendered_figures(df: pd.DataFrame, version: str, filters: tuple) -> dict:
+    """
+    Figures of the selected attendees as compressed json, the same selection of the same data is rendered once
+
+    Args:
+        df (pd.DataFrame): attendees database
+        version (str): version of the data
+        filters (tuple): cities, seasons, formats, start date and end date
+
+    Returns:
+        dict: name of the figure ('fig1'...): bodies returned by render_figure
+    """
+    def build():
+        if filters == NO_FILTERS:
+            # Without filters the saved summary tables are used
+            aggregates = aggregate_store.get(df, version)
+        else:
+            aggregates = compute_aggregates(filter_attendees(df, *filters))
+        return {f'fig{i}': render_figure(fig) for i, fig in enumerate(build_figures(aggregates), start=1)}
+
+    return figure_cache.get_or_build((version, filters), build)
+
+
+# Initialize the app, compressing the layout and the callbacks when flask-compress is installed
 #app = Dash(__name__)
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.SOLAR]) #LUX, FLATLY,
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.SOLAR], #LUX, FLATLY,
+                compress=find_spec('flask_compress') is not None)
+
+# WSGI application for production servers, e.g. gunicorn -c gunicorn.conf.py (see gunicorn.conf.py)
+server = app.server
+
+# Each version is published with its summary tables and its figures without filters, they are built
+# when the data changes, not when the first visitor arrives. The app is created first, the map refers
+# to the url of its assets
+cache.add_builder('aggregates', lambda df, metadata: aggregate_store.get(df, metadata.get('modified_time')))
+cache.add_builder('figures', lambda df, metadata: rendered_figures(df, metadata.get('modified_time'), NO_FILTERS))
+# The figures of the previous versions are released
+cache.subscribe(lambda df, metadata: figure_cache.retain(metadata.get('modified_time')))
+
+# Incorporate data, from the local snapshot when it exists, and keep it fresh in the background.
+# Under gunicorn the data is loaded once by the master and the workers start their own refresh
+cache.load()
+if config('N2N_REFRESH_THREAD', default=True, cast=bool):
+    cache.start()
 
 # Define the navbar
 navbar = dbc.NavbarSimple(
@@ -137,25 +258,129 @@ navbar = dbc.NavbarSimple(
 )
 
 
-# App layout
-app.layout = dbc.Container([
-    # Navigation bar
-    navbar,
-
-    # Add space after the navigation bar
-    html.Div(style={"height": "30px"}),
+# App layout, built on each page load so new versions of the data are shown without restarting
+def serve_layout():
+    snapshot = cache.snapshot
+    df = snapshot.df
+    dates = pd.to_datetime(df['Date'])
+
+    filters = dbc.Row([
+        dbc.Col(dcc.Dropdown(id='city-filter', options=sorted(df['City'].dropna().unique()),
+                             multi=True, placeholder='City')),
+        dbc.Col(dcc.Dropdown(id='season-filter', options=sorted(int(x) for x in df['Season'].dropna().unique()),
+                             multi=True, placeholder='Season')),
+        dbc.Col(dcc.Dropdown(id='format-filter', options=sorted(df['Format'].dropna().unique()),
+                             multi=True, placeholder='Format')),
+        dbc.Col(dcc.DatePickerRange(id='date-filter', min_date_allowed=dates.min(), max_date_allowed=dates.max())),
+    ])
 
-    html.Div(children='My First App with Data and a Graph'),
-    #dash_table.DataTable(data=df.to_dict('records'), page_size=10),
-    dcc.Graph(figure = fig1),
-    dcc.Graph(figure = fig2),
-    dcc.Graph(figure = fig3),
-    dcc.Graph(figure = fig4),
-    dcc.Graph(figure = fig5),
-    dcc.Graph(figure = fig6),
-    dcc.Graph(figure = fig7),
-    dcc.Graph(figure = fig8),
+    # People counted once, from the summary table of the meetings of each person
+    metrics = attendee_metrics(snapshot.derived['aggregates'])
+    attendees = dbc.Row([
+        dbc.Col(html.Div([html.H4(f"{metrics['unique']:,}"), html.Small('Unique attendees')])),
+        dbc.Col(html.Div([html.H4(f"{metrics['repeat']:,}"), html.Small('Attended two or more meetings')])),
+        dbc.Col(html.Div([html.H4(f"{metrics['repeat_rate']:.0%}"), html.Small('Repeat attendance')])),
     ])
+
+    return dbc.Container([
+        # Navigation bar
+        navbar,
+
+        # Add space after the navigation bar
+        html.Div(style={"height": "30px"}),
+
+        html.Div(children='My First App with Data and a Graph'),
+        filters,
+        attendees,
+        # Version of the data of this page, part of the url of its figures
+        dcc.Store(id='data-version', data=snapshot.version),
+        #dash_table.DataTable(data=df.to_dict('records'), page_size=10),
+        dcc.Tabs(id='tabs', value='overview', children=[
+            dcc.Tab(label=label, value=tab, children=[dcc.Graph(id=name) for name in names])
+            for tab, (label, names) in TABS.items()
+        ]),
+        ])
+
+
+@app.server.route('/figures/<name>.json')
+def serve_figure(name):
+    """
+    Send a figure of the selected attendees as json, compressed once when it was rendered
+
+    The query has the version of the data ('v') and the filters ('city', 'season', 'format',
+    'start' and 'end'), a url with the current version is cached by the browser.
+    """
+    try:
+        filters = parse_filters(request.args)
+    except ValueError as error:
+        return Response(f'Invalid filter: {error}', status=400, mimetype='text/plain')
+
+    snapshot = cache.snapshot
+    version = snapshot.version
+    if filters == NO_FILTERS:
+        figures = snapshot.derived['figures']
+    else:
+        figures = rendered_figures(snapshot.df, version, filters)
+    if name not in figures:
+        return Response(status=404)
+    figure = figures[name]
+
+    if request.if_none_match.contains(figure['etag'].strip('"')):
+        response = Response(status=304)
+    else:
+        encodings = request.accept_encodings
+        encoding = next((x for x in ('br', 'gzip') if figure[x] is not None and encodings[x]), None)
+        response = Response(figure[encoding] if encoding else figure['json'], mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['ETag'] = figure['etag']
+    # A page of an older version gets the current figures, revalidated on each request
+    if request.args.get('v') == version:
+        response.headers['Cache-Control'] = f'public, max-age={FIGURE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+# The browser requests the figures of the open tab, with the filters, when the tab is opened
+# or a filter changes; the figures of the other tabs are not sent until they are opened
+for tab, (label, names) in TABS.items():
+    app.clientside_callback(
+        f"""
+        async function(tab, version, cities, seasons, formats, start, end) {{
+            if (tab !== '{tab}') {{
+                throw window.dash_clientside.PreventUpdate;
+            }}
+            const query = new URLSearchParams({{v: version || ''}});
+            (cities || []).forEach(x => query.append('city', x));
+            (seasons || []).forEach(x => query.append('season', x));
+            (formats || []).forEach(x => query.append('format', x));
+            if (start) {{ query.set('start', start); }}
+            if (end) {{ query.set('end', end); }}
+            return Promise.all({json.dumps(names)}.map(
+                name => fetch('{app.get_relative_path('/figures/')}' + name + '.json?' + query)
+                    .then(response => response.json())));
+        }}
+        """,
+        [Output(name, 'figure') for name in names],
+        Input('tabs', 'value'),
+        Input('data-version', 'data'),
+        Input('city-filter', 'value'),
+        Input('season-filter', 'value'),
+        Input('format-filter', 'value'),
+        Input('date-filter', 'start_date'),
+        Input('date-filter', 'end_date'),
+    )
+
+
+# Hit and miss counters of the figure cache
+@app.server.route('/cache-stats')
+def cache_stats():
+    return figure_cache.stats()
+
+
+app.layout = serve_layout
 '''app.layout = html.Div([
     html.Div(children='My First App with Data and a Graph'),
     dash_table.DataTable(data=df.to_dict('records'), page_size=10),
@@ -163,6 +388,6 @@ app.layout = dbc.Container([
 ])'''
 
 
-# Run the app
+# Run the app with the development server
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
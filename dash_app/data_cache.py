@@ -0,0 +1,339 @@
+import os
+import threading
+import time
+import traceback
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from decouple import config
+
+try:
+    import fcntl
+except ImportError:  # not available on windows, where the app runs with a single process
+    fcntl = None
+
+# The schema and the archive of the database are shared with the loader
+from shared import ARCHIVE_URI, STRING, apply_schema, archive_version, read_archive
+
+SNAPSHOT_PATH = config('N2N_SNAPSHOT_PATH',
+                       default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'n2n_database.parquet'))
+
+# Columns of the database read by the figures and the filters, the others are not read from the archive
+DASHBOARD_COLUMNS = ['#', 'Date', 'City', 'Season', 'Industry / Event', 'Format', 'Attendance', 'Email',
+                     'Country of Origin', 'Employment Status']
+
+# Seconds after which the snapshot is downloaded again even if the modified time of the sheet did not change
+CACHE_TTL = config('N2N_CACHE_TTL', default=24 * 3600, cast=int)
+
+# Seconds between two checks of the modified time of the sheet
+REFRESH_INTERVAL = config('N2N_REFRESH_INTERVAL', default=300, cast=int)
+
+
+def values_to_df(data: list) -> pd.DataFrame:
+    """
+    Transform the values of the sheet (header in the first row) in a data frame with the types of COLUMN_DTYPES
+
+    Args:
+        data (list): values of the sheet as returned by get_all_values
+
+    Returns:
+        pd.DataFrame: attendees database
+    """
+    return apply_schema(pd.DataFrame(data[1:], columns=data[0]))
+
+
+def arrow_path(path: str) -> str:
+    # Uncompressed copy of the Parquet snapshot that the processes of the app memory map
+    return os.path.splitext(path)[0] + '.arrow'
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Hold an exclusive lock on a file, e.g. while a worker of the app downloads the sheet
+
+    Args:
+        path (str): lock file, created when it does not exist
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def schema_metadata(schema: pa.Schema) -> dict:
+    # Metadata of the snapshot (modified_time, saved_at) without the pandas metadata
+    return {key.decode(): value.decode() for key, value in (schema.metadata or {}).items()
+            if not key.startswith(b'pandas')}
+
+
+def df_to_table(df: pd.DataFrame, metadata: dict) -> pa.Table:
+    # The pandas metadata of the table keeps the categories and the string types of the columns
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return table.replace_schema_metadata({**table.schema.metadata,
+                                          **{key: str(value) for key, value in metadata.items()}})
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    A version of the attendees database and the values derived from it, never modified once published.
+
+    Args:
+        df (pd.DataFrame): attendees database, read only
+        metadata (Mapping): modified_time of the source and saved_at (epoch seconds)
+        derived (Mapping): values built from df before the version was published, by name
+    """
+    df: pd.DataFrame = None
+    metadata: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+    derived: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+
+    @property
+    def version(self) -> str:
+        return self.metadata.get('modified_time')
+
+
+class SheetCache:
+    """
+    Local Parquet snapshot of the attendees sheet.
+
+    The snapshot is loaded from disk when it exists, the sheet is downloaded again only when
+    its modified time changes or the snapshot is older than the ttl. The builders compute the
+    values derived from a new version (e.g. the summary tables) before it is published, then
+    the Snapshot is replaced with a single reference assignment: readers always see a complete
+    version and never wait for a refresh. The listeners are called with each new version.
+
+    Only the refresh thread builds a new version, so memory holds at most two: the one served
+    and the one being built, the previous one is released when its last request finishes.
+
+    Next to the Parquet file an uncompressed Arrow copy is saved and read as a memory map, the
+    workers of the app share its pages instead of holding a copy each. Only one process
+    downloads a new version, the others find it on disk.
+
+    Args:
+        open_sheet (callable): function without arguments that returns the gspread Spreadsheet
+        path (str, optional): path of the Parquet snapshot
+        ttl (int, optional): maximum age of the snapshot in seconds
+    """
+
+    def __init__(self, open_sheet, path: str = SNAPSHOT_PATH, ttl: int = CACHE_TTL):
+        self._open_sheet = open_sheet
+        self._sheet = None
+        self.path = path
+        self.ttl = ttl
+        self._snapshot = Snapshot()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._builders = []
+        self._listeners = []
+
+    @property
+    def snapshot(self) -> Snapshot:
+        """Current version, a request reads it once and uses it for all its data"""
+        return self._snapshot
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Current version of the attendees database"""
+        return self._snapshot.df
+
+    @property
+    def metadata(self) -> dict:
+        """modified_time of the sheet and saved_at (epoch seconds) of the current version"""
+        return self._snapshot.metadata
+
+    def add_builder(self, name: str, build):
+        """
+        Compute build(df, metadata) for each new version before it is published, as derived[name]
+
+        A builder that fails stops the publication, the current version keeps being served.
+
+        Args:
+            name (str): key of the value in Snapshot.derived
+            build (callable): function of the data frame and its metadata
+        """
+        with self._refresh_lock:
+            self._builders.append((name, build))
+            # The current version is published again with the new value
+            if self.df is not None:
+                self._publish(self.df, dict(self.metadata))
+
+    def subscribe(self, listener):
+        """
+        Call listener(df, metadata) with each new version of the data, and now with the current one
+
+        Args:
+            listener (callable): function of the data frame and its metadata
+        """
+        self._listeners.append(listener)
+        if self.df is not None:
+            self._notify(listener)
+
+    def _notify(self, *listeners):
+        snapshot = self._snapshot
+        df, metadata = snapshot.df, snapshot.metadata
+        for listener in listeners or self._listeners:
+            try:
+                listener(df, metadata)
+            except Exception:
+                # A failed listener does not stop the new version from being served
+                traceback.print_exc()
+
+    @property
+    def sheet(self):
+        if self._sheet is None:
+            self._sheet = self._open_sheet()
+        return self._sheet
+
+    def load(self) -> pd.DataFrame:
+        """
+        Load the snapshot from disk, downloading the sheet only when there is no snapshot yet
+
+        Returns:
+            pd.DataFrame: attendees database
+        """
+        if os.path.exists(self.path):
+            with self._refresh_lock:
+                self._publish(*self._read())
+        else:
+            self.refresh(force=True)
+        return self.df
+
+    def _read(self) -> tuple:
+        # The Arrow copy is memory mapped, the Parquet file is read when there is no copy yet
+        path = arrow_path(self.path)
+        if not os.path.exists(path):
+            table = pq.read_table(self.path)
+            self._write_arrow(table)
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        # The text columns keep pointing to the mapped buffers instead of being copied.
+        # Snapshots saved before the schema was shared are typed when they are read
+        df = table.to_pandas(types_mapper={pa.string(): STRING, pa.large_string(): STRING}.get)
+        return apply_schema(df), schema_metadata(table.schema)
+
+    def _publish(self, df: pd.DataFrame, metadata: dict):
+        # The derived values are built off the request path, then the new version replaces the
+        # previous one in a single assignment
+        derived = {name: build(df, metadata) for name, build in self._builders}
+        self._snapshot = Snapshot(df, MappingProxyType(metadata), MappingProxyType(derived))
+        self._notify()
+
+    def _write_arrow(self, table: pa.Table):
+        path = arrow_path(self.path)
+        with pa.OSFile(f'{path}.tmp', 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        # The processes that mapped the previous copy keep reading it until they load this one
+        os.replace(f'{path}.tmp', path)
+
+    def _saved_metadata(self) -> dict:
+        # Version saved on disk, maybe by another process of the app
+        path = arrow_path(self.path)
+        if not os.path.exists(path):
+            return {}
+        return schema_metadata(pa.ipc.open_file(pa.memory_map(path)).schema)
+
+    def _version(self) -> str:
+        # Modified time of the source, a new value means a new version of the data
+        return self.sheet.get_lastUpdateTime()
+
+    def _download(self) -> pd.DataFrame:
+        return values_to_df(self.sheet.get_worksheet(0).get_all_values())
+
+    def is_expired(self, metadata: dict = None) -> bool:
+        saved_at = float((metadata or self.metadata).get('saved_at', 0))
+        return time.time() - saved_at > self.ttl
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Download the sheet if it changed since the snapshot and swap in the new data
+
+        Args:
+            force (bool, optional): download the sheet without checking the modified time
+
+        Returns:
+            bool: True if a new version was loaded
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._refresh_lock, file_lock(f'{self.path}.lock'):
+            modified_time = self._version()
+            if not force and not self.is_expired() and modified_time == self.metadata.get('modified_time'):
+                return False
+
+            # Another worker of the app already saved this version
+            saved = self._saved_metadata()
+            if not force and not self.is_expired(saved) and modified_time == saved.get('modified_time'):
+                self._publish(*self._read())
+                return True
+
+            df = self._download()
+            metadata = {'modified_time': modified_time, 'saved_at': time.time()}
+
+            # Write in a temporary file and rename it, a reader never finds a half written snapshot
+            table = df_to_table(df, metadata)
+            temporary_path = f'{self.path}.tmp'
+            pq.write_table(table, temporary_path)
+            os.replace(temporary_path, self.path)
+            self._write_arrow(table)
+
+            # The downloaded copy is released, the new version is the memory mapped one
+            del df, table
+            self._publish(*self._read())
+            return True
+
+    def start(self, interval: int = REFRESH_INTERVAL):
+        """
+        Refresh the snapshot in a background thread now and every interval seconds
+
+        The snapshot loaded from disk is served meanwhile, a restart does not wait for the sheet.
+
+        Args:
+            interval (int, optional): seconds between two checks of the sheet
+        """
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception:
+                    # Keep serving the current version, try again in the next check
+                    traceback.print_exc()
+                time.sleep(interval)
+
+        self._thread = threading.Thread(target=run, name='sheet-cache-refresh', daemon=True)
+        self._thread.start()
+
+
+class ArchiveCache(SheetCache):
+    """
+    Local snapshot of the Parquet archive written by the loader, instead of the sheet.
+
+    The version is the listing of the archive files, which changes with each run of the loader,
+    and only the columns used by the dashboard are downloaded.
+
+    Args:
+        uri (str, optional): location of the archive, a local directory or an s3:// uri
+        path (str, optional): path of the Parquet snapshot
+        ttl (int, optional): maximum age of the snapshot in seconds
+    """
+
+    def __init__(self, uri: str = ARCHIVE_URI, path: str = SNAPSHOT_PATH, ttl: int = CACHE_TTL):
+        super().__init__(None, path, ttl)
+        self.uri = uri
+
+    def _version(self) -> str:
+        return archive_version(self.uri)
+
+    def _download(self) -> pd.DataFrame:
+        return read_archive(self.uri, DASHBOARD_COLUMNS)
@@ -0,0 +1,112 @@
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from decouple import config
+
+try:
+    import brotli
+except ImportError:  # optional, installed with flask-compress
+    brotli = None
+
+# Maximum number of filter combinations kept and seconds before an entry is built again
+FIGURE_CACHE_SIZE = config('N2N_FIGURE_CACHE_SIZE', default=256, cast=int)
+FIGURE_CACHE_TTL = config('N2N_FIGURE_CACHE_TTL', default=3600, cast=int)
+
+
+def render_figure(figure) -> dict:
+    """
+    Serialize a figure to compact json and compress it once, so each visitor only receives bytes
+
+    Args:
+        figure (plotly.graph_objects.Figure): figure of the dashboard
+
+    Returns:
+        dict: 'json', 'gzip' and 'br' (None without brotli) bodies and the 'etag' of the figure
+    """
+    body = figure.to_json().encode()
+    return {'json': body,
+            'gzip': gzip.compress(body, compresslevel=9),
+            'br': brotli.compress(body) if brotli is not None else None,
+            'etag': f'"{hashlib.md5(body).hexdigest()}"'}
+
+
+class FigureCache:
+    """
+    Least recently used cache with expiration for the figures of the dashboard.
+
+    The keys include the version of the data, so a new version never returns old figures.
+
+    Args:
+        maxsize (int, optional): maximum number of entries
+        ttl (int, optional): seconds an entry is valid
+    """
+
+    def __init__(self, maxsize: int = FIGURE_CACHE_SIZE, ttl: int = FIGURE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_or_build(self, key, build):
+        """
+        Return the value of a key, calling build() to create it when it is missing or expired
+
+        Args:
+            key (hashable): identifier of the value (data version and filters)
+            build (callable): function without arguments that creates the value
+
+        Returns:
+            the cached or new value
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+
+        # Built outside the lock, other filters are served meanwhile
+        value = build()
+
+        with self._lock:
+            self._entries[key] = (now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return value
+
+    def stats(self) -> dict:
+        """
+        Return the counters of the cache
+
+        Returns:
+            dict: hits, misses, evictions, current size and hit rate
+        """
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), maxsize=self.maxsize)
+        requests = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / requests if requests else 0.0
+        return stats
+
+    def retain(self, version):
+        """
+        Drop the entries of the other versions of the data, whose keys are (version, filters)
+
+        Args:
+            version (str): version of the data being served
+        """
+        with self._lock:
+            for key in [x for x in self._entries if x[0] != version]:
+                del self._entries[key]
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,150 @@
+"""
+Geometry of the map of the countries of origin.
+
+The countries are drawn from a simplified GeoJSON of Latin America and North America
+(assets/countries.json) instead of the world map of plotly, the figures only have the
+ISO-3 codes and the url of the file, which browsers download once and revalidate. Build
+the file again from Natural Earth with:
+
+    python dash_app/geo.py [--tolerance 0.1]
+"""
+import argparse
+import functools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# The folding of the answers is shared with the loader
+from shared import fold
+
+# File of the assets folder of the app, served at /assets/countries.json. The json extension
+# is sent as application/json, which flask-compress compresses
+GEOMETRY_ASSET = 'countries.json'
+GEOMETRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', GEOMETRY_ASSET)
+
+# ISO 3166-1 alpha-3 code of the countries of origin of normalization.json
+COUNTRY_CODES = {
+    'Argentina': 'ARG', 'Bolivia': 'BOL', 'Brazil': 'BRA', 'Canada': 'CAN', 'Chile': 'CHL',
+    'Colombia': 'COL', 'Costa Rica': 'CRI', 'Cuba': 'CUB', 'Dominican Republic': 'DOM', 'Ecuador': 'ECU',
+    'El Salvador': 'SLV', 'Guatemala': 'GTM', 'Honduras': 'HND', 'Mexico': 'MEX', 'Nicaragua': 'NIC',
+    'Panama': 'PAN', 'Paraguay': 'PRY', 'Peru': 'PER', 'Puerto Rico': 'PRI', 'Spain': 'ESP',
+    'Uruguay': 'URY', 'Venezuela': 'VEN',
+}
+
+# Natural Earth countries of the map: South America and North America without Greenland
+MAP_CONTINENTS = ['South America', 'North America']
+MAP_EXCLUDED = ['GRL']
+
+# Degrees of the simplification and of the rounding of the coordinates (about 1 km)
+SIMPLIFY_TOLERANCE = 0.1
+COORDINATE_DECIMALS = 2
+
+
+@functools.lru_cache(maxsize=1)
+def load_geometry() -> dict:
+    """GeoJSON of the map, read once"""
+    with open(GEOMETRY_PATH, encoding='utf-8') as file:
+        return json.load(file)
+
+
+@functools.lru_cache(maxsize=1)
+def map_countries() -> pd.DataFrame:
+    """ISO-3 code ('iso3') and name of the countries of the map, in the order of the file"""
+    return pd.DataFrame([(x['id'], x['properties']['name']) for x in load_geometry()['features']],
+                        columns=['iso3', 'name'])
+
+
+@functools.lru_cache(maxsize=1)
+def _codes_by_key() -> dict:
+    # The names of the map (e.g. 'Dominican Rep.') are also known
+    codes = {fold(name): code for code, name in map_countries().itertuples(index=False)}
+    codes.update({fold(name): code for name, code in COUNTRY_CODES.items()})
+    return codes
+
+
+@functools.lru_cache(maxsize=1024)
+def iso3(country: str) -> str:
+    """
+    ISO-3 code of a country of origin, e.g. 'México' or 'mexico': 'MEX'
+
+    Args:
+        country (str): normalized country of origin
+
+    Returns:
+        str: ISO-3 code, None when the country is not known
+    """
+    return _codes_by_key().get(fold(country)) if isinstance(country, str) else None
+
+
+def country_counts(country: pd.DataFrame) -> tuple:
+    """
+    Attendees of each country of the map, the countries without attendees have 0
+
+    Args:
+        country (pd.DataFrame): 'Country of Origin' and 'count', the country summary table
+
+    Returns:
+        tuple: data frame with 'iso3', 'name' and 'count' by country of the map, and the attendees
+            whose country is known but not on the map (e.g. Spain) or not known
+    """
+    codes = country['Country of Origin'].astype(object).map(iso3)
+    answered = country['Country of Origin'].astype(object).fillna('') != ''
+    by_code = country['count'][codes.notna()].groupby(codes[codes.notna()]).sum()
+
+    counts = map_countries().assign(count=lambda x: x['iso3'].map(by_code).fillna(0).astype(int))
+    outside = int(country['count'][answered].sum() - counts['count'].sum())
+    return counts, outside
+
+
+def build_geometry(source: str, path: str = GEOMETRY_PATH, tolerance: float = SIMPLIFY_TOLERANCE) -> dict:
+    """
+    Write the simplified GeoJSON of the map from the Natural Earth countries
+
+    Args:
+        source (str): shapefile of the Natural Earth countries, with 'iso_a3', 'name' and 'continent'
+        path (str, optional): GeoJSON file to write
+        tolerance (float, optional): degrees of the simplification
+
+    Returns:
+        dict: countries and coordinates of the file, and its size in bytes
+    """
+    # Only needed to build the file, not when the app runs
+    import fiona
+    import geopandas as gpd
+    import shapely
+
+    with fiona.open(source) as file:
+        countries = gpd.GeoDataFrame.from_features(file, crs=file.crs)
+    countries = countries[countries['continent'].isin(MAP_CONTINENTS) & ~countries['iso_a3'].isin(MAP_EXCLUDED)]
+
+    geometry = countries.geometry.simplify(tolerance, preserve_topology=True)
+    geometry = shapely.transform(geometry.to_numpy(), lambda x: np.round(x, COORDINATE_DECIMALS))
+    features = [{'type': 'Feature', 'id': code, 'properties': {'name': name},
+                 'geometry': json.loads(shapely.to_geojson(shape))}
+                for code, name, shape in zip(countries['iso_a3'], countries['name'], geometry)]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    text = json.dumps({'type': 'FeatureCollection', 'features': features}, separators=(',', ':'))
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    return {'countries': len(features), 'coordinates': int(shapely.get_num_coordinates(geometry).sum()),
+            'bytes': len(text.encode())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', help='Natural Earth countries, the low resolution file of geopandas by default')
+    parser.add_argument('--tolerance', type=float, default=SIMPLIFY_TOLERANCE)
+    args = parser.parse_args()
+
+    source = args.source
+    if source is None:
+        import geopandas as gpd
+        source = gpd.datasets.get_path('naturalearth_lowres')
+    print(build_geometry(source, tolerance=args.tolerance))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Production serving of the dashboard with several worker processes:
+
+    cd dash_app && gunicorn -c gunicorn.conf.py
+
+The app is imported once by the master (the snapshot is read as a memory map and the figures
+without filters are rendered), the workers are forked with that state instead of loading it
+each. Each worker checks the sheet in the background, only one of them downloads a new version
+and the others read it from the shared Arrow snapshot.
+"""
+import multiprocessing
+import os
+
+# Every name of this module is read as a setting, a 'config' function would be taken for the 'config' setting
+import decouple
+
+wsgi_app = 'app:server'
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = decouple.config('N2N_BIND', default='0.0.0.0:8050')
+workers = decouple.config('N2N_WORKERS', default=2 * multiprocessing.cpu_count() + 1, cast=int)
+threads = decouple.config('N2N_THREADS', default=2, cast=int)
+preload_app = True
+timeout = 60
+
+# The master does not refresh the data, threads do not survive the fork of the workers
+os.environ['N2N_REFRESH_THREAD'] = 'False'
+
+
+def post_fork(server, worker):
+    from app import cache
+
+    cache.start()
@@ -0,0 +1,16 @@
+"""
+Modules of the loader (lambda_function) used by the dashboard: the schema and the archive of
+the database, the identities of the attendees and the folding of the answers. The folder of
+the loader is added to the import path here, once for all the modules of the app.
+"""
+import os
+import sys
+
+LAMBDA_FUNCTION = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_function')
+if LAMBDA_FUNCTION not in sys.path:
+    sys.path.append(LAMBDA_FUNCTION)
+
+from archive import ARCHIVE_URI, archive_version, read_archive
+from identity import drop_duplicate_attendees, person_ids
+from normalize import fold
+from schema import STRING, apply_schema
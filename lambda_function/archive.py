@@ -0,0 +1,228 @@
+"""
+Append-only Parquet archive of the attendees database, partitioned by year and city.
+
+The loader writes the rows of each run to the archive before appending them to the sheet,
+the sheet is kept as the view that the volunteers read and edit. The dashboard and the
+analyses read the archive with read_archive, which only opens the files of the years and
+cities asked for and only decodes the columns asked for:
+
+    read_archive(columns=['Date', 'Email'], start='2023-01-01', cities=['Toronto'])
+
+open_archive returns the pyarrow dataset for other queries, e.g. with DuckDB or polars.
+"""
+import functools
+import hashlib
+import operator
+import os
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from decouple import config
+
+from identity import email_date_keys
+from schema import COLUMN_DTYPES, STRING, apply_schema
+
+# Location of the archive, a local directory or an s3:// uri, empty when there is no archive
+ARCHIVE_URI = config('N2N_ARCHIVE_URI', default='')
+
+# Written once the rows saved in the sheet before the archive existed were copied to it
+SEEDED_MARKER = '_seeded'
+
+# Types of the files, the categories are saved as text (Parquet encodes them with a dictionary)
+ARROW_TYPES = {'Int32': pa.int32(), 'Int16': pa.int16(), 'datetime64[ns]': pa.timestamp('ns')}
+ARCHIVE_SCHEMA = pa.schema([(name, ARROW_TYPES.get(str(dtype), pa.string())) for name, dtype in COLUMN_DTYPES.items()]
+                           + [('Identity', pa.string())])
+
+# Directories year=<year>/city=<city>, a filter on them skips the other directories without opening them
+PARTITION_SCHEMA = pa.schema([('year', pa.int16()), ('city', pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+
+def open_filesystem(uri: str = ARCHIVE_URI) -> tuple:
+    # Filesystem and path of the archive, a path without scheme is a local directory
+    if '://' not in uri:
+        uri = os.path.abspath(uri)
+    return pafs.FileSystem.from_uri(uri)
+
+
+def archive_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Rows of the database with the types of ARCHIVE_SCHEMA
+
+    Identity is the email and date key of the attendee (identity.email_date_key), a row
+    written twice (e.g. by a retried run) is read once. The rows without email have no identity.
+
+    Args:
+        df (pd.DataFrame): attendees database typed with schema.COLUMN_DTYPES
+
+    Returns:
+        pa.Table: table without pandas metadata, the columns that df does not have are empty
+    """
+    df = df.reindex(columns=list(COLUMN_DTYPES)).assign(Identity=email_date_keys(df['Email'], df['Date']))
+    return pa.Table.from_pandas(df, schema=ARCHIVE_SCHEMA, preserve_index=False).replace_schema_metadata(None)
+
+
+def _partition_directory(year, city) -> str:
+    year = NULL_PARTITION if pd.isna(year) else int(year)
+    city = NULL_PARTITION if pd.isna(city) else quote(str(city), safe='')
+    return f'year={year}/city={city}'
+
+
+def _write_file(filesystem: pafs.FileSystem, path: str, table: pa.Table) -> int:
+    # The file is written with a hidden name and renamed, a reader never opens a half written file
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression='zstd')
+    buffer = sink.getvalue()
+    directory, name = path.rsplit('/', 1)
+    filesystem.create_dir(directory, recursive=True)
+    with filesystem.open_output_stream(f'{directory}/.{name}') as stream:
+        stream.write(buffer)
+    filesystem.move(f'{directory}/.{name}', path)
+    return buffer.size
+
+
+def write_archive(df: pd.DataFrame, name: str, uri: str = ARCHIVE_URI) -> int:
+    """
+    Add the rows to the archive, one new file in the directory of each year and city
+
+    Files are never modified: a name that is already in the archive replaces that file, so a
+    name is used once (e.g. the run and the chunk) or on purpose to write the same rows again.
+
+    Args:
+        df (pd.DataFrame): attendees database typed with schema.COLUMN_DTYPES
+        name (str): name of the files, without extension
+        uri (str, optional): location of the archive
+
+    Returns:
+        int: bytes written
+    """
+    filesystem, base = open_filesystem(uri)
+    table = archive_table(df)
+    partitions = pd.DataFrame({'year': df['Date'].dt.year.to_numpy(), 'city': df['City'].astype(object).to_numpy()})
+    size = 0
+    for (year, city), rows in partitions.groupby(['year', 'city'], dropna=False, sort=False).indices.items():
+        size += _write_file(filesystem, f'{base}/{_partition_directory(year, city)}/{name}.parquet', table.take(rows))
+    return size
+
+
+def is_seeded(uri: str = ARCHIVE_URI) -> bool:
+    filesystem, base = open_filesystem(uri)
+    return filesystem.get_file_info(f'{base}/{SEEDED_MARKER}').type == pafs.FileType.File
+
+
+def seed_archive(df: pd.DataFrame, uri: str = ARCHIVE_URI) -> int:
+    """
+    Copy the rows saved before the archive existed, a seed that failed is written again over the same files
+
+    Args:
+        df (pd.DataFrame): whole attendees database typed with schema.COLUMN_DTYPES
+        uri (str, optional): location of the archive
+
+    Returns:
+        int: bytes written
+    """
+    size = write_archive(df, 'seed', uri)
+    filesystem, base = open_filesystem(uri)
+    with filesystem.open_output_stream(f'{base}/{SEEDED_MARKER}') as stream:
+        stream.write(f'{len(df)}\n'.encode())
+    return size
+
+
+def archive_version(uri: str = ARCHIVE_URI) -> str:
+    """
+    Hash of the names, sizes and modified times of the files, it changes with every write
+
+    Args:
+        uri (str, optional): location of the archive
+
+    Returns:
+        str: version of the archive, empty when it has no files
+    """
+    filesystem, base = open_filesystem(uri)
+    files = [x for x in filesystem.get_file_info(pafs.FileSelector(base, recursive=True, allow_not_found=True))
+             if x.type == pafs.FileType.File and x.base_name.endswith('.parquet')
+             and not x.base_name.startswith(('.', '_'))]
+    if not files:
+        return ''
+    listing = '\n'.join(sorted(f'{x.path} {x.size} {x.mtime_ns}' for x in files))
+    return f'{len(files)}-{hashlib.blake2b(listing.encode(), digest_size=8).hexdigest()}'
+
+
+def open_archive(uri: str = ARCHIVE_URI) -> ds.Dataset:
+    """
+    Dataset of the archive, with the Parquet columns and the year and city of the directories
+
+    Args:
+        uri (str, optional): location of the archive
+
+    Returns:
+        ds.Dataset: dataset to scan with filters on its columns
+    """
+    filesystem, base = open_filesystem(uri)
+    filesystem.create_dir(base, recursive=True)
+    # The schema is known, the footers of the files are not read to discover it
+    schema = pa.unify_schemas([ARCHIVE_SCHEMA, PARTITION_SCHEMA])
+    return ds.dataset(base, schema=schema, filesystem=filesystem, format='parquet', partitioning=PARTITIONING)
+
+
+def archive_filter(start=None, end=None, cities: list = None) -> ds.Expression:
+    """
+    Filter of the rows of the meetings between two dates (included) of some cities
+
+    The conditions on year and city select the directories, the conditions on the dates skip
+    the row groups whose statistics are out of the range.
+
+    Args:
+        start (str or datetime, optional): first date
+        end (str or datetime, optional): last date
+        cities (list, optional): cities of the meetings
+
+    Returns:
+        ds.Expression: filter, None without conditions
+    """
+    conditions = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        conditions += [ds.field('year') >= start.year, ds.field('Date') >= start]
+    if end is not None:
+        end = pd.Timestamp(end)
+        conditions += [ds.field('year') <= end.year, ds.field('Date') <= end]
+    if cities is not None:
+        conditions.append(ds.field('city').isin(list(cities)))
+    return functools.reduce(operator.and_, conditions) if conditions else None
+
+
+def read_archive(uri: str = ARCHIVE_URI, columns: list = None, start=None, end=None, cities: list = None,
+                 filter: ds.Expression = None) -> pd.DataFrame:
+    """
+    Read the rows of the archive, only the files and columns needed are read
+
+    Args:
+        uri (str, optional): location of the archive
+        columns (list, optional): columns of the database, all of them by default
+        start (str or datetime, optional): first date of the meetings
+        end (str or datetime, optional): last date of the meetings
+        cities (list, optional): cities of the meetings
+        filter (ds.Expression, optional): other condition on the columns, e.g. ds.field('Format') == 'Online'
+
+    Returns:
+        pd.DataFrame: attendees in the order of the meetings, typed with schema.COLUMN_DTYPES, the
+            repeated rows among the ones read are dropped
+    """
+    columns = list(COLUMN_DTYPES) if columns is None else list(columns)
+    condition = archive_filter(start, end, cities)
+    if filter is not None:
+        condition = filter if condition is None else condition & filter
+
+    table = open_archive(uri).to_table(columns=list(dict.fromkeys(columns + ['Identity', '#'])), filter=condition)
+    df = apply_schema(table.to_pandas(types_mapper={pa.string(): STRING}.get))
+
+    # Files of later runs follow the earlier ones, the first copy of a row written twice is kept
+    df = df.sort_values('#', kind='stable')
+    repeated = df['Identity'].duplicated() & df['Identity'].notna()
+    return df.loc[~repeated.to_numpy(), columns].reset_index(drop=True)
@@ -0,0 +1,283 @@
+"""
+Backfill of the attendees of any date range, e.g. to rebuild the history or a season.
+
+The range is split in shards of consecutive dates with about the same number of events,
+each shard is fetched and transformed by its own process (or its own invocation of
+backfill_handler) and saved as a Parquet file. The shards are then merged in date order,
+the meeting numbers of each shard continue the numbers of the previous one:
+
+    python backfill.py 2020-10-01 2023-12-31 --workers 8 --output backfill.parquet
+
+The sheet is not modified, the result is saved in the output file and, with --archive,
+added to the archive (archive.py). The archive only takes meetings after its last one, their
+numbers continue its numbers.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from decouple import config
+
+import lambda_function
+from eventbrite import iter_attendee_pages, list_chapter_events
+from eventbrite_client import MAX_WORKERS, EventbriteClient
+from identity import IdentityIndex
+from instrumentation import RunMetrics
+from lambda_function import CHUNK_SIZE, get_api_client
+from schema import apply_schema
+from transform import OUTPUT_COLUMNS, chunk_records, process_attendees
+
+# Processes of the pool, each one with its own Eventbrite client
+BACKFILL_WORKERS = config('N2N_BACKFILL_WORKERS', default=os.cpu_count() or 1, cast=int)
+
+# Client and chapters of a process of the pool, set by _start_worker
+_worker = None
+
+
+def _next_day(date: str) -> str:
+    return (datetime.strptime(date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def shard_dates(start: str, end: str, event_dates: list, shards: int) -> list:
+    """
+    Split a date range in consecutive ranges with about the same number of events
+
+    The events of a date are always in the same shard, a meeting is never split.
+
+    Args:
+        start (str): first date of the range (YYYY-MM-DD)
+        end (str): last date of the range (YYYY-MM-DD)
+        event_dates (list): date (YYYY-MM-DD) of each event of the range, sorted
+        shards (int): maximum number of shards
+
+    Returns:
+        list: (first date, last date) of each shard, together they cover the range
+    """
+    dates = sorted(set(event_dates))
+    if not dates or shards <= 1:
+        return [(start, end)]
+
+    # Last date of each shard: the date of the event at each fraction of the list
+    size = len(event_dates) / min(shards, len(dates))
+    ends = sorted({event_dates[min(int(size * (i + 1)) - 1, len(event_dates) - 1)]
+                   for i in range(min(shards, len(dates)))})
+    ends[-1] = end
+    starts = [start] + [_next_day(x) for x in ends[:-1]]
+    return list(zip(starts, ends))
+
+
+def write_table(df: pd.DataFrame, uri: str):
+    # Parquet file in a local path or an s3:// uri, the pandas metadata keeps the types of the columns
+    from archive import open_filesystem
+
+    filesystem, path = open_filesystem(uri)
+    filesystem.create_dir(path.rsplit('/', 1)[0], recursive=True)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, filesystem=filesystem)
+
+
+def read_table(uri: str) -> pd.DataFrame:
+    from archive import open_filesystem
+
+    filesystem, path = open_filesystem(uri)
+    return apply_schema(pq.read_table(path, filesystem=filesystem).to_pandas())
+
+
+def backfill_shard(shard: dict, api_client: EventbriteClient = None, chapters: list = None) -> dict:
+    """
+    Fetch and transform the attendees of the meetings of a date range and save them as Parquet
+
+    The meeting numbers of the shard start at 1, merge_shards moves them after the numbers of
+    the previous shards. The attendees repeated in the shard are dropped.
+
+    Args:
+        shard (dict): 'start' and 'end' dates (YYYY-MM-DD) and 'output', the path or uri of the file
+        api_client (EventbriteClient, optional): client of the Eventbrite api, given with chapters
+        chapters (list, optional): chapters with their 'name', 'organization_id' and 'city'
+
+    Returns:
+        dict: the shard with its 'rows', 'meetings' and the 'metrics' of the run
+    """
+    if api_client is None:
+        api_client, chapters = get_api_client()
+    metrics = RunMetrics('backfill_shard')
+
+    with metrics.stage('list_events') as stage:
+        events = list_chapter_events(api_client, chapters, {x['name']: shard['start'] for x in chapters},
+                                     shard['end'])
+        stage['rows'] += len(events)
+    chapter_cities = {x['name']: x['city'] for x in chapters}
+    cities = {x['id']: chapter_cities[x['chapter']] for x in events}
+
+    pages = metrics.iterate('fetch_attendees',
+                            iter_attendee_pages([x['id'] for x in events], api_client, MAX_WORKERS * len(chapters),
+                                                cities))
+    index = IdentityIndex()
+    frames = []
+    previous = None
+    for records in chunk_records(pages, CHUNK_SIZE):
+        metrics.add('fetch_attendees', rows=len(records))
+        records, _ = index.deduplicate(records)
+        if records:
+            df, previous = process_attendees(records, 0, previous, metrics)
+            frames.append(df)
+
+    with metrics.stage('write_shard') as stage:
+        df = pd.concat(frames, ignore_index=True) if frames else apply_schema(pd.DataFrame(columns=OUTPUT_COLUMNS))
+        write_table(df, shard['output'])
+        stage['rows'] += len(df)
+
+    metrics.emit('ok', start=shard['start'], end=shard['end'], rows=len(df))
+    return dict(shard, rows=len(df), meetings=previous[2] if previous else 0, metrics=metrics.summary())
+
+
+def backfill_handler(event, context):
+    # One shard by invocation, e.g. {"start": "2021-01-01", "end": "2021-06-30", "output": "s3://bucket/shard-0.parquet"}
+    return backfill_shard(event)
+
+
+def merge_shards(shards: list, first_number: int = 0) -> pd.DataFrame:
+    """
+    Join the shards in date order, renumbering the meetings so they follow the calendar
+
+    The seasons depend only on the date and the city of each meeting, they are the same
+    whatever the shards.
+
+    Args:
+        shards (list): results of backfill_shard
+        first_number (int, optional): meeting number before the first meeting of the range
+
+    Returns:
+        pd.DataFrame: attendees of the range with the OUTPUT_COLUMNS of the database
+    """
+    frames = []
+    offset = first_number
+    for shard in sorted(shards, key=lambda x: x['start']):
+        df = read_table(shard['output'])
+        df['#'] += offset
+        offset += shard['meetings']
+        frames.append(df)
+    return apply_schema(pd.concat(frames, ignore_index=True))
+
+
+def archive_last_number(uri: str, start: str) -> int:
+    """
+    Number of the last meeting of the archive, the meetings of a backfill added to it follow it
+
+    Args:
+        uri (str): location of the archive
+        start (str): first date of the backfill (YYYY-MM-DD)
+
+    Returns:
+        int: last meeting number, 0 when the archive is empty
+
+    Raises:
+        ValueError: the archive has meetings from start on, their numbers and rows would be written twice
+    """
+    from archive import read_archive
+
+    df = read_archive(uri, ['Date', '#'])
+    if df.empty:
+        return 0
+    last_date = df['Date'].max()
+    if last_date >= pd.Timestamp(start):
+        raise ValueError(f'the archive has meetings until {last_date:%Y-%m-%d}, '
+                         f'only a range after that date can be added to it')
+    return int(df['#'].max())
+
+
+def _start_worker(base_url: str, chapters: list):
+    # Each process builds its own client: the forked copy of the client of the parent would share its
+    # open connections and the connection of its response cache with the other processes
+    global _worker
+    lambda_function._api_client = None
+    if base_url is not None:
+        # Offline runs give the url of the api (e.g. MockEventbrite) and the chapters, without credentials
+        _worker = (EventbriteClient(None, base_url=base_url, pool_size=MAX_WORKERS * len(chapters)), chapters)
+    else:
+        _worker = get_api_client()
+
+
+def _run_shard(shard: dict) -> dict:
+    api_client, chapters = _worker
+    return backfill_shard(shard, api_client, chapters)
+
+
+def backfill(start: str, end: str, directory: str, workers: int = BACKFILL_WORKERS, first_number: int = 0,
+             base_url: str = None, chapters: list = None) -> tuple:
+    """
+    Fetch and transform the attendees of a date range in a pool of processes
+
+    Args:
+        start (str): first date (YYYY-MM-DD)
+        end (str): last date (YYYY-MM-DD)
+        directory (str): path or uri where the files of the shards are saved
+        workers (int, optional): processes of the pool, and maximum number of shards
+        first_number (int, optional): meeting number before the first meeting of the range
+        base_url (str, optional): root url of the api for offline runs, given with chapters
+        chapters (list, optional): chapters with their 'name', 'organization_id' and 'city'
+
+    Returns:
+        tuple: attendees of the range and the results of the shards
+    """
+    if base_url is not None:
+        api_client = EventbriteClient(None, base_url=base_url, pool_size=len(chapters))
+    else:
+        api_client, chapters = get_api_client()
+
+    # The events are listed once to balance the shards, each shard lists its own again
+    events = list_chapter_events(api_client, chapters, {x['name']: start for x in chapters}, end)
+    ranges = shard_dates(start, end, [x['start']['local'][:10] for x in events], workers)
+    shards = [{'start': first, 'end': last, 'output': f'{directory.rstrip("/")}/shard-{first}-{last}.parquet'}
+              for first, last in ranges]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards)), initializer=_start_worker,
+                             initargs=(base_url, chapters)) as executor:
+        results = list(executor.map(_run_shard, shards))
+    return merge_shards(results, first_number), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('start', help='first date, YYYY-MM-DD')
+    parser.add_argument('end', help='last date, YYYY-MM-DD')
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS)
+    parser.add_argument('--first-number', type=int,
+                        help='meeting number before the first meeting of the range, by default 0 or the last '
+                             'meeting of the archive with --archive')
+    parser.add_argument('--shards', default='backfill_shards', help='directory or uri of the files of the shards')
+    parser.add_argument('--output', default='backfill.parquet', help='Parquet file of the attendees of the range')
+    parser.add_argument('--archive', action='store_true', help='also add the attendees to the archive')
+    args = parser.parse_args()
+
+    first_number = args.first_number or 0
+    if args.archive:
+        from archive import ARCHIVE_URI, write_archive
+        if not ARCHIVE_URI:
+            parser.error('--archive needs the location of the archive in N2N_ARCHIVE_URI')
+        # Checked before the range is fetched
+        try:
+            last_number = archive_last_number(ARCHIVE_URI, args.start)
+        except ValueError as error:
+            parser.error(str(error))
+        if args.first_number is not None and args.first_number < last_number:
+            parser.error(f'--first-number must be at least {last_number}, the last meeting of the archive')
+        first_number = last_number if args.first_number is None else args.first_number
+
+    started = time.perf_counter()
+    df, results = backfill(args.start, args.end, args.shards, args.workers, first_number)
+    write_table(df, args.output)
+    if args.archive:
+        write_archive(df, f'backfill-{args.start}-{args.end}', ARCHIVE_URI)
+
+    seconds = time.perf_counter() - started
+    print(f'{len(df)} attendees of {df["#"].nunique()} meetings in {len(results)} shards, {seconds:.1f} s, '
+          f'{len(df) / seconds:.0f} attendees/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import functools
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from decouple import config
+
+# Rules that read the City, the Industry / Event and the Format of a meeting from its event name,
+# the patterns are regular expressions
+EVENT_RULES_PATH = config('N2N_EVENT_RULES_PATH',
+                          default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'event_names.json'))
+
+# Distinct event names remembered by the parser, a run has a few dozens
+EVENT_CACHE_SIZE = 4096
+
+# Fields given by the event name, in the order of the parsed tuples
+EVENT_FIELDS = ['City', 'Industry / Event', 'Format']
+
+
+def _any_of(patterns: list) -> re.Pattern:
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+
+class EventNameParser:
+    """
+    Parse the event names of Eventbrite with the rules of each field.
+
+    City and Format are the value of the first rule whose pattern is found in the name, or
+    the default. The Industry / Event is the side of the separator without the organization
+    name, without the prefix (e.g. 'Latinos in '). Each distinct name is parsed once and
+    remembered, so the cost of a column depends on its number of distinct names.
+
+    Args:
+        rules (dict): 'City' and 'Format' with 'rules' (pattern and value) and 'default', 'Industry / Event'
+            with the 'separator', the organization patterns before and after it and the 'prefix'
+    """
+
+    def __init__(self, rules: dict):
+        self.rules = rules
+        self._values = {field: ([(re.compile(rule['pattern']), rule['value']) for rule in rules[field]['rules']],
+                                rules[field]['default'])
+                        for field in ('City', 'Format')}
+        industry = rules['Industry / Event']
+        self._separator = re.compile(industry['separator'])
+        self._organization_before = _any_of(industry['organization_before'])
+        self._organization_after = _any_of(industry['organization_after'])
+        self._prefix = re.compile(industry['prefix'])
+        self.parse = functools.lru_cache(maxsize=EVENT_CACHE_SIZE)(self._parse)
+
+    @classmethod
+    def from_file(cls, path: str = EVENT_RULES_PATH) -> 'EventNameParser':
+        with open(path, encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def _value(self, name: str, field: str) -> str:
+        rules, default = self._values[field]
+        return next((value for pattern, value in rules if pattern.search(name)), default)
+
+    def _industry(self, name: str) -> str:
+        parts = self._separator.split(name)
+        if len(parts) == 1:
+            return name.strip()
+
+        # The second part is the event when the organization is first, and the other way around
+        before, after = parts[0], parts[1]
+        event = name
+        if self._organization_before.search(before):
+            event = after
+        elif self._organization_after.search(after):
+            event = before
+
+        if self._prefix.search(event):
+            event = self._prefix.split(event)[1]
+        return event.strip()
+
+    def _parse(self, name: str) -> tuple:
+        return self._value(name, 'City'), self._industry(name), self._value(name, 'Format')
+
+    def parse_names(self, names: pd.Series) -> pd.DataFrame:
+        """
+        Parse a column of event names, each distinct name only once
+
+        Args:
+            names (pd.Series): event names
+
+        Returns:
+            pd.DataFrame: EVENT_FIELDS of each name with the index of names, empty for the missing names
+        """
+        codes, uniques = pd.factorize(names)
+        # The last row is the one of the missing names (code -1)
+        parsed = np.array([self.parse(x) for x in uniques] + [(None,) * len(EVENT_FIELDS)],
+                          dtype=object).reshape(-1, len(EVENT_FIELDS))
+        return pd.DataFrame(parsed[codes], index=names.index, columns=EVENT_FIELDS)
+
+
+_parser = None
+
+
+def get_event_parser() -> EventNameParser:
+    """Return the parser of EVENT_RULES_PATH, loaded once and reused by the next calls"""
+    global _parser
+    if _parser is None:
+        _parser = EventNameParser.from_file()
+    return _parser
@@ -0,0 +1,152 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from eventbrite_client import MAX_WORKERS, EventbriteClient
+
+
+def project_attendee(attendee: dict, event_name: str, date_attending: str, city: str = None) -> dict:
+    """
+    Keep only the fields of an attendee that are saved in the database
+
+    Args:
+        attendee (dict): attendee returned by Eventbrite
+        event_name (str): name of the event
+        date_attending (str): local start date of the event
+        city (str, optional): city of the chapter that organizes the event, None if it is not known
+
+    Returns:
+        dict: id, event_name, date_attending, city, status, profile (email and names) and answers of the attendee
+    """
+    profile = attendee['profile']
+    return {
+        'id': attendee.get('id'),
+        'event_name': event_name,
+        'date_attending': date_attending,
+        'city': city,
+        'status': attendee['status'],
+        'profile': {'email': profile['email'],
+                    'first_name': profile['first_name'],
+                    'last_name': profile['last_name']},
+        'answers': [{'question': answer['question'], 'answer': answer.get('answer')}
+                    for answer in attendee['answers']],
+    }
+
+
+def iter_attendee_pages(id_events: list, client: EventbriteClient, max_workers: int = MAX_WORKERS,
+                        cities: dict = None):
+    """
+    Yield the attendees of several events page by page, keeping the order of id_events and of the pages.
+
+    The requests run concurrently, but only a few pages (about 3 * max_workers) are requested
+    ahead of the page being consumed, so the memory does not grow with the number of events.
+
+    Args:
+        id_events (list): the event ids of the meetings
+        client (EventbriteClient): session used to call the api
+        max_workers (int, optional): maximum number of requests in flight
+        cities (dict, optional): city of the chapter of each event id
+
+    Yields:
+        list: attendees of a page, reduced with project_attendee
+    """
+    cities = cities or {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def submit_event(event_id: str) -> tuple:
+            return (event_id, executor.submit(client.get, f'/events/{event_id}/'),
+                    executor.submit(client.get, f'/events/{event_id}/attendees/'))
+
+        def requests_in_order():
+            # The event and its first page are requested max_workers events ahead,
+            # the remaining pages once the page count of the event is known
+            events = iter(id_events)
+            upcoming = deque(map(submit_event, islice(events, max_workers)))
+            while upcoming:
+                event_id, event_future, first_page_future = upcoming.popleft()
+                upcoming.extend(map(submit_event, islice(events, 1)))
+                yield event_id, event_future, first_page_future
+
+                page_count = first_page_future.result()['pagination']['page_count']
+                for i in range(2, page_count + 1):
+                    yield (event_id, event_future,
+                           executor.submit(client.get, f'/events/{event_id}/attendees/', {'page': i}))
+
+        planned = requests_in_order()
+        window = deque(islice(planned, 2 * max_workers))
+        while window:
+            event_id, event_future, page_future = window.popleft()
+            window.extend(islice(planned, 1))
+
+            response_individual_event = event_future.result()
+            event_name = response_individual_event['name']['text']
+            date_attending = response_individual_event['start']['local']
+            city = cities.get(event_id)
+
+            yield [project_attendee(x, event_name, date_attending, city) for x in page_future.result()['attendees']]
+
+
+def fetch_all_attendees(id_events: list, client: EventbriteClient, max_workers: int = MAX_WORKERS) -> list:
+    """
+    Arrange in a list of dictionaries all the information of the attendees of several events
+
+    Args:
+        id_events (list): the event ids of the meetings
+        client (EventbriteClient): session used to call the api
+        max_workers (int, optional): maximum number of requests in flight
+
+    Returns:
+        list: list made up of dictionaries with the information of each attendant by event
+    """
+    return [attendee for page in iter_attendee_pages(id_events, client, max_workers) for attendee in page]
+
+
+def list_events(client: EventbriteClient, organization_id: str, start_date: str, end_date: str) -> list:
+    """
+    List the events of an organization that start between two dates
+
+    Args:
+        client (EventbriteClient): session used to call the api
+        organization_id (str): id of the organization in Eventbrite
+        start_date (str): first date (YYYY-MM-DD)
+        end_date (str): last date (YYYY-MM-DD)
+
+    Returns:
+        list: events of the organization, empty if there are none
+    """
+    params = {'start_date.range_start': start_date, 'start_date.range_end': end_date}
+    events = []
+    # The events are listed by pages of 50, each page gives the continuation of the next one
+    while True:
+        response = client.get(f'/organizations/{organization_id}/events/', params=params)
+        # The api answers without the 'events' key when there are no events in the range
+        events.extend(response.get('events', []))
+        pagination = response.get('pagination', {})
+        if not pagination.get('has_more_items'):
+            return events
+        params = dict(params, continuation=pagination['continuation'])
+
+
+def list_chapter_events(client: EventbriteClient, chapters: list, start_dates: dict, end_date: str) -> list:
+    """
+    List the events of several chapters at the same time and merge them by start date
+
+    The meetings of all the chapters are saved in the same database, ordered by date the
+    meeting numbers follow the calendar whatever the chapter of each meeting.
+
+    Args:
+        client (EventbriteClient): session used to call the api
+        chapters (list): chapters with their 'name', 'organization_id' and 'city'
+        start_dates (dict): first date (YYYY-MM-DD) of the events of each chapter name
+        end_date (str): last date (YYYY-MM-DD)
+
+    Returns:
+        list: events of all the chapters ordered by local start, each one with its 'chapter' name
+    """
+    with ThreadPoolExecutor(max_workers=len(chapters)) as executor:
+        listings = executor.map(lambda x: list_events(client, x['organization_id'], start_dates[x['name']], end_date),
+                                chapters)
+        events = [dict(event, chapter=chapter['name'])
+                  for chapter, chapter_events in zip(chapters, listings) for event in chapter_events]
+    # sorted is stable, the events of the same start keep the order of the chapters
+    return sorted(events, key=lambda x: x['start']['local'])
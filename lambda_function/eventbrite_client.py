@@ -0,0 +1,207 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from decouple import config
+
+from response_cache import ResponseCache, cache_key
+
+# Root of the api, another one (e.g. MockEventbrite) for offline runs
+EVENTBRITE_API = config('EVENTBRITE_API', default='https://www.eventbriteapi.com/v3')
+
+# Maximum number of connections (and requests in flight) to the Eventbrite host
+MAX_WORKERS = config('EVENTBRITE_MAX_WORKERS', default=8, cast=int)
+
+# Responses that are worth to retry
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Longest Retry-After that is waited. The hourly rate limit asks for up to an hour, longer than the
+# Lambda can run: the request fails instead and the next run resumes from the checkpoint
+MAX_RETRY_AFTER = config('EVENTBRITE_MAX_RETRY_AFTER', default=60, cast=float)
+
+
+def retry_after_seconds(value: str) -> float:
+    """
+    Transform the Retry-After header in seconds
+
+    Args:
+        value (str): header value, can be a number of seconds or a http date
+
+    Returns:
+        float: seconds to wait, None if the value can not be read
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class EventbriteClient:
+    """
+    Shared http session for all the Eventbrite calls.
+
+    The connections to the api are pooled and kept alive, each request has a timeout and
+    rate limits (429) or server errors (5xx) are retried with exponential backoff,
+    respecting the Retry-After header when the api sends it, unless it is longer than
+    max_retry_after.
+
+    With a ResponseCache, fresh responses are not requested again and stale ones are
+    revalidated with If-None-Match / If-Modified-Since, a 304 answer reuses the cached body.
+
+    Args:
+        token (str): Eventbrite private token
+        base_url (str, optional): root url of the api
+        pool_size (int, optional): maximum connections to the api host
+        max_retries (int, optional): retries of a request before failing
+        backoff (float, optional): seconds of the first retry, doubled in each attempt
+        timeout (float, optional): seconds to wait for the api
+        cache (ResponseCache, optional): persistent store of the responses
+        max_retry_after (float, optional): longest Retry-After in seconds, a longer one fails the request
+    """
+
+    def __init__(self, token: str, base_url: str = EVENTBRITE_API, pool_size: int = MAX_WORKERS,
+                 max_retries: int = 5, backoff: float = 0.5, timeout: float = 30, cache: ResponseCache = None,
+                 max_retry_after: float = MAX_RETRY_AFTER):
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_retry_after = max_retry_after
+
+        self.session = requests.Session()
+        if token:
+            self.session.headers['Authorization'] = f'Bearer {token}'
+        # pool_block keeps the connections to the host under pool_size
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        """Set the counters of the requests to zero, e.g. at the start of a run"""
+        with self._lock:
+            self._metrics = {'requests': 0, 'retries': 0, 'errors': 0, 'bytes': 0,
+                             'latency_total': 0.0, 'latency_max': 0.0,
+                             'cache_hits': 0, 'cache_revalidated': 0, 'cache_misses': 0, 'bytes_saved': 0}
+
+    def _record(self, latency: float, retry: bool = False, error: bool = False, size: int = 0):
+        with self._lock:
+            self._metrics['requests'] += 1
+            self._metrics['retries'] += retry
+            self._metrics['errors'] += error
+            self._metrics['bytes'] += size
+            self._metrics['latency_total'] += latency
+            self._metrics['latency_max'] = max(self._metrics['latency_max'], latency)
+
+    def _record_cache(self, outcome: str, saved: int = 0):
+        with self._lock:
+            self._metrics[f'cache_{outcome}'] += 1
+            self._metrics['bytes_saved'] += saved
+
+    def metrics(self) -> dict:
+        """
+        Return the counters of the requests made by the client
+
+        Returns:
+            dict: requests, retries, errors, bytes received and latency (seconds) of the requests,
+                and the responses served by the cache (fresh hits and 304 revalidations), its hit rate
+                and the bytes that were not downloaded
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics['latency_mean'] = metrics['latency_total'] / metrics['requests'] if metrics['requests'] else 0.0
+        lookups = metrics['cache_hits'] + metrics['cache_revalidated'] + metrics['cache_misses']
+        metrics['cache_hit_rate'] = (metrics['cache_hits'] + metrics['cache_revalidated']) / lookups if lookups else 0.0
+        return metrics
+
+    def _wait(self, attempt: int, delay: float = None):
+        # The Retry-After of the api, or the exponential backoff
+        if delay is None:
+            delay = self.backoff * 2 ** attempt * (1 + random.random() / 2)
+        time.sleep(delay)
+
+    def get(self, path: str, params: dict = None) -> dict:
+        """
+        Request a resource of the api and return the decoded json body
+
+        Args:
+            path (str): path of the resource (e.g. '/events/123/') or full url
+            params (dict, optional): query parameters of the request
+
+        Returns:
+            dict: json response of the api
+
+        Raises:
+            requests.HTTPError: the api answered with an error, kept failing after all the retries, or
+                asked to wait longer than max_retry_after
+            requests.RequestException: the api could not be reached after all the retries
+        """
+        url = path if path.startswith('http') else f'{self.base_url}/{path.lstrip("/")}'
+
+        # Fresh responses are not requested, stale ones are requested only if they changed
+        cached, headers = None, {}
+        if self.cache is not None:
+            key = cache_key(url, params)
+            cached = self.cache.get(key)
+            if cached is not None and cached['fresh']:
+                self._record_cache('hits', cached['size'])
+                return cached['body']
+            if cached is not None and cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached is not None and cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout, headers=headers)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(time.perf_counter() - start, retry=not last, error=last)
+                if last:
+                    raise
+                self._wait(attempt)
+                continue
+
+            if response.status_code in RETRY_STATUS and not last:
+                delay = retry_after_seconds(response.headers.get('Retry-After'))
+                if delay is not None and delay > self.max_retry_after:
+                    self._record(time.perf_counter() - start, error=True, size=len(response.content))
+                    raise requests.HTTPError(f'{response.status_code} with a Retry-After of {delay:.0f} s, longer than '
+                                             f'{self.max_retry_after:.0f} s: {url}', response=response)
+                self._record(time.perf_counter() - start, retry=True)
+                self._wait(attempt, delay)
+                continue
+
+            self._record(time.perf_counter() - start, error=not response.ok, size=len(response.content))
+            if response.status_code == 304 and headers:
+                self.cache.touch(key)
+                self._record_cache('revalidated', cached['size'])
+                return cached['body']
+            response.raise_for_status()
+            if self.cache is not None:
+                self.cache.put(key, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                self._record_cache('misses')
+            return response.json()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,182 @@
+import hashlib
+
+import pandas as pd
+
+# Keys of a date kept in a cell of the index, a cell of the Sheets api holds up to 50000 characters
+KEYS_PER_CELL = 2000
+
+
+def _key(kind: str, *parts: str) -> str:
+    # 64 bits hash as 16 hexadecimal characters, stable between processes and runs
+    return hashlib.blake2b('\x1f'.join((kind,) + parts).encode(), digest_size=8).hexdigest()
+
+
+def _clean(value) -> str:
+    return '' if pd.isna(value) else str(value).strip().casefold()
+
+
+def email_date_key(email: str, date: str) -> str:
+    """
+    Identity of a person in a meeting: email (trimmed, without case) and date of the event
+
+    Args:
+        email (str): email of the attendee
+        date (str): date of the event as 'YYYY-MM-DD...'
+
+    Returns:
+        str: 16 hexadecimal characters, None when the email or the date is empty
+    """
+    email, date = _clean(email), _clean(date)[:10]
+    return _key('e', email, date) if email and date else None
+
+
+def attendee_id_key(attendee_id: str) -> str:
+    """Identity of an Eventbrite attendee (a ticket of an order), None without id"""
+    attendee_id = _clean(attendee_id)
+    return _key('i', attendee_id) if attendee_id else None
+
+
+def email_date_keys(emails: pd.Series, dates: pd.Series) -> pd.Series:
+    """
+    email_date_key of each attendee of a data frame
+
+    Args:
+        emails (pd.Series): emails of the attendees
+        dates (pd.Series): dates of the events, as 'YYYY-MM-DD...' text or datetimes
+
+    Returns:
+        pd.Series: key of each attendee, None when the email or the date is empty
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        dates = dates.dt.strftime('%Y-%m-%d')
+    return pd.Series([email_date_key(email, date) for email, date in zip(emails, dates)],
+                     index=emails.index, dtype=object)
+
+
+def normalize_emails(emails: pd.Series) -> pd.Series:
+    # Emails trimmed and without case, empty text when there is no email
+    return emails.astype(object).fillna('').astype(str).str.strip().str.casefold()
+
+
+def drop_duplicate_attendees(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Keep the first row of each email in each meeting date, the rows without email are kept
+
+    Args:
+        df (pd.DataFrame): attendees database with the Email and Date columns
+
+    Returns:
+        pd.DataFrame: attendees without repeated rows
+    """
+    emails = normalize_emails(df['Email'])
+    repeated = pd.DataFrame({'Email': emails, 'Date': df['Date']}).duplicated() & (emails != '')
+    return df[~repeated.to_numpy()]
+
+
+def person_ids(emails: pd.Series) -> pd.Series:
+    """
+    Identity of each person across the meetings, a hash of the email so the summary tables do not keep it
+
+    Args:
+        emails (pd.Series): emails of the attendees
+
+    Returns:
+        pd.Series: 64 bits identifier by attendee, empty (NA) without email
+    """
+    emails = normalize_emails(emails)
+    ids = pd.Series(pd.util.hash_array(emails.to_numpy(dtype=object), categorize=True), index=emails.index,
+                    dtype='UInt64')
+    return ids.mask(emails == '')
+
+
+class IdentityIndex:
+    """
+    Hashed keys of the attendees already saved, by meeting date.
+
+    An attendee is repeated when its Eventbrite id or its email in the same date is in the
+    index, the lookup is a set membership. Only the dates that a run can write are loaded,
+    and only the dates that change are saved again.
+
+    Args:
+        rows (dict, optional): date ('YYYY-MM-DD'): row numbers of the date in the tab of the index
+        keys (dict, optional): date: keys loaded from those rows
+        next_row (int, optional): first empty row of the tab
+    """
+
+    def __init__(self, rows: dict = None, keys: dict = None, next_row: int = 2):
+        self._rows = {date: list(numbers) for date, numbers in (rows or {}).items()}
+        # Keys of each date in the order they were saved, recording a key twice keeps one
+        self._keys = {date: dict.fromkeys(values) for date, values in (keys or {}).items()}
+        self.next_row = next_row
+        self.seen = {key for values in self._keys.values() for key in values}
+        self._changed = set()
+
+    def __len__(self) -> int:
+        return len(self.seen)
+
+    def deduplicate(self, records: list) -> tuple:
+        """
+        Drop the records already in the index or repeated in the list
+
+        The keys of the kept records are marked as seen, but they are saved only when record() is called
+        after the rows were written.
+
+        Args:
+            records (list): attendees reduced with eventbrite.project_attendee
+
+        Returns:
+            tuple: kept records and the (date, keys) of each one
+        """
+        kept, identities = [], []
+        for record in records:
+            date = (record['date_attending'] or '')[:10]
+            keys = [x for x in (attendee_id_key(record.get('id')), email_date_key(record['profile']['email'], date))
+                    if x is not None]
+            if any(x in self.seen for x in keys):
+                continue
+            self.seen.update(keys)
+            kept.append(record)
+            identities.append((date, keys))
+        return kept, identities
+
+    def record(self, identities: list):
+        """
+        Add the keys of rows written in the database to the saved index
+
+        Args:
+            identities (list): (date, keys) of each row
+        """
+        for date, keys in identities:
+            self.seen.update(keys)
+            self._keys.setdefault(date, {}).update(dict.fromkeys(keys))
+            self._changed.add(date)
+
+    def record_rows(self, df: pd.DataFrame):
+        """
+        Add the rows of the database (Email and Date columns), e.g. rows written before a failure
+
+        Args:
+            df (pd.DataFrame): attendees database
+        """
+        dates = df['Date'].dt.strftime('%Y-%m-%d') if pd.api.types.is_datetime64_any_dtype(df['Date']) else df['Date']
+        keys = email_date_keys(df['Email'], df['Date'])
+        self.record([(date, [key]) for date, key in zip(dates, keys) if key is not None])
+
+    def changes(self) -> list:
+        """
+        Rows of the tab to write for the dates that changed since the last call
+
+        Returns:
+            list: (row number, [date, keys separated by spaces]) of each row
+        """
+        changes = []
+        for date in sorted(self._changed):
+            keys = list(self._keys[date])
+            cells = [keys[i:i + KEYS_PER_CELL] for i in range(0, len(keys), KEYS_PER_CELL)]
+            numbers = self._rows.setdefault(date, [])
+            while len(numbers) < len(cells):
+                numbers.append(self.next_row)
+                self.next_row += 1
+            changes += [(number, [date, ' '.join(cell)]) for number, cell in zip(numbers, cells)]
+        self._changed.clear()
+        return changes
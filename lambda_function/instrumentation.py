@@ -0,0 +1,185 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from decouple import config
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+# Peak python memory of each stage with tracemalloc, it slows down the allocations so it is opt-in
+TRACE_MEMORY = config('N2N_TRACE_MEMORY', default=False, cast=bool)
+
+# File where the profile of a run is saved, no profile when empty. The profiler is cprofile or pyinstrument
+PROFILE_PATH = config('N2N_PROFILE', default='')
+PROFILER = config('N2N_PROFILER', default='cprofile')
+
+
+def log_event(event: str, **fields):
+    """
+    Print a structured log line, CloudWatch reads each json line of the output of the Lambda as an event
+
+    Args:
+        event (str): name of the event, e.g. 'stage' or 'run'
+        **fields: values of the event
+    """
+    print(json.dumps({'event': event, **fields}, default=str))
+
+
+def max_rss_mb() -> float:
+    """Highest resident memory of the process so far, in MiB (None where it can not be read)"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RunMetrics:
+    """
+    Time, rows, bytes and memory of the named stages of a run.
+
+    The stages can run several times (e.g. once per chunk), their values are added.
+
+    Args:
+        run (str): name of the run in the logs
+        trace_memory (bool, optional): measure the peak python memory of each stage with tracemalloc
+    """
+
+    def __init__(self, run: str, trace_memory: bool = TRACE_MEMORY):
+        self.run = run
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self._start = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stage(self, name: str) -> dict:
+        if name not in self.stages:
+            self.stages[name] = {'calls': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0, 'peak_mb': None}
+        return self.stages[name]
+
+    def add(self, name: str, rows: int = 0, nbytes: int = 0):
+        """
+        Add rows and bytes to a stage without timing it
+
+        Args:
+            name (str): name of the stage
+            rows (int, optional): rows processed
+            nbytes (int, optional): bytes transferred
+        """
+        values = self._stage(name)
+        values['rows'] += rows
+        values['bytes'] += nbytes
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a block of code as a call of the stage
+
+        Args:
+            name (str): name of the stage
+
+        Yields:
+            dict: values of the stage, the block can add its 'rows' and 'bytes'
+        """
+        values = self._stage(name)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield values
+        finally:
+            values['calls'] += 1
+            values['seconds'] += time.perf_counter() - start
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                values['peak_mb'] = max(values['peak_mb'] or 0.0, peak)
+
+    def iterate(self, name: str, iterable):
+        """
+        Time the production of each item of an iterable as a call of the stage
+
+        Args:
+            name (str): name of the stage
+            iterable (iterable): e.g. the pages of attendees fetched from the api
+
+        Yields:
+            the items of iterable
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def summary(self) -> dict:
+        return {'run': self.run,
+                'seconds': round(time.perf_counter() - self._start, 4),
+                'max_rss_mb': max_rss_mb(),
+                'stages': {name: dict(values, seconds=round(values['seconds'], 4))
+                           for name, values in self.stages.items()}}
+
+    def emit(self, status: str = 'ok', **fields):
+        """
+        Log a line by stage and a line with the whole run
+
+        Args:
+            status (str, optional): 'ok' or 'error'
+            **fields: other values of the run, e.g. the metrics of the api client
+        """
+        summary = self.summary()
+        for name, values in summary['stages'].items():
+            log_event('stage', run=self.run, stage=name, **values)
+        log_event('run', run=self.run, status=status, seconds=summary['seconds'],
+                  max_rss_mb=summary['max_rss_mb'], **fields)
+
+
+@contextmanager
+def profile(path: str = PROFILE_PATH, profiler: str = PROFILER, top: int = 25):
+    """
+    Profile the block of code and save the profile in path, nothing is done when path is empty
+
+    With cprofile the stats are saved for pstats/snakeviz and the functions with the highest
+    cumulative time are logged; with pyinstrument (installed apart) its text report is saved.
+
+    Args:
+        path (str, optional): file of the profile, e.g. '/tmp/loader.prof'
+        profiler (str, optional): 'cprofile' or 'pyinstrument'
+        top (int, optional): functions included in the log of cprofile
+    """
+    if not path:
+        yield
+        return
+
+    if profiler == 'pyinstrument':
+        from pyinstrument import Profiler
+
+        pyinstrument_profiler = Profiler()
+        pyinstrument_profiler.start()
+        try:
+            yield
+        finally:
+            pyinstrument_profiler.stop()
+            with open(path, 'w') as file:
+                file.write(pyinstrument_profiler.output_text())
+            log_event('profile', profiler=profiler, path=path)
+        return
+
+    cprofile_profiler = cProfile.Profile()
+    cprofile_profiler.enable()
+    try:
+        yield
+    finally:
+        cprofile_profiler.disable()
+        cprofile_profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(cprofile_profiler, stream=report).sort_stats('cumulative').print_stats(top)
+        log_event('profile', profiler=profiler, path=path, top=report.getvalue())
@@ -1,496 +1,305 @@
-import requests
 import json
-
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from gspread_dataframe import get_as_dataframe, set_with_dataframe
-from decouple import config
-
-import numpy as np
-import pandas as pd
+import uuid
 from datetime import datetime, timedelta
 
-import os
-
-def lambda_handler(event, context):
-    api_data_loader()
-
-def api_data_loader():
-    #### Read previous data from google sheets
-
-    # Define the scope
-    SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    CREDENTIALS = json.loads(config('CRED_GCP'))
-
-    # Credentials
-    # add credentials to the account
-    credentials = ServiceAccountCredentials.from_json_keyfile_dict(CREDENTIALS, SCOPE)
-
-    # authorize the clientsheet
-    client = gspread.authorize(credentials)
-
-    # get the instance of the Spreadsheet
-    sheet = client.open('Copy of N2N - Database')
-
-    # get the first sheet of the Spreadsheet
-    sheet_instance = sheet.get_worksheet(0)
-
-    # Read google sheet
-    data = sheet_instance.get_all_values()
-    dfToUpdate = pd.DataFrame(data[1:], columns=data[0])
-
-    # Read relevant variables
-    # Define actual meeting number
-    dfToUpdate['#'] = dfToUpdate['#'].astype(int)
-    MAX_NUMBER = dfToUpdate['#'].max()
-
-
-    #### Read new data -----------------------------------------------
-    # Read eventbrite credentials
-
-    with open("gcp_api/evenbrite_credentials.json", "r") as file:
-        credentials = json.load(file)
-
-    MY_PRIVATE_TOKEN = credentials["token"]
-    ID_N2N = credentials["id_n2n"]
-
-
-    url_all_events = f'https://www.eventbriteapi.com/v3/organizations/{ID_N2N}/events/' # all events from organization
-
-    headers = {
-        'Authorization': f'Bearer {MY_PRIVATE_TOKEN}',
-    }
-
-    # extract dates
-    dfToUpdate['Date'] = pd.to_datetime(dfToUpdate['Date'], format='%B %d, %Y')
-    dfToUpdate['Date'] = dfToUpdate['Date'].dt.strftime('%Y-%m-%d')
-    dfToUpdate['Date'] = pd.to_datetime(dfToUpdate['Date'], format='%Y-%m-%d')
-
-    start_date = dfToUpdate['Date'].max() + timedelta(days=1)
-    start_date = start_date.strftime('%Y-%m-%d')
-
-    end_date = (datetime.today() - timedelta(days=1))
-    end_date = end_date.strftime("%Y-%m-%d")
-
-    params_all_events = {
-        'start_date.range_start': start_date,
-        'start_date.range_end': end_date
-    }
-
-    # Extract id of all the meeting that are not in the spreadheet
-    response_events = requests.get(url_all_events, headers=headers, params=params_all_events).json()
-    #number_events = len(response_events['events'])
-    try:
-        number_events = len(response_events['events'])
-    except KeyError as error:
-        raise ValueError(f'There are no new meetings from {start_date} to {end_date}') from error
-
-    all_events = response_events['events']
-
-    id_events = [x['id'] for x in all_events]
-
-    ##----------------------------------
-
-    def join_attendees_information(event_id: str) -> list:
-        """
-        Arrange in a list of dictionaries all the information of the attendees
-
-        Args:
-            event_id (str): the event id from a meeting
-
-        Returns:
-            list: list made up of dictionaries with the information of each attendant by event
-        """
-
-        url_individual_event = f'https://www.eventbriteapi.com/v3/events/{event_id}/'
-        response_individual_event = requests.get(url_individual_event, headers=headers).json()
-
-        event_name =  response_individual_event['name']['text']
-        date_attending = response_individual_event['start']['local']
-        #date_attending = datetime.strptime(date_attending, "%Y-%m-%dT%H:%M:%S")
-        #date_attending = date_attending.strftime("%Y-%m-%d")
+from decouple import config
 
-        url_first_page = f'https://www.eventbriteapi.com/v3/events/{event_id}/attendees/' # url individual event
-        response_first_page = requests.get(url_first_page, headers=headers).json()
+from eventbrite import iter_attendee_pages, list_chapter_events
+from eventbrite_client import MAX_WORKERS, EventbriteClient
+from instrumentation import RunMetrics, profile
+from response_cache import CACHE_PATH, ResponseCache
 
-        pages = response_first_page['pagination']
-        page_count = pages['page_count']
+# Parquet archive of the rows (archive.py), the system of record when it is set
+ARCHIVE_URI = config('N2N_ARCHIVE_URI', default='')
 
+# Spreadsheet of the N2N database, the meetings of all the chapters are saved in it
+SPREADSHEET = config('N2N_SPREADSHEET', default='Copy of N2N - Database')
 
-        attendees = []
-        for i in range(1,page_count+1):
-            if i == 1:
-                attendees = response_first_page['attendees']
-            else:
-                url_new_page = f'https://www.eventbriteapi.com/v3/events/{event_id}/attendees/?page={i}'
-                new_page = requests.get(url_new_page,headers=headers).json()
-                page_ateendees = new_page['attendees']
-                attendees.extend(page_ateendees)
-            #print(i)
+# Attendees transformed and appended to the sheet at a time
+CHUNK_SIZE = config('N2N_CHUNK_SIZE', default=2000, cast=int)
 
-        for attendee in attendees:
-            attendee["event_name"] = event_name
-            attendee["date_attending"] = date_attending
+# Clients kept at module scope are reused by the warm invocations of the Lambda
+_sheet_client = None
+_api_client = None
 
-        return attendees
 
+def get_sheet_client():
+    """
+    Authorize the google sheets client, only in the first invocation of the container
 
-    '''total_attendees = []
+    Returns:
+        gspread.Client: authorized client
+    """
+    global _sheet_client
+    if _sheet_client is None:
+        # gspread and oauth2client are imported when they are needed, not during the cold start
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
 
-    for x in id_events:
-        attendees_info = join_attendees_information(x)
-        total_attendees.extend(attendees_info)'''
-    # join all the attendees information in one list.
-    total_attendees = [attendee for x in id_events for attendee in join_attendees_information(x)]
+        # Define the scope
+        SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+        CREDENTIALS = json.loads(config('CRED_GCP'))
 
+        # Credentials
+        # add credentials to the account
+        credentials = ServiceAccountCredentials.from_json_keyfile_dict(CREDENTIALS, SCOPE)
 
-    def list_to_df(total_attendees: list) -> pd.DataFrame:
-        """
-        Transform the json list of each attendee in a pandas data frame
+        # authorize the clientsheet
+        _sheet_client = gspread.authorize(credentials)
+    return _sheet_client
 
-        Args:
-            total_attendees (list): json list with the information of each attendant
 
-        Returns:
-            df (dataframe): data frame with the information of each attendant
-        """
+def read_chapters(credentials: dict) -> list:
+    """
+    Read the chapters loaded in the database from the eventbrite credentials
 
-        general_questions = ['Event Name',
-                            'Date Attending',
-                            'Attendee Status',
-                            'Email',
-                            'First Name',
-                            'Last Name']
+    The credentials can list the chapters, e.g. "chapters": [{"name": "Montreal",
+    "organization_id": "123", "city": "Montreal"}]. Without the list, the only chapter is the
+    id_n2n organization and the city of each meeting is taken from the event name.
 
-        question_list = ["What country are you from in Latin America? (if applicable)",
-                                '¿De qué país eres en América Latina? (si aplica)',
+    Args:
+        credentials (dict): content of the eventbrite credentials file
 
-                                'What area/subject do you specialize in? (in this industry)',
-                                '¿En qué área/materia te especializas? (en esta industria)',
+    Returns:
+        list: chapters with their 'name', 'organization_id' and 'city'
+    """
+    if 'chapters' not in credentials:
+        return [{'name': 'N2N', 'organization_id': credentials['id_n2n'], 'city': None}]
+    return [{'name': x['name'], 'organization_id': x['organization_id'], 'city': x.get('city')}
+            for x in credentials['chapters']]
 
-                                "What\'s your employment status?",
-                                '¿Cuál es tu situación laboral?',
 
-                                'If employed, what company do you work for?',
-                                'Si estás empleado, ¿para qué empresa trabajas?',
+def get_api_client() -> tuple:
+    """
+    Read the eventbrite credentials and create the api client, only in the first invocation of the container
 
-                                'What is your dream job in Canada?',
-                                '¿Cuál es tu trabajo soñado en Canadá?',
+    Returns:
+        tuple: api client and the chapters loaded in the database
+    """
+    global _api_client
+    if _api_client is None:
+        # Read eventbrite credentials
+        with open("gcp_api/evenbrite_credentials.json", "r") as file:
+            credentials = json.load(file)
+        chapters = read_chapters(credentials)
 
-                                'Provide your LinkedIn if you want to connect with others in this community!',
-                                '¡Proporciona tu LinkedIn si quieres conectarte con otros en esta comunidad!']
+        # Responses kept between runs, a retried or overlapping run downloads only what changed
+        cache = ResponseCache(CACHE_PATH) if CACHE_PATH else None
 
-        columns = general_questions + question_list
+        # pooled and retrying session shared by all the Eventbrite calls, each chapter adds its share of connections
+        _api_client = (EventbriteClient(credentials["token"], pool_size=MAX_WORKERS * len(chapters), cache=cache),
+                       chapters)
+    return _api_client
 
-        attendees_list = []
-        for attendee in total_attendees:
-            export_list = []
-            export_list.append(attendee["event_name"]) # 'Event Name'
-            export_list.append(attendee["date_attending"]) # 'Date Attending'
-            export_list.append(attendee["status"]) # 'Attendee Status'
 
-            export_list.append(attendee['profile']['email']) # email
-            export_list.append(attendee['profile']['first_name']) # First name
-            export_list.append(attendee['profile']['last_name']) # Last name
-
-            for question in question_list:
-                exist = False
-                for answer in attendee['answers']:
-                    if question == answer['question']:
-                        exist = True
-
-                        #dictionary, key
-                        #dictionary.get(key, None)
-
-                        export_list.append(answer.get('answer',None))
-                        #export_list.append(get_value_or_none(answer,'answer'))
-
-                if not exist:
-                    export_list.append(None)
-
-            attendees_list.append(export_list)
-
-            df = pd.DataFrame(attendees_list, columns=columns)
-
-            #print(question_list)
-        return df
-
-    df = list_to_df(total_attendees)
-
-    #df.to_csv('test.csv', index=False, encoding='utf-8')
-    #df.to_excel('test.xlsx', index=False)
-
-    #### Process the data --------------------
-
-    # City
-    def extract_city(event_name:str) -> str:
-        """
-        Extract the name of the city using the event_name
-
-        Args:
-            event_name (str): field event_name from the evenbrite page
-
-        Returns:
-            str: The name of the city, can be Montreal or Toronto
-        """
-        if "Montreal" in event_name:
-            return "Montreal"
-        else:
-            return "Toronto"
-
-    df['City'] = df['Event Name'].apply(extract_city)
-
-    # Seasons
-    def return_season_toronto(meeting_date: str) -> int:
-        """
-        Return the seasson according to the meeting day
-        Args:
-            meeting_date (str): date of the meeting
-        Returns:
-            int: Number of the Toronto season
-        """
-
-        if meeting_date <= datetime(2021,3,4): return 1
-        elif meeting_date <= datetime(2021,6,10): return 2
-        elif meeting_date <= datetime(2021,12,9): return 3
-        elif meeting_date <= datetime(2022,4,14): return 4
-        elif meeting_date <= datetime(2022,7,28): return 5
-        elif meeting_date <= datetime(2022,11,7): return 6
-        elif meeting_date <= datetime(2023,4,6): return 7
-        elif meeting_date <= datetime(2023,6,29): return 8
-        elif meeting_date <= datetime(2023,12,31): return 9
-        else: return 9
-
-    def return_season_montreal(meeting_date: str) -> int:
-        """
-        Return the seasson according to the meeting day
-        Args:
-            meeting_date (str): date of the meeting
-        Returns:
-            int: Number of the Montreal season
-        """
-        if meeting_date <= datetime(2021,3,4):
-            return 1
-        else:
-            return 1
-
-    # Apply the function according to hte city
-
-    def season_based_on_city(df: pd.DataFrame) -> int:
-        """
-        Return the season according the city of the meeting
-
-        Args:
-            df (dataframe): a dataframe to add the season
-
-        Returns:
-            int: Number of the season according to the city
-        """
-
-        if df['City'] == 'Toronto':
-            return return_season_toronto(df['Date'])
-        elif df['City'] == 'Montreal':
-            return return_season_montreal(df['Date'])
-        else:
-            # Handle other cities or cases if needed
-            return None
-
-    # transform the data format
-    df['Date'] = pd.to_datetime(df['Date Attending'], format='%Y-%m-%dT%H:%M:%S')
-    df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
-    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
-
-    # Apply the custom function to create a new 'Season' column
-    df['Season'] = df.apply(season_based_on_city, axis=1)
-
-    # Save the data according the spreadsheet
-    df['Date'] = df['Date'].dt.strftime('%m/%d/%Y')
-
-    # Industry/Event
-    def extractName(eventName: str) -> str:
-        """
-        Extract the Industry or event from event Name
-
-        Args:
-            eventName (str): Full event name
-
-        Returns:
-            str: Name of the industry
-        """
-        if "|" in(eventName):
-            split_result = eventName.split('|')
-
-            eventNameBefore = split_result[0]
-            eventNameAfter = split_result[1]
-
-            if "NotWorking to Networking" in(eventNameBefore) or "NotWorking2Networking" in(eventNameBefore):
-                eventName = eventNameAfter
-            elif "NotWorking to Networking" in(eventNameAfter) or "NotWorking2Networking" in(eventNameAfter) or "N2N Montreal" in(eventNameAfter) or "N2N" in(eventNameAfter) or 'Not working to Networking Montreal' in(eventNameAfter) :
-                eventName = eventNameBefore
-
-            if 'Latinos in ' in eventName:
-                split_result = eventName.split('Latinos in ')
-                return split_result[1].strip()
-            else:
-                return eventName.strip()
-        else:
-            return eventName.strip()
-
-    df['Industry / Event'] = df['Event Name'].apply(extractName)
-
-    # Format
-    def returnFormat(eventName: str) -> str:
-        """_summary_
-
-        Args:
-            eventName (str): Full description of event
-
-        Returns:
-            str: Format of the meeting
-        """
-
-        return "In Person" if "In Person" in eventName else "Online"
-
-    df['Format'] = df['Event Name'].apply(returnFormat)
-
-    # Create an empty list to store the counter values
-    counter_values = []
-
-    # Initialize variables to keep track of the previous date and city
-    prev_date = None
-    prev_city = None
-    counter = 0
-
-    # Iterate through the DataFrame rows
-    for index, row in df.iterrows():
-        current_date = row['Date']
-        current_city = row['City']
-
-        # Check if either the date or city has changed from the previous row
-        if current_date != prev_date or current_city != prev_city:
-            counter += 1
-        counter_values.append(counter)
-
-        # Update the previous date and city values for the next iteration
-        prev_date = current_date
-        prev_city = current_city
-
-    df['#'] = counter_values
-    df['#'] = df['#'] + MAX_NUMBER
-
-    # Attedance
-    df['Attendance'] = df['Attendee Status']
-
-    # Function add columns
-
-    def add_cols (df:pd.DataFrame,field1:str, field2:str,result_field:str) -> str:
-        """
-        Add the information of two fields evaluating if one of both exist
-
-        Args:
-            df (pd.DataFrame): dataframe where the function will be applied
-            field1 (str): first field to be added
-            field2 (str): second field to be added
-            result_field (str): name of the result field.
-
-        Returns:
-            str: dataframe with the new field
-        """
-        # Check if the columns exist in the DataFrame
-        if field1 in df.columns and field2 in df.columns:
-            # If both columns exist, perform the operations
-            #df[field1] = df[field1].astype(str)
-            #df[field2] = df[field2].astype(str)
-
-            #df[field1].replace('nan','', inplace=True)
-            #df[field2].replace('nan','', inplace=True)
-
-            df[field1].fillna('', inplace=True)
-            df[field2].fillna('', inplace=True)
-
-            # Concatenate and strip
-            df[result_field] = (df[field1] +
-                                        df[field2]).str.strip()
-
-            df[result_field] = df[result_field].str.title()
-
-        elif field1 in df.columns:
-            df[result_field] = df[field1].astype(str)
-            df[result_field] = df[result_field].str.title()
-
-        elif field2 in df.columns:
-            df[result_field] = df[field2].astype(str)
-            df[result_field] = df[result_field].str.title()
-        else:
-            # Handle the case where one or both columns are missing
-            pass
-
-    # Country of Origin
-    add_cols(df,'What country are you from in Latin America? (if applicable)','¿De qué país eres en América Latina? (si aplica)','Country of Origin')
-
-    # Define a dictionary for replacements
-    replacements = {
-        '': np.nan,
-        'Canadá': 'Canada',
-        'Perú': 'Peru',
-        'España': 'Spain',
-        'México': 'Mexico',
-        'República Dominicana': 'Dominican Republic',
-        '-': np.nan,
-        'Not': np.nan,
-        'nan': np.nan,
-        'Alberta, British Columbia And Calgary.' : 'Canada',
-        'Brasil': 'Brazil',
-        'Amazonia' : 'Colombia',
-        'Dr': np.nan,
-        'Yes': np.nan,
-        'Spain/Colombia': 'Colombia',
-        'X' : np.nan,
-        'Na,India': np.nan,
-        'None (Spain)': np.nan,
-        'India':np.nan,
-        'South Africa':np.nan,
-        'Puebla, México' : 'Mexico',
-        'Ciudad De México' : 'Mexico',
-        'Coló Me La' : np.nan,
-        'Born In Canada.': np.nan,
-        'Mex': np.nan
-    }
-
-    df['Country of Origin']=df['Country of Origin'].replace(replacements)
-
-    # Area of Expertise
-    add_cols(df,'What area/subject do you specialize in? (in this industry)','¿En qué área/materia te especializas? (en esta industria)','Area of Expertise')
-
-    # Employment Status
-    add_cols(df,"What\'s your employment status?",'¿Cuál es tu situación laboral?','Employment Status')
-
-    # Define a dictionary for replacements
-    replacementsEmploymentStatus = {
-        'Empleado': 'Employed',
-        'Empleado en búsqueda de nuevas oportunidades': 'Employed and looking for opportunities',
-        'Desempleado y buscando oportunidades': 'Unemployed and looking for opportunities',
-        'Empleado y en búsqueda de oportunidades': 'Employed and looking for opportunities',
-        '': np.nan
-    }
-
-    df['Employment Status']=df['Employment Status'].replace(replacementsEmploymentStatus)
-    df['Employment Status'] = df['Employment Status'].str.capitalize()
-
-    # Employer
-    add_cols(df,'If employed, what company do you work for?','Si estás empleado, ¿para qué empresa trabajas?','Employer')
-
-    # Dream job
-    add_cols(df,'What is your dream job in Canada?','¿Cuál es tu trabajo soñado en Canadá?','Dream Job')
-
-    # Linkedin
-    add_cols(df,'Provide your LinkedIn if you want to connect with others in this community!',
-            '¡Proporciona tu LinkedIn si quieres conectarte con otros en esta comunidad!',
-            'Linkedin')
-
-    # Select and organize fields
-    df2 = df[['#','Date', 'City', 'Season', 'Industry / Event', 'Format', 'Attendance',  'Email', 'First Name', 'Last Name', 'Country of Origin', 'Area of Expertise', 'Employment Status', 'Employer', 'Dream Job', 'Linkedin']]
-
-    set_with_dataframe(sheet_instance, df2, row=dfToUpdate.shape[0] + 2, include_column_header=False)
-    print('ok')
+def lambda_handler(event, context):
+    # The whole run is profiled when N2N_PROFILE is set
+    with profile():
+        api_data_loader()
+
+
+def api_data_loader(sheet_client=None, api_client: EventbriteClient = None, chapters: list = None) -> dict:
+    """
+    Append the attendees of the meetings after the watermark to the N2N database
+
+    The clients are the ones of the container by default, other clients (e.g. a local
+    api and an in-memory spreadsheet) can be given to run the loader offline.
+
+    Args:
+        sheet_client (gspread.Client, optional): client that opens the spreadsheet
+        api_client (EventbriteClient, optional): client of the Eventbrite api, given with chapters
+        chapters (list, optional): chapters with their 'name', 'organization_id' and 'city'
+
+    Returns:
+        dict: time, rows, bytes and memory of the run and of each stage
+    """
+    from sheet_store import (SheetWriter, committed_rows, parse_sheet_date, parse_sheet_dates, read_identity,
+                             read_watermark, seed_identity)
+    from transform import process_attendees, chunk_records
+    if ARCHIVE_URI:
+        from archive import is_seeded, seed_archive, write_archive
+        from schema import apply_schema
+
+    # Time, rows, bytes and memory of each stage, logged as json lines at the end of the run
+    metrics = RunMetrics('api_data_loader')
+    if api_client is None:
+        api_client, chapters = get_api_client()
+    api_client.reset_metrics()
+    writer = None
 
+    try:
+        #### Read previous data from google sheets
+        with metrics.stage('read_watermark'):
+            # authorize the clientsheet
+            client = sheet_client or get_sheet_client()
+
+            # get the instance of the Spreadsheet
+            sheet = client.open(SPREADSHEET)
+
+            # get the first sheet of the Spreadsheet
+            sheet_instance = sheet.get_worksheet(0)
+
+            # Read relevant variables, only the watermark is read instead of the whole google sheet
+            watermark = read_watermark(sheet)
+
+            # Batched, paced and retried writes of the rows and the watermark
+            writer = SheetWriter(sheet, sheet_instance)
+
+            # A run that stopped left a checkpoint: it continues after the last batch it wrote,
+            # with the same events, the identity index drops the attendees already saved
+            checkpoint = watermark['checkpoint']
+            previous = None
+            unrecorded = None
+            if checkpoint is not None:
+                previous = (watermark['last_date'], checkpoint['city'], watermark['last_number'])
+
+                # Rows appended after the last checkpoint was saved, they are added to the index below
+                saved, unrecorded = committed_rows(sheet_instance, watermark['row_count'])
+                if len(unrecorded):
+                    last_row = unrecorded.iloc[-1]
+                    previous = (parse_sheet_date(last_row['Date']), last_row['City'], int(last_row['#']))
+                    # The date, number and count of the watermark all move to the last appended row
+                    watermark = dict(watermark, row_count=saved, last_number=previous[2], last_date=previous[0])
+
+        # The first run with an archive copies the rows of the sheet to it
+        if ARCHIVE_URI and not is_seeded(ARCHIVE_URI):
+            with metrics.stage('seed_archive') as stage:
+                _, history = committed_rows(sheet_instance, 0)
+                history = apply_schema(history.assign(Date=parse_sheet_dates(history['Date'])))
+                stage['bytes'] += seed_archive(history, ARCHIVE_URI)
+                stage['rows'] += len(history)
+
+        # Define actual meeting number
+        MAX_NUMBER = watermark['last_number']
+
+
+        #### Read new data -----------------------------------------------
+
+        # extract dates, each chapter continues from its own last meeting
+        start_dates = {}
+        for chapter in chapters:
+            last_date = watermark['chapters'].get(chapter['name'], watermark['last_date'])
+            start_dates[chapter['name']] = (last_date + timedelta(days=1)).strftime('%Y-%m-%d')
+        start_date = min(start_dates.values())
+
+        end_date = (datetime.today() - timedelta(days=1))
+        end_date = end_date.strftime("%Y-%m-%d")
+
+        # A resumed run lists the same meetings as the run that stopped
+        if checkpoint is not None:
+            start_dates, end_date = checkpoint['start_dates'], checkpoint['end_date']
+            start_date = min(start_dates.values())
+
+        # Hashed identities of the attendees saved since the first date of the run, the first run
+        # builds the index from the whole sheet
+        with metrics.stage('read_identity') as stage:
+            index = read_identity(sheet, start_date)
+            if index is None:
+                index = seed_identity(sheet_instance)
+            if unrecorded is not None and len(unrecorded):
+                index.record_rows(unrecorded.assign(Date=parse_sheet_dates(unrecorded['Date'])))
+            stage['rows'] += len(index)
+
+        # Extract id of all the meeting that are not in the spreadheet, the chapters are listed at the same time
+        with metrics.stage('list_events') as stage:
+            all_events = list_chapter_events(api_client, chapters, start_dates, end_date)
+            stage['rows'] += len(all_events)
+            listing_bytes = api_client.metrics()['bytes']
+            stage['bytes'] += listing_bytes
+        if not all_events:
+            raise ValueError(f'There are no new meetings from {start_date} to {end_date}')
+
+        id_events = [x['id'] for x in all_events]
+        chapter_cities = {x['name']: x['city'] for x in chapters}
+        cities = {x['id']: chapter_cities[x['chapter']] for x in all_events}
+
+        ##----------------------------------
+
+        # The attendees are fetched page by page and transformed and appended in chunks of CHUNK_SIZE,
+        # the memory does not depend on the number of events. The events of all the chapters are
+        # merged by date and share the pool, so the meeting numbers follow the calendar.
+        # The fetch stage is the time spent waiting for the pages of attendees.
+        pages = metrics.iterate('fetch_attendees',
+                                iter_attendee_pages(id_events, api_client, MAX_WORKERS * len(chapters), cities))
+
+        row_count = 0
+        fetched = 0
+        # Name of the archive files of this run, in the order of the runs
+        run_name = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        chunk_number = 0
+        LAST_DATE = watermark['last_date']
+        for records in chunk_records(pages, CHUNK_SIZE):
+            metrics.add('fetch_attendees', rows=len(records))
+            fetched += len(records)
+
+            # Attendees already saved (overlapping dates, retries) or repeated in the chunk are not written
+            with metrics.stage('deduplicate') as stage:
+                records, identities = index.deduplicate(records)
+                stage['rows'] += len(records)
+            if not records:
+                continue
+
+            df2, previous = process_attendees(records, MAX_NUMBER, previous, metrics)
+
+            # Last meeting of this run, the start of the next one
+            LAST_DATE = max(LAST_DATE, df2['Date'].max())
+            dates = df2['Date']
+
+            def save_checkpoint(written: int):
+                # The identities of the rows written, then the position after the last one,
+                # where a failed run continues
+                index.record(identities[:written])
+                writer.write_identity(index)
+                last = written - 1
+                writer.write_watermark({
+                    'last_number': int(df2['#'].iloc[last]),
+                    'last_date': dates.iloc[last],
+                    'row_count': watermark['row_count'] + row_count + written,
+                    'chapters': watermark['chapters'],
+                    'checkpoint': {'start_dates': start_dates,
+                                   'end_date': end_date,
+                                   'city': str(df2['City'].iloc[last])}})
+
+            # The rows are archived before they are written to the sheet, the rows of a chunk that
+            # failed are archived again by the resumed run and read once
+            if ARCHIVE_URI:
+                with metrics.stage('write_archive') as stage:
+                    stage['bytes'] += write_archive(df2, f'{run_name}-{chunk_number:05d}', ARCHIVE_URI)
+                    stage['rows'] += df2.shape[0]
+                chunk_number += 1
+
+            # Append the new rows in batches, saving a checkpoint after each one
+            with metrics.stage('write_sheet') as stage:
+                # Save the data according the spreadsheet
+                df2['Date'] = df2['Date'].dt.strftime('%m/%d/%Y')
+                stage['bytes'] += writer.append_dataframe(df2, save_checkpoint, watermark['row_count'] + row_count)
+                stage['rows'] += df2.shape[0]
+            row_count += df2.shape[0]
+
+        metrics.add('fetch_attendees', nbytes=api_client.metrics()['bytes'] - listing_bytes)
+
+        # The attendees of a resumed run or of overlapping dates can all be saved already
+        if fetched == 0 and checkpoint is None:
+            raise ValueError(f'There are no attendees in the meetings from {start_date} to {end_date}')
+
+        # The chapters without new meetings keep their last date
+        chapter_dates = dict(watermark['chapters'])
+        for event in all_events:
+            event_date = datetime.strptime(event['start']['local'][:10], '%Y-%m-%d')
+            chapter_dates[event['chapter']] = max(chapter_dates.get(event['chapter'], event_date), event_date)
+
+        # Move the watermark after the new rows, the run is finished and the checkpoint is removed
+        with metrics.stage('write_watermark'):
+            writer.write_identity(index)
+            writer.write_watermark({'last_number': previous[2] if previous else MAX_NUMBER,
+                                    'last_date': LAST_DATE,
+                                    'row_count': watermark['row_count'] + row_count,
+                                    'chapters': chapter_dates})
+    except Exception as error:
+        metrics.emit('error', error=repr(error), eventbrite=api_client.metrics(),
+                     sheets=writer.metrics() if writer is not None else None)
+        raise
+
+    metrics.emit('ok', rows=row_count, duplicates=fetched - row_count, identities=len(index),
+                 eventbrite=api_client.metrics(), sheets=writer.metrics())
+    return dict(metrics.summary(), rows=row_count, duplicates=fetched - row_count)
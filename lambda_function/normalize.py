@@ -0,0 +1,135 @@
+import difflib
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+from decouple import config
+
+# Mapping tables of the free-text answers: for each field, the replacements of known
+# spellings (null drops the answer), the canonical values, optionally the final case and
+# whether unknown spellings are matched (fuzzy) with the known ones
+NORMALIZATION_PATH = config('N2N_NORMALIZATION_PATH',
+                            default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'normalization.json'))
+
+# Minimum similarity of the fuzzy match and minimum length of the answers that are tried. Only the
+# free-text fields are matched: in a closed list of options a close spelling can have the opposite
+# meaning ('Unemployed' and 'Employed')
+FUZZY_CUTOFF = 0.85
+FUZZY_MIN_LENGTH = 4
+
+_SPACES = re.compile(r'\s+')
+
+
+def fold(value: str) -> str:
+    """
+    Reduce a text to the key used by the lookups: without accents, case or repeated spaces
+
+    Args:
+        value (str): text to fold, e.g. 'Ciudad De  México'
+
+    Returns:
+        str: folded text, e.g. 'ciudad de mexico'
+    """
+    decomposed = unicodedata.normalize('NFKD', value)
+    without_accents = ''.join(x for x in decomposed if not unicodedata.combining(x))
+    return _SPACES.sub(' ', without_accents).strip().casefold()
+
+
+class Normalizer:
+    """
+    Normalize the answers of the survey with the mapping tables of each field.
+
+    An answer is stripped and title-cased, then looked up by its folded key in the
+    replacements and canonical values of the field. In the fuzzy fields the answers that
+    are not found are matched with the known keys, the answers that are not matched are
+    kept as they are.
+    Each distinct answer is resolved once and remembered, so the cost of a column
+    depends on its number of distinct answers and not on its rows.
+
+    Args:
+        tables (dict): by field, 'replacements' (dict), 'canonical' (list), 'case' (optional, 'capitalize')
+            and 'fuzzy' (optional, true for the free-text fields)
+    """
+
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self._lookups = {}
+        self._candidates = {}
+        self._resolved = {}
+        for field, table in tables.items():
+            lookup = {fold(value): value for value in table.get('canonical', [])}
+            lookup.update({fold(key): value for key, value in table.get('replacements', {}).items()})
+            self._lookups[field] = lookup
+            # Only the keys of a value are fuzzy candidates, dropping an answer needs an exact match
+            self._candidates[field] = ([key for key, value in lookup.items() if value is not None and key]
+                                       if table.get('fuzzy') else [])
+            self._resolved[field] = {}
+
+    @classmethod
+    def from_file(cls, path: str = NORMALIZATION_PATH) -> 'Normalizer':
+        with open(path, encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def _resolve(self, value: str, field: str):
+        lookup = self._lookups[field]
+        key = fold(value)
+        if key in lookup:
+            result = lookup[key]
+        else:
+            matches = (difflib.get_close_matches(key, self._candidates[field], n=1, cutoff=FUZZY_CUTOFF)
+                       if len(key) >= FUZZY_MIN_LENGTH else [])
+            result = lookup[matches[0]] if matches else value
+
+        if result is not None and self.tables[field].get('case') == 'capitalize':
+            result = result.capitalize()
+        return result
+
+    def normalize_value(self, value: str, field: str = None):
+        """
+        Normalize a single answer
+
+        Args:
+            value (str): raw answer
+            field (str, optional): field of the mapping tables, None only strips and title-cases
+
+        Returns:
+            str: normalized answer, None if the answer is dropped
+        """
+        value = value.strip().title()
+        if field is None:
+            return value
+
+        resolved = self._resolved[field]
+        if value not in resolved:
+            resolved[value] = self._resolve(value, field)
+        return resolved[value]
+
+    def normalize(self, values: pd.Series, field: str = None) -> pd.Series:
+        """
+        Normalize a column of answers, each distinct answer only once
+
+        Args:
+            values (pd.Series): raw answers, without missing values
+            field (str, optional): field of the mapping tables, None only strips and title-cases
+
+        Returns:
+            pd.Series: normalized answers with the index of values, NaN for the dropped answers
+        """
+        codes, uniques = pd.factorize(values)
+        normalized = np.array([self.normalize_value(x, field) for x in uniques], dtype=object)
+        normalized[pd.isna(normalized)] = np.nan
+        return pd.Series(normalized[codes], index=values.index, dtype=object)
+
+
+_normalizer = None
+
+
+def get_normalizer() -> Normalizer:
+    """Return the normalizer of NORMALIZATION_PATH, loaded once and reused by the next calls"""
+    global _normalizer
+    if _normalizer is None:
+        _normalizer = Normalizer.from_file()
+    return _normalizer
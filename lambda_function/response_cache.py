@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+from decouple import config
+
+# SQLite file with the responses of the Eventbrite api, empty to disable the cache.
+# /tmp is kept by the Lambda between the invocations of a warm container
+CACHE_PATH = config('EVENTBRITE_CACHE_PATH', default='/tmp/eventbrite_cache.sqlite')
+
+# Seconds a cached response is used without asking the api, after them it is revalidated
+# (ETag / Last-Modified) or downloaded again
+CACHE_TTL = config('EVENTBRITE_CACHE_TTL', default=12 * 3600, cast=int)
+
+# Responses not used in this many seconds are deleted when the cache is opened
+CACHE_MAX_AGE = config('EVENTBRITE_CACHE_MAX_AGE', default=30 * 24 * 3600, cast=int)
+
+
+def cache_key(url: str, params: dict = None) -> str:
+    """
+    Key of a response: url with the sorted query parameters
+
+    Args:
+        url (str): full url of the resource
+        params (dict, optional): query parameters of the request
+
+    Returns:
+        str: e.g. 'https://www.eventbriteapi.com/v3/events/123/attendees/?page=2'
+    """
+    if not params:
+        return url
+    return url + '?' + urlencode(sorted((k, str(v)) for k, v in params.items()))
+
+
+class ResponseCache:
+    """
+    Persistent store of api responses by url, with their validators and the time they were checked.
+
+    A response newer than the ttl is used as it is; an older one is sent back to the api as a
+    conditional request when it has an ETag or Last-Modified, otherwise it is downloaded again.
+
+    Args:
+        path (str): SQLite file, ':memory:' for a cache of the process
+        ttl (int, optional): seconds a response is fresh
+        max_age (int, optional): seconds after which an unused response is deleted
+    """
+
+    def __init__(self, path: str, ttl: int = CACHE_TTL, max_age: int = CACHE_MAX_AGE):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # The connection is shared by the threads of the fetch, the lock serializes its use
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS responses '
+                                     '(key TEXT PRIMARY KEY, body TEXT, etag TEXT, last_modified TEXT, '
+                                     'size INTEGER, checked REAL)')
+            self._connection.execute('DELETE FROM responses WHERE checked < ?', (time.time() - max_age,))
+
+    def get(self, key: str) -> dict:
+        """
+        Read a cached response
+
+        Args:
+            key (str): key of the request, see cache_key
+
+        Returns:
+            dict: 'body' (decoded json), 'etag', 'last_modified', 'size' (bytes of the body)
+                and 'fresh' (younger than the ttl), None when the response is not cached
+        """
+        with self._lock:
+            row = self._connection.execute('SELECT body, etag, last_modified, size, checked FROM responses '
+                                           'WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        body, etag, last_modified, size, checked = row
+        return {'body': json.loads(body), 'etag': etag, 'last_modified': last_modified, 'size': size,
+                'fresh': time.time() - checked < self.ttl}
+
+    def put(self, key: str, body: str, etag: str = None, last_modified: str = None):
+        """
+        Save a response downloaded from the api
+
+        Args:
+            key (str): key of the request
+            body (str): json text of the response
+            etag (str, optional): ETag header of the response
+            last_modified (str, optional): Last-Modified header of the response
+        """
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                                     (key, body, etag, last_modified, len(body.encode()), time.time()))
+
+    def touch(self, key: str):
+        """Mark a response as checked now, e.g. after the api answered that it did not change (304)"""
+        with self._lock:
+            self._connection.execute('UPDATE responses SET checked = ? WHERE key = ?', (time.time(), key))
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute('DELETE FROM responses')
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
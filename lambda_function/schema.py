@@ -0,0 +1,83 @@
+from importlib.util import find_spec
+
+import pandas as pd
+
+# Text columns are kept in Arrow memory when pyarrow is installed
+STRING = pd.StringDtype('pyarrow') if find_spec('pyarrow') else pd.StringDtype()
+
+# Types of the columns of the N2N database, shared by the loader and the dashboard.
+# The columns with a handful of distinct values are categories, the free text is a string.
+COLUMN_DTYPES = {
+    '#': 'Int32',
+    'Date': 'datetime64[ns]',
+    'City': 'category',
+    'Season': 'Int16',
+    'Industry / Event': 'category',
+    'Format': 'category',
+    'Attendance': 'category',
+    'Email': STRING,
+    'First Name': STRING,
+    'Last Name': STRING,
+    'Country of Origin': 'category',
+    'Area of Expertise': STRING,
+    'Employment Status': 'category',
+    'Employer': STRING,
+    'Dream Job': STRING,
+    'Linkedin': STRING,
+}
+
+
+# Formats of the dates of the sheet: the one shown by the sheet and the one written by the loader
+SHEET_DATE_FORMATS = ['%B %d, %Y', '%m/%d/%Y']
+
+
+def parse_sheet_date(value: str) -> pd.Timestamp:
+    # The sheet shows the dates as 'September 07, 2023', other formats are guessed
+    try:
+        return pd.to_datetime(value, format='%B %d, %Y')
+    except ValueError:
+        return pd.to_datetime(value)
+
+
+def parse_sheet_dates(values: pd.Series) -> pd.Series:
+    # Vectorized parse_sheet_date. The historic rows and the rows of the loader are in different
+    # formats, each date is read with the first of SHEET_DATE_FORMATS that fits it, the format of
+    # the others is guessed one by one; the dates that can not be read are left empty
+    dates = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    pending = (values.notna() & (values.astype(object) != '')).to_numpy()
+    for date_format in SHEET_DATE_FORMATS + ['mixed']:
+        if not pending.any():
+            break
+        dates[pending] = pd.to_datetime(values[pending], format=date_format, errors='coerce')
+        pending &= dates.isna().to_numpy()
+    return dates
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast the columns of the N2N database to the types of COLUMN_DTYPES
+
+    Dates and numbers that can not be read (e.g. empty cells of the sheet) are left empty,
+    the columns that are not in COLUMN_DTYPES are not changed. The dates of the sheet are in
+    several formats, each one is read with parse_sheet_dates.
+
+    Args:
+        df (pd.DataFrame): attendees database, e.g. read as text from the sheet
+
+    Returns:
+        pd.DataFrame: a data frame with the typed columns
+    """
+    columns = {}
+    for column, dtype in COLUMN_DTYPES.items():
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+        if dtype == 'datetime64[ns]' and pd.api.types.is_datetime64_any_dtype(df[column]):
+            columns[column] = df[column].astype(dtype)
+        elif dtype == 'datetime64[ns]':
+            columns[column] = parse_sheet_dates(df[column])
+        elif dtype in ('Int16', 'Int32'):
+            columns[column] = pd.to_numeric(df[column], errors='coerce').astype(dtype)
+        else:
+            columns[column] = df[column].astype(dtype)
+    # A typed frame (e.g. read from the Arrow snapshot) is not copied
+    return df.assign(**columns) if columns else df
@@ -0,0 +1,412 @@
+import functools
+import json
+import random
+import threading
+import time
+from collections import deque
+
+import gspread
+import pandas as pd
+import requests
+from decouple import config
+
+from identity import IdentityIndex
+from schema import parse_sheet_date, parse_sheet_dates
+
+# Small tab of the spreadsheet with the position of the last saved meeting
+WATERMARK_SHEET = 'watermark'
+WATERMARK_HEADER = ['last_number', 'last_date', 'row_count']
+
+# Next to the watermark, the progress of a run that did not finish (json), empty when the last run finished
+CHECKPOINT_HEADER = 'checkpoint'
+
+# Below the watermark of the database, the date of the last meeting of each chapter
+CHAPTER_HEADER = ['chapter', 'last_date']
+
+# Tab with the hashed identities of the saved attendees, a row by meeting date
+IDENTITY_SHEET = 'identity'
+IDENTITY_HEADER = ['date', 'keys']
+
+# Maximum rows and json bytes of each append, the Sheets api recommends payloads under 2 MB
+SHEETS_BATCH_ROWS = config('N2N_SHEETS_BATCH_ROWS', default=1000, cast=int)
+SHEETS_BATCH_BYTES = config('N2N_SHEETS_BATCH_BYTES', default=1_000_000, cast=int)
+
+# Write requests allowed by minute, the quota of the Sheets api by user
+SHEETS_WRITES_PER_MINUTE = config('N2N_SHEETS_WRITES_PER_MINUTE', default=60, cast=int)
+
+# Responses of the Sheets api that are worth to retry
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def scan_watermark(sheet_instance: gspread.Worksheet) -> dict:
+    """
+    Compute the watermark from the database sheet, reading the '#' column, the header and the last row.
+
+    Only used when the watermark tab does not exist yet.
+
+    Args:
+        sheet_instance (gspread.Worksheet): sheet with the attendees database
+
+    Returns:
+        dict: last meeting number, date of the last meeting, number of saved rows (without header),
+            the chapters (empty, the sheet does not tell them) and the checkpoint (None)
+    """
+    numbers = sheet_instance.col_values(1)
+    header = sheet_instance.row_values(1)
+    last_row = sheet_instance.row_values(len(numbers))
+
+    return {'last_number': int(numbers[-1]),
+            'last_date': parse_sheet_date(last_row[header.index('Date')]),
+            'row_count': len(numbers) - 1,
+            'chapters': {},
+            'checkpoint': None}
+
+
+def read_watermark(sheet: gspread.Spreadsheet) -> dict:
+    """
+    Read the watermark of the database, the cost does not depend on the size of the database.
+
+    Args:
+        sheet (gspread.Spreadsheet): spreadsheet of the database, the attendees are in the first sheet
+
+    Returns:
+        dict: last meeting number, date of the last meeting, number of saved rows (without header),
+            the date of the last meeting of each chapter and the checkpoint of an unfinished run (or None)
+    """
+    try:
+        values = sheet.worksheet(WATERMARK_SHEET).get_all_values()
+    except gspread.WorksheetNotFound:
+        values = None
+
+    # The tab is small, a single request reads the database and the chapters rows
+    if (not values or len(values) < 2 or len(values[1]) < len(WATERMARK_HEADER)
+            or not all(values[1][:len(WATERMARK_HEADER)])):
+        return scan_watermark(sheet.get_worksheet(0))
+
+    last_number, last_date, row_count = values[1][:len(WATERMARK_HEADER)]
+    headers = [x[:len(CHAPTER_HEADER)] for x in values]
+    chapters = {}
+    if CHAPTER_HEADER in headers:
+        start = headers.index(CHAPTER_HEADER) + 1
+        chapters = {x[0]: pd.to_datetime(x[1], format='%Y-%m-%d') for x in values[start:] if x[0] and x[1]}
+
+    checkpoint = values[1][len(WATERMARK_HEADER)] if len(values[1]) > len(WATERMARK_HEADER) else ''
+
+    return {'last_number': int(last_number),
+            'last_date': pd.to_datetime(last_date, format='%Y-%m-%d'),
+            'row_count': int(row_count),
+            'chapters': chapters,
+            'checkpoint': json.loads(checkpoint) if checkpoint else None}
+
+
+def watermark_rows(watermark: dict) -> list:
+    """
+    Arrange the watermark in the rows of its tab
+
+    Args:
+        watermark (dict): last meeting number, date of the last meeting, number of saved rows
+            and optionally the date of the last meeting of each chapter and the checkpoint
+
+    Returns:
+        list: rows of four columns
+    """
+    checkpoint = watermark.get('checkpoint')
+    rows = [WATERMARK_HEADER + [CHECKPOINT_HEADER],
+            [int(watermark['last_number']), watermark['last_date'].strftime('%Y-%m-%d'), int(watermark['row_count']),
+             json.dumps(checkpoint) if checkpoint else '']]
+    chapters = watermark.get('chapters', {})
+    if chapters:
+        rows += [[''] * 4, CHAPTER_HEADER + ['', '']]
+        rows += [[name, last_date.strftime('%Y-%m-%d'), '', ''] for name, last_date in sorted(chapters.items())]
+    return rows
+
+
+def write_watermark(sheet: gspread.Spreadsheet, watermark: dict, watermark_sheet: gspread.Worksheet = None):
+    """
+    Save the watermark in its tab, the tab is created the first time
+
+    Args:
+        sheet (gspread.Spreadsheet): spreadsheet of the database
+        watermark (dict): last meeting number, date of the last meeting, number of saved rows
+            and optionally the date of the last meeting of each chapter and the checkpoint
+        watermark_sheet (gspread.Worksheet, optional): the tab, when it was already opened
+
+    Returns:
+        gspread.Worksheet: the tab of the watermark
+    """
+    rows = watermark_rows(watermark)
+    if watermark_sheet is None:
+        try:
+            watermark_sheet = sheet.worksheet(WATERMARK_SHEET)
+        except gspread.WorksheetNotFound:
+            watermark_sheet = sheet.add_worksheet(WATERMARK_SHEET, rows=len(rows), cols=len(rows[0]))
+
+    if watermark_sheet.row_count < len(rows):
+        watermark_sheet.add_rows(len(rows) - watermark_sheet.row_count)
+    watermark_sheet.update(f'A1:D{len(rows)}', rows)
+    return watermark_sheet
+
+
+def dataframe_to_rows(df: pd.DataFrame) -> list:
+    """
+    Transform a data frame in a list of rows that can be sent to google sheets, empty values are ''
+
+    Args:
+        df (pd.DataFrame): data to transform
+
+    Returns:
+        list: list of rows made up of python values
+    """
+    return df.astype(object).where(df.notna(), '').values.tolist()
+
+
+def batch_rows(rows: list, max_rows: int = SHEETS_BATCH_ROWS, max_bytes: int = SHEETS_BATCH_BYTES):
+    """
+    Split rows in batches of at most max_rows rows and about max_bytes bytes of json
+
+    Args:
+        rows (list): rows made up of python values
+        max_rows (int, optional): maximum rows by batch
+        max_bytes (int, optional): maximum json bytes by batch, a single larger row is its own batch
+
+    Yields:
+        tuple: rows of the batch and their size in bytes
+    """
+    batch, size = [], 0
+    for row in rows:
+        row_size = len(json.dumps(row, default=str)) + 1
+        if batch and (len(batch) >= max_rows or size + row_size > max_bytes):
+            yield batch, size
+            batch, size = [], 0
+        batch.append(row)
+        size += row_size
+    if batch:
+        yield batch, size
+
+
+def committed_rows(sheet_instance: gspread.Worksheet, after: int) -> tuple:
+    """
+    Read how many rows the database has and the rows after a position, e.g. the rows appended after a checkpoint
+
+    Args:
+        sheet_instance (gspread.Worksheet): sheet with the attendees database
+        after (int): rows (without header) that are not read
+
+    Returns:
+        tuple: number of rows (without header) and a data frame with the text of the rows after 'after'
+    """
+    numbers = sheet_instance.col_values(1)
+    header = sheet_instance.row_values(1)
+    if len(numbers) - 1 <= after:
+        return len(numbers) - 1, pd.DataFrame(columns=header)
+    values = sheet_instance.get(f'A{after + 2}:{gspread.utils.rowcol_to_a1(len(numbers), len(header))}')
+    return len(numbers) - 1, pd.DataFrame([row + [''] * (len(header) - len(row)) for row in values], columns=header)
+
+
+def seed_identity(sheet_instance: gspread.Worksheet) -> IdentityIndex:
+    """
+    Build the index of the rows saved before the index existed, reading the emails and dates of the whole sheet once
+
+    Args:
+        sheet_instance (gspread.Worksheet): sheet with the attendees database
+
+    Returns:
+        IdentityIndex: index with all the rows of the sheet, to be saved
+    """
+    header = sheet_instance.row_values(1)
+    emails = sheet_instance.col_values(header.index('Email') + 1)[1:]
+    dates = sheet_instance.col_values(header.index('Date') + 1)[1:]
+    size = max(len(emails), len(dates))
+    df = pd.DataFrame({'Email': emails + [''] * (size - len(emails)), 'Date': dates + [''] * (size - len(dates))})
+
+    index = IdentityIndex()
+    index.record_rows(df.assign(Date=parse_sheet_dates(df['Date'])).dropna(subset=['Date']))
+    return index
+
+
+def read_identity(sheet: gspread.Spreadsheet, since: str) -> IdentityIndex:
+    """
+    Load the keys of the attendees of the meetings since a date, the tab is None when it does not exist
+
+    Args:
+        sheet (gspread.Spreadsheet): spreadsheet of the database
+        since (str): first date (YYYY-MM-DD) that the run can write
+
+    Returns:
+        IdentityIndex: index of the dates since 'since', None when there is no index yet
+    """
+    try:
+        identity_sheet = sheet.worksheet(IDENTITY_SHEET)
+    except gspread.WorksheetNotFound:
+        return None
+
+    dates = identity_sheet.col_values(1)
+    numbers = [i for i, date in enumerate(dates[1:], start=2) if date >= since]
+    rows, keys = {}, {}
+    if numbers:
+        # Only the rows of the recent dates are read, the older ones are not needed to deduplicate
+        for number, row in enumerate(identity_sheet.get(f'A{numbers[0]}:B{len(dates)}'), start=numbers[0]):
+            if row and row[0] >= since:
+                rows.setdefault(row[0], []).append(number)
+                keys.setdefault(row[0], []).extend(row[1].split() if len(row) > 1 else [])
+    return IdentityIndex(rows, keys, next_row=len(dates) + 1)
+
+
+class SheetWriter:
+    """
+    Writes of the loader in the spreadsheet, paced under the write quota of the Sheets api.
+
+    The rows are appended in size-bounded batches. Rate limits (429) and server errors (5xx)
+    are retried with exponential backoff. After each batch, the checkpoint function can save
+    the progress, so a failed run resumes after the last batch that was written.
+
+    Args:
+        sheet (gspread.Spreadsheet): spreadsheet of the database
+        sheet_instance (gspread.Worksheet): sheet with the attendees database
+        max_rows (int, optional): maximum rows by append
+        max_bytes (int, optional): maximum json bytes by append
+        writes_per_minute (int, optional): write requests allowed in any minute
+        max_retries (int, optional): retries of a write before failing
+        backoff (float, optional): seconds of the first retry, doubled in each attempt
+    """
+
+    def __init__(self, sheet: gspread.Spreadsheet, sheet_instance: gspread.Worksheet,
+                 max_rows: int = SHEETS_BATCH_ROWS, max_bytes: int = SHEETS_BATCH_BYTES,
+                 writes_per_minute: int = SHEETS_WRITES_PER_MINUTE, max_retries: int = 5, backoff: float = 1.0):
+        self.sheet = sheet
+        self.sheet_instance = sheet_instance
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.writes_per_minute = writes_per_minute
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._writes = deque()
+        self._watermark_sheet = None
+        self._identity_sheet = None
+        self._lock = threading.Lock()
+        self._metrics = {'requests': 0, 'retries': 0, 'rows': 0, 'bytes': 0, 'paced_seconds': 0.0}
+
+    def metrics(self) -> dict:
+        """
+        Return the counters of the writes
+
+        Returns:
+            dict: requests, retries, rows and bytes appended and seconds waited for the quota
+        """
+        with self._lock:
+            return dict(self._metrics)
+
+    def _pace(self):
+        # Sliding window of the writes of the last minute
+        with self._lock:
+            now = time.monotonic()
+            while self._writes and now - self._writes[0] >= 60:
+                self._writes.popleft()
+            delay = 60 - (now - self._writes[0]) if len(self._writes) >= self.writes_per_minute else 0.0
+            self._metrics['paced_seconds'] += delay
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self._writes.append(time.monotonic())
+
+    def call(self, function, *args, applied=None, **kwargs):
+        """
+        Make a write request paced by the quota, retrying rate limits, server errors and lost connections
+
+        Args:
+            function (callable): gspread method that makes the request
+            *args, **kwargs: arguments of function
+            applied (callable, optional): for a request that is not idempotent, tells before each retry
+                whether the failed request was applied anyway (its response was lost), then it is not sent again
+
+        Returns:
+            the result of function, None when a failed request was applied
+        """
+        for attempt in range(self.max_retries + 1):
+            self._pace()
+            with self._lock:
+                self._metrics['requests'] += 1
+            try:
+                return function(*args, **kwargs)
+            except gspread.exceptions.APIError as error:
+                retry = error.response.status_code in RETRY_STATUS
+            except (requests.ConnectionError, requests.Timeout):
+                retry = True
+            if not retry or attempt == self.max_retries:
+                raise
+            with self._lock:
+                self._metrics['retries'] += 1
+            time.sleep(self.backoff * 2 ** attempt * (1 + random.random() / 2))
+            if applied is not None and applied():
+                return None
+
+    def _appended(self, before: int, rows: int) -> bool:
+        # Rows (without header) of the sheet after a failed append: all the batch was written or none of it
+        count = len(self.sheet_instance.col_values(1)) - 1
+        if count not in (before, before + rows):
+            raise ValueError(f'The sheet has {count} rows, {before} or {before + rows} were expected: '
+                             f'it was modified during the run')
+        return count == before + rows
+
+    def append_dataframe(self, df: pd.DataFrame, checkpoint=None, row_count: int = None) -> int:
+        """
+        Append the rows of a data frame after the last row of the sheet, in batches
+
+        An append is not idempotent: before retrying a batch the rows of the sheet are counted,
+        a batch already written is not written again.
+
+        Args:
+            df (pd.DataFrame): rows to append, with the columns in the order of the sheet
+            checkpoint (callable, optional): called with the number of rows of df written after each batch
+            row_count (int, optional): rows (without header) of the sheet before df, read from the sheet if not given
+
+        Returns:
+            int: size in bytes of the rows sent, as json
+        """
+        if row_count is None:
+            row_count = len(self.sheet_instance.col_values(1)) - 1
+        written, sent = 0, 0
+        for batch, size in batch_rows(dataframe_to_rows(df), self.max_rows, self.max_bytes):
+            self.call(self.sheet_instance.append_rows, batch, value_input_option='USER_ENTERED',
+                      insert_data_option='INSERT_ROWS', table_range='A1',
+                      applied=functools.partial(self._appended, row_count + written, len(batch)))
+            written += len(batch)
+            sent += size
+            with self._lock:
+                self._metrics['rows'] += len(batch)
+                self._metrics['bytes'] += size
+            if checkpoint is not None:
+                checkpoint(written)
+        return sent
+
+    def write_watermark(self, watermark: dict):
+        """
+        Save the watermark (or a checkpoint) in its tab, paced with the other writes
+
+        Args:
+            watermark (dict): values saved by write_watermark
+        """
+        self._watermark_sheet = self.call(write_watermark, self.sheet, watermark, self._watermark_sheet)
+
+    def write_identity(self, index: IdentityIndex):
+        """
+        Save the dates of the index that changed in a single request, the tab is created the first time
+
+        Args:
+            index (IdentityIndex): index of the attendees
+        """
+        changes = index.changes()
+        if not changes:
+            return
+        if self._identity_sheet is None:
+            try:
+                self._identity_sheet = self.sheet.worksheet(IDENTITY_SHEET)
+            except gspread.WorksheetNotFound:
+                self._identity_sheet = self.call(self.sheet.add_worksheet, IDENTITY_SHEET,
+                                                 rows=index.next_row, cols=len(IDENTITY_HEADER))
+                changes.insert(0, (1, IDENTITY_HEADER))
+
+        if self._identity_sheet.row_count < index.next_row - 1:
+            self.call(self._identity_sheet.add_rows, index.next_row - 1 - self._identity_sheet.row_count)
+        self.call(self._identity_sheet.batch_update,
+                  [{'range': f'A{number}:B{number}', 'values': [row]} for number, row in changes])
@@ -0,0 +1,293 @@
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+from event_names import get_event_parser
+from normalize import get_normalizer
+from schema import apply_schema
+
+GENERAL_QUESTIONS = ['Event Name',
+                     'Date Attending',
+                     'Attendee Status',
+                     'Email',
+                     'First Name',
+                     'Last Name']
+
+QUESTION_LIST = ["What country are you from in Latin America? (if applicable)",
+                 '¿De qué país eres en América Latina? (si aplica)',
+
+                 'What area/subject do you specialize in? (in this industry)',
+                 '¿En qué área/materia te especializas? (en esta industria)',
+
+                 "What\'s your employment status?",
+                 '¿Cuál es tu situación laboral?',
+
+                 'If employed, what company do you work for?',
+                 'Si estás empleado, ¿para qué empresa trabajas?',
+
+                 'What is your dream job in Canada?',
+                 '¿Cuál es tu trabajo soñado en Canadá?',
+
+                 'Provide your LinkedIn if you want to connect with others in this community!',
+                 '¡Proporciona tu LinkedIn si quieres conectarte con otros en esta comunidad!']
+
+
+def list_to_df(total_attendees: list) -> pd.DataFrame:
+    """
+    Transform the json list of each attendee in a pandas data frame
+
+    Each attendee is visited once: its answers are indexed by question and the values are
+    collected by column, the data frame is built a single time at the end.
+
+    Args:
+        total_attendees (list): json list with the information of each attendant
+
+    Returns:
+        df (dataframe): data frame with the information of each attendant and the 'City' of its chapter
+    """
+    event_name, date_attending, status, email, first_name, last_name = [], [], [], [], [], []
+    city = []
+    answer_columns = {question: [] for question in QUESTION_LIST}
+
+    for attendee in total_attendees:
+        profile = attendee['profile']
+        event_name.append(attendee["event_name"])
+        date_attending.append(attendee["date_attending"])
+        city.append(attendee.get('city'))
+        status.append(attendee["status"])
+        email.append(profile['email'])
+        first_name.append(profile['first_name'])
+        last_name.append(profile['last_name'])
+
+        answers = {answer['question']: answer.get('answer') for answer in attendee['answers']}
+        for question, values in answer_columns.items():
+            values.append(answers.get(question))
+
+    data = dict(zip(GENERAL_QUESTIONS, [event_name, date_attending, status, email, first_name, last_name]))
+    data.update(answer_columns)
+    # City of the chapter of the event, empty when the event name tells the city
+    data['City'] = city
+
+    return pd.DataFrame(data, columns=GENERAL_QUESTIONS + QUESTION_LIST + ['City'])
+
+
+# Last day of each season by city, the meetings after the last day belong to the next season
+SEASON_BOUNDARIES = {
+    'Toronto': ['2021-03-04', '2021-06-10', '2021-12-09', '2022-04-14',
+                '2022-07-28', '2022-11-07', '2023-04-06', '2023-06-29'],
+    'Montreal': [],
+}
+
+def add_event_fields(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the City, Industry / Event and Format of the meeting, parsed from the event name
+
+    The City of the chapter is kept when the attendee has one, the city of the event name
+    is used otherwise.
+
+    Args:
+        df (pd.DataFrame): attendees with the 'Event Name' field and optionally the 'City' of the chapter
+
+    Returns:
+        pd.DataFrame: the same data frame with the 'City', 'Industry / Event' and 'Format' fields
+    """
+    # Hundreds of attendees share the same event name, each name is parsed once
+    parsed = get_event_parser().parse_names(df['Event Name'])
+    if 'City' in df.columns:
+        df['City'] = df['City'].where(df['City'].notna(), parsed['City'])
+    else:
+        df['City'] = parsed['City']
+    df['Industry / Event'] = parsed['Industry / Event']
+    df['Format'] = parsed['Format']
+    return df
+
+
+def add_date(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the Date (without time) of the meeting using the 'Date Attending' field
+
+    Args:
+        df (pd.DataFrame): attendees with the 'Date Attending' field
+
+    Returns:
+        pd.DataFrame: the same data frame with the 'Date' field
+    """
+    df['Date'] = pd.to_datetime(df['Date Attending'], format='%Y-%m-%dT%H:%M:%S').dt.normalize()
+    return df
+
+
+def add_season(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the Season of the meeting looking up the date in the SEASON_BOUNDARIES of its city
+
+    Args:
+        df (pd.DataFrame): attendees with the 'City' and 'Date' fields
+
+    Returns:
+        pd.DataFrame: the same data frame with the 'Season' field, empty for unknown cities
+    """
+    season = pd.Series(pd.NA, index=df.index, dtype='Int64')
+    dates = df['Date'].to_numpy(dtype='datetime64[ns]')
+
+    for city, boundaries in SEASON_BOUNDARIES.items():
+        mask = (df['City'] == city).to_numpy()
+        bounds = np.array(boundaries, dtype='datetime64[ns]')
+        # A meeting on the last day of a season still belongs to it
+        position = np.searchsorted(bounds, dates[mask], side='left')
+        season[mask] = position + 1
+
+    df['Season'] = season
+    return df
+
+
+def add_meeting_number(df: pd.DataFrame, max_number: int = 0, previous: tuple = None) -> pd.DataFrame:
+    """
+    Add the meeting number '#', it increases each time the date or the city changes from one row to the next
+
+    Args:
+        df (pd.DataFrame): attendees with the 'Date' and 'City' fields
+        max_number (int, optional): last meeting number already saved
+        previous (tuple, optional): Date and City of the row before df, when df continues a previous chunk
+
+    Returns:
+        pd.DataFrame: the same data frame with the '#' field
+    """
+    date_before = df['Date'].shift()
+    city_before = df['City'].shift()
+    if previous is not None and not df.empty:
+        date_before.iloc[0], city_before.iloc[0] = previous[0], previous[1]
+
+    changed = (df['Date'] != date_before) | (df['City'] != city_before)
+    df['#'] = changed.cumsum() + max_number
+    return df
+
+
+def _last_meeting(df: pd.DataFrame) -> tuple:
+    # Date, City and '#' of the last row, the meeting numbers of the next chunk continue from it
+    if df.empty:
+        return None
+    last = df.iloc[-1]
+    return last['Date'], last['City'], int(last['#'])
+
+
+def add_cols(df: pd.DataFrame, field1: str, field2: str, result_field: str):
+    """
+    Add the information of two fields evaluating if one of both exist
+
+    Args:
+        df (pd.DataFrame): dataframe where the function will be applied
+        field1 (str): first field to be added
+        field2 (str): second field to be added
+        result_field (str): name of the result field.
+    """
+    # The missing answers are empty, the strip and the case are applied by the normalizer
+    if field1 in df.columns and field2 in df.columns:
+        df[result_field] = df[field1].fillna('') + df[field2].fillna('')
+
+    elif field1 in df.columns:
+        df[result_field] = df[field1].fillna('')
+
+    elif field2 in df.columns:
+        df[result_field] = df[field2].fillna('')
+
+
+# Fields of the database that come from the survey answers: english and spanish question
+ANSWER_FIELDS = {
+    'Country of Origin': QUESTION_LIST[0:2],
+    'Area of Expertise': QUESTION_LIST[2:4],
+    'Employment Status': QUESTION_LIST[4:6],
+    'Employer': QUESTION_LIST[6:8],
+    'Dream Job': QUESTION_LIST[8:10],
+    'Linkedin': QUESTION_LIST[10:12],
+}
+
+# Fields of the database, in the order of the sheet
+OUTPUT_COLUMNS = ['#', 'Date', 'City', 'Season', 'Industry / Event', 'Format', 'Attendance', 'Email',
+                  'First Name', 'Last Name', 'Country of Origin', 'Area of Expertise', 'Employment Status',
+                  'Employer', 'Dream Job', 'Linkedin']
+
+
+def add_answers(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the fields of the database that come from the survey answers, joining the english and spanish questions
+
+    The answers are normalized with the mapping tables of normalization.json, the fields
+    without a table (e.g. Employer) are only stripped and title-cased.
+
+    Args:
+        df (pd.DataFrame): attendees with the fields of QUESTION_LIST
+
+    Returns:
+        pd.DataFrame: the same data frame with the answer fields
+    """
+    normalizer = get_normalizer()
+    for field, (english, spanish) in ANSWER_FIELDS.items():
+        add_cols(df, english, spanish, field)
+        df[field] = normalizer.normalize(df[field], field if field in normalizer.tables else None)
+    return df
+
+
+def process_attendees(total_attendees: list, max_number: int = 0, previous: tuple = None, metrics=None) -> tuple:
+    """
+    Transform the attendees returned by Eventbrite in rows of the N2N database
+
+    Args:
+        total_attendees (list): json list with the information of each attendant
+        max_number (int, optional): last meeting number already saved
+        previous (tuple, optional): Date, City and '#' of the last row processed before
+            total_attendees, returned by the previous call
+        metrics (instrumentation.RunMetrics, optional): times the list_to_df, transform and answers stages
+
+    Returns:
+        tuple: data frame with OUTPUT_COLUMNS (typed with schema.COLUMN_DTYPES) and Date, City and '#' of its last row
+    """
+    def stage(name: str):
+        return metrics.stage(name) if metrics is not None else nullcontext({'rows': 0})
+
+    with stage('list_to_df') as values:
+        df = list_to_df(total_attendees)
+        values['rows'] += len(df)
+
+    if previous is not None:
+        max_number = previous[2]
+
+    # City, Date, Season, Industry/Event, Format and meeting number
+    with stage('transform') as values:
+        df = (df.pipe(add_event_fields)
+                .pipe(add_date)
+                .pipe(add_season)
+                .pipe(add_meeting_number, max_number, previous))
+
+        # Attedance
+        df['Attendance'] = df['Attendee Status']
+        values['rows'] += len(df)
+
+    with stage('answers') as values:
+        df = add_answers(df)
+
+        # Select and organize fields, with the types of the database
+        df = apply_schema(df[OUTPUT_COLUMNS])
+        values['rows'] += len(df)
+    return df, _last_meeting(df) or previous
+
+
+def chunk_records(pages, chunk_size: int):
+    """
+    Group the records of several pages in lists of about chunk_size records
+
+    Args:
+        pages (iterable): lists of records, e.g. the pages of attendees
+        chunk_size (int): minimum size of each chunk, except the last one
+
+    Yields:
+        list: records of the chunk
+    """
+    chunk = []
+    for page in pages:
+        chunk.extend(page)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk